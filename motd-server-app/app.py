@@ -3,50 +3,215 @@
 
 """Flask application for serving Ubuntu MOTD content based on user agent."""
 
+import os
+import time
+
 import flask
 
-from motd_server.flask import TextResponse
-from motd_server.motd import extract_user_agent_info, process_config, select_motd
-from motd_server.utils import get_mime_type
+from motd_server import metrics
+from motd_server.access_log import create_access_log
+from motd_server.flask import TextResponse, entry_response
+from motd_server.manifest import DELTA_PATH, MANIFEST_PATH, stream_delta
+from motd_server.motd import HEALTH_PATH, extract_user_agent_info, process_config
+from motd_server.profiling import (
+    PROFILE_PATH,
+    Profiler,
+    get_profile_sample_rate,
+    render_profile,
+)
+from motd_server.ratelimit import RateLimit, create_rate_limiter
+from motd_server.reload import ContentReloader
+from motd_server.rotation import VARIANT_HEADER
+from motd_server.wsgi import FastPath
+
+CONTENT_VERSION_HEADER = "X-Content-Version"
+MANIFEST_VERSION_HEADER = "X-Manifest-Version"
+MANIFEST_BASE_HEADER = "X-Manifest-Base"
+MANIFEST_FULL_HEADER = "X-Manifest-Full"
 
 app = flask.Flask(__name__)
 app.response_class = TextResponse
 app.config.from_prefixed_env()
 process_config(app.config)
+reloader = ContentReloader(app.config)
+access_log = create_access_log(app.config)
+
+
+@app.before_request
+def load_content() -> None:
+    """Pin the current content for the whole request, reloading it first if it changed."""
+    flask.g.start = time.perf_counter()
+    reloader.maybe_reload()
+    flask.g.content = app.config["MOTD_CONTENT"]
+
+
+@app.after_request
+def add_content_version(response: flask.Response) -> flask.Response:
+    """Report the version of the content that served the request, and record its metrics and log.
+
+    Args:
+        response: Response to the request.
+
+    Returns:
+        Response with the content version header.
+    """
+    response.headers[CONTENT_VERSION_HEADER] = flask.g.content.version
+
+    route = flask.request.endpoint or "none"
+    seconds = time.perf_counter() - flask.g.start
+    size = response.content_length or 0
+    metrics.REQUESTS.labels(route, response.status_code).inc()
+    metrics.REQUEST_DURATION.labels(route).observe(seconds)
+    metrics.RESPONSE_SIZE.labels(route).observe(size)
+    if access_log:
+        access_log.log(
+            flask.request.user_agent.string,
+            seconds,
+            route=route,
+            path=flask.request.path,
+            key=flask.g.get("filename", ""),
+            status=response.status_code,
+            bytes=size,
+        )
+    return response
+
+
+@app.route("/metrics")
+def serve_metrics() -> flask.Response:
+    """Serve the Prometheus metrics of the application.
+
+    Returns:
+        Metrics in the Prometheus text format.
+    """
+    data, content_type = metrics.generate_metrics()
+    return flask.Response(data, content_type=content_type)
+
+
+@app.route(f"/{PROFILE_PATH}")
+def serve_profile() -> flask.Response:
+    """Serve the profile of the sampled requests of all the workers.
+
+    Returns:
+        Self time of every stack in microseconds, in the folded stacks format of flamegraphs.
+    """
+    return flask.Response(render_profile(), mimetype="text/plain")
+
+
+@app.route(f"/{MANIFEST_PATH}")
+def serve_manifest() -> flask.Response:
+    """Serve the manifest of the files, for mirrors to find out whether they changed.
+
+    Returns:
+        Digest and size of every file, or 304 if the mirror copy is fresh.
+    """
+    manifest = app.config["FILES_MANIFEST"]
+    response = flask.Response(manifest.to_json(), mimetype="application/json")
+    response.set_etag(manifest.version)
+    response.make_conditional(flask.request)
+    return response
+
+
+@app.route(f"/{DELTA_PATH}")
+def serve_delta() -> flask.Response:
+    """Serve the files changed since the manifest version of a mirror, in a single archive.
+
+    Returns:
+        Streamed bundle of the files added or changed since the since query parameter, or
+        of all the files, flagged by the X-Manifest-Full header, if the version is missing or
+        unknown.
+    """
+    manifest = app.config["FILES_MANIFEST"]
+    base = app.config["MANIFESTS"].get(flask.request.args.get("since", ""))
+    response = flask.Response(stream_delta(manifest, base), mimetype="application/x-tar")
+    response.headers[MANIFEST_VERSION_HEADER] = manifest.version
+    if base:
+        response.headers[MANIFEST_BASE_HEADER] = base.version
+    else:
+        # Mirrors must replace their files rather than update them
+        response.headers[MANIFEST_FULL_HEADER] = "true"
+    return response
 
 
 @app.route("/")
-def index() -> tuple[str | flask.Response, int]:
+def index() -> flask.Response | tuple[str, int]:
     """Serve MOTD content based on user agent information.
 
     Returns:
-        MOTD content appropriate for the requesting system.
+        MOTD content appropriate for the requesting system, or 304 if the client copy is fresh.
     """
     version, arch, cloud = extract_user_agent_info(flask.request.user_agent.string)
 
-    motd = select_motd(app.config["PROCESSED_FILES"], version, arch, cloud)
-    if motd:
-        return motd, 200
+    filename, level = flask.g.content.router.resolve_route(version, arch, cloud)
+    metrics.MOTD_SELECTIONS.labels(level).inc()
+    response = serve_entry(filename, (version, arch, cloud))
+    if response:
+        # The selected content depends on the user agent, so shared caches must key on it
+        response.vary.add("User-Agent")
+        return response
 
     return "Not found", 404
 
 
 @app.route("/<path:filename>")
-def serve_file(filename: str) -> tuple[str | flask.Response, int]:
+def serve_file(filename: str) -> flask.Response | tuple[str, int]:
     """Serve non-MOTD files directly if they exist.
 
     Args:
         filename: Name of the file to serve.
 
     Returns:
-        File content if found, otherwise 404 error.
+        File content if found, 304 if the client copy is fresh, otherwise 404 error.
     """
-    if filename in app.config["PROCESSED_FILES"]:
-        return (
-            flask.Response(
-                app.config["PROCESSED_FILES"][filename], mimetype=get_mime_type(filename)
-            ),
-            200,
-        )
+    response = serve_entry(filename)
+    if response:
+        return response
 
     return "Not found", 404
+
+
+def serve_entry(
+    filename: str, client: tuple[str, str, str] | None = None
+) -> flask.Response | None:
+    """Build the response serving a file, picking one of its variants if it rotates.
+
+    Args:
+        filename: Name of the file to serve, may be empty.
+        client: Version, architecture and cloud filling the file if it is a template.
+
+    Returns:
+        Response serving the file, or None if there is no such file.
+    """
+    pin_header = app.config.get("VARIANT_PIN_HEADER")
+    identifier = flask.request.headers.get(pin_header) if pin_header else None
+    entry, variant = flask.g.content.get_entry(filename, identifier)
+    if not entry:
+        return None
+    flask.g.filename = filename
+    if client and entry.template:
+        entry = entry.template.render(*client)
+
+    response = entry_response(entry, flask.request)
+    if variant:
+        response.headers[VARIANT_HEADER] = variant
+        if pin_header:
+            response.vary.add(pin_header)
+    return response
+
+
+# Paths of the other routes, which the fast path must leave to Flask
+reserved_paths = [rule.rule for rule in app.url_map.iter_rules() if not rule.arguments]
+reserved_paths.remove("/")
+if app.config.get("FAST_PATH"):
+    fast_path = FastPath(app.wsgi_app, app.config, reloader, reserved_paths, access_log)
+    app.wsgi_app = fast_path  # type: ignore[method-assign]
+rate_limiter = create_rate_limiter(app.config)
+if rate_limiter is not None:
+    # Monitoring must keep working during a burst of clients
+    rate_limit = RateLimit(app.wsgi_app, rate_limiter, ["/metrics", f"/{HEALTH_PATH}"])
+    app.wsgi_app = rate_limit  # type: ignore[method-assign]
+profile_sample_rate = get_profile_sample_rate(app.config)
+if profile_sample_rate:
+    # Only the functions of the application are traced, the time of the libraries goes to them
+    prefixes = [os.path.dirname(metrics.__file__) + os.sep, __file__]
+    profiler = Profiler(app.wsgi_app, profile_sample_rate, prefixes)
+    app.wsgi_app = profiler  # type: ignore[method-assign]
@@ -0,0 +1,179 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Load test of the concurrent connection capacity of the sync and gevent worker classes.
+
+Every mode starts gunicorn, holds a number of idle client connections open, as slow or
+polling clients do, then measures how many fresh requests still get a response in time.
+Requires gunicorn and gevent, run from the motd-server-app directory:
+
+    PYTHONPATH=. python benchmarks/bench_concurrency.py
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+import urllib.error
+import urllib.request
+
+FILES = "index.txt: Welcome to Ubuntu\nindex-24.04.txt: Welcome to Ubuntu 24.04\n"
+USER_AGENT = "wget/1.21.4-1ubuntu4.1 Ubuntu/24.04.1/LTS GNU/Linux/6.8.0/x86_64 cloud_id/aws"
+
+
+def get_free_port() -> int:
+    """Get a TCP port nothing listens on.
+
+    Returns:
+        Port number.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def run_server(
+    worker_class: str,
+    workers: int,
+    files: str = FILES,
+    extra_env: dict[str, str] | None = None,
+) -> typing.Iterator[tuple[int, int]]:
+    """Run the application under gunicorn until the context exits.
+
+    Args:
+        worker_class: Gunicorn worker class.
+        workers: Number of workers.
+        files: YAML string defining files.
+        extra_env: Additional environment variables of the application.
+
+    Yields:
+        Tuple of (port the server listens on, PID of the gunicorn arbiter).
+    """
+    port = get_free_port()
+    # Large files don't fit in an environment variable
+    files_path = tempfile.NamedTemporaryFile("w", suffix=".yaml", encoding="utf-8")
+    files_path.write(files)
+    files_path.flush()
+    env = dict(os.environ, FLASK_FILES_PATH=files_path.name, **(extra_env or {}))
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    command = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        f"--worker-class={worker_class}",
+        f"--workers={workers}",
+        f"--bind=127.0.0.1:{port}",
+        "--timeout=60",
+        "app:app",
+    ]
+    with files_path, subprocess.Popen(command, env=env, stderr=subprocess.DEVNULL) as server:
+        try:
+            for _ in range(100):
+                with contextlib.suppress(OSError):
+                    socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                    break
+                time.sleep(0.1)
+            # Let every worker boot
+            time.sleep(1)
+            yield port, server.pid
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def open_idle_connections(port: int, count: int) -> list[socket.socket]:
+    """Open connections that send an incomplete request and stay silent.
+
+    Args:
+        port: Port of the server.
+        count: Number of connections.
+
+    Returns:
+        Open sockets.
+    """
+    connections = []
+    for _ in range(count):
+        connection = socket.create_connection(("127.0.0.1", port))
+        connection.sendall(b"GET / HTTP/1.1\r\nHost: localhost\r\n")
+        connections.append(connection)
+    return connections
+
+
+def probe(port: int, timeout: float) -> float | None:
+    """Send a request to the server.
+
+    Args:
+        port: Port of the server.
+        timeout: Time after which the request is given up.
+
+    Returns:
+        Latency of the request, or None if it failed or timed out.
+    """
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/", headers={"User-Agent": USER_AGENT}
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+    except (OSError, urllib.error.URLError):
+        return None
+    return time.perf_counter() - start
+
+
+def measure(port: int, idle: int, probes: int, timeout: float) -> tuple[int, float, float]:
+    """Measure the requests answered while idle connections are held open.
+
+    Args:
+        port: Port of the server.
+        idle: Number of idle connections to hold.
+        probes: Number of concurrent requests to send.
+        timeout: Time after which a request is given up.
+
+    Returns:
+        Tuple of (answered requests, p50 latency, p99 latency), latencies in milliseconds.
+    """
+    connections = open_idle_connections(port, idle)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=probes) as executor:
+            results = list(executor.map(lambda _: probe(port, timeout), range(probes)))
+    finally:
+        for connection in connections:
+            connection.close()
+    latencies = sorted(result * 1000 for result in results if result is not None)
+    if not latencies:
+        return 0, float("nan"), float("nan")
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return len(latencies), statistics.median(latencies), p99
+
+
+def main() -> None:
+    """Run the load test and print the answered requests for every mode and idle count."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--idle", type=int, nargs="+", default=[0, 2, 100, 500])
+    parser.add_argument("--probes", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8}{'idle':>6}{'answered':>12}{'p50':>10}{'p99':>10}")
+    for worker_class in ("sync", "gevent"):
+        with run_server(worker_class, args.workers) as (port, _):
+            for idle in args.idle:
+                answered, p50, p99 = measure(port, idle, args.probes, args.timeout)
+                print(
+                    f"{worker_class:<8}{idle:>6}{answered:>7}/{args.probes:<4}"
+                    f"{p50:>8.1f}ms{p99:>8.1f}ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Memory used by every gunicorn worker with and without the shared content store.
+
+Every mode starts gunicorn over the same files, passed either as YAML like the FILES and
+FILES_PATH configs or as a bundle like the charm does. Every representation of every file
+is requested a few times, so that each worker maps the pages it serves, then the memory of
+each worker is read from /proc. PSS charges every shared page to the processes mapping it
+in equal parts, so the sum of the PSS of the workers is the memory they use together.
+Requires gunicorn and Linux, run from the motd-server-app directory:
+
+    PYTHONPATH=. python benchmarks/bench_memory.py
+"""
+
+import argparse
+import io
+import pathlib
+import random
+import tarfile
+import tempfile
+import urllib.request
+
+import yaml
+
+from benchmarks.bench_concurrency import run_server
+from benchmarks.suite import ARCHS, CLOUDS, generate_versions
+from motd_server.metrics import read_memory_usage
+
+WORDS = (
+    "ubuntu livepatch security update kernel esm pro canonical support release lts cloud "
+    "snap package upgrade available news week server desktop noble jammy focal machine"
+).split()
+ENCODINGS = ("identity", "gzip", "br")
+MEMORY_KINDS = ("rss", "pss", "private", "shared")
+
+
+def generate_text_files(versions: list[str], file_size: int, seed: int = 0) -> dict[str, str]:
+    """Generate MOTDs of random words, which compress about as well as real ones.
+
+    Args:
+        versions: Ubuntu versions.
+        file_size: Approximate size of each file, in bytes.
+        seed: Seed of the random words.
+
+    Returns:
+        Dictionary mapping of filenames to their content.
+    """
+    rng = random.Random(seed)
+    keys = ["index.txt"] + [f"index-{cloud}.txt" for cloud in CLOUDS]
+    for version in versions:
+        keys.append(f"index-{version}.txt")
+        for arch in ARCHS:
+            keys.append(f"index-{version}-{arch}.txt")
+            keys.extend(f"index-{version}-{arch}-{cloud}.txt" for cloud in CLOUDS)
+    files = {}
+    for key in keys:
+        words = []
+        while sum(len(word) + 1 for word in words) < file_size:
+            words.append(rng.choice(WORDS))
+        files[key] = " ".join(words)
+    return files
+
+
+def write_bundle(path: str, files: dict[str, str]) -> None:
+    """Write the files as a bundle, as the charm does.
+
+    Args:
+        path: Path of the bundle.
+        files: Dictionary mapping of filenames to their content.
+    """
+    with tarfile.open(path, "w", format=tarfile.PAX_FORMAT) as tar:
+        for filename, content in files.items():
+            data = content.encode("utf-8")
+            member = tarfile.TarInfo(filename)
+            member.size = len(data)
+            tar.addfile(member, io.BytesIO(data))
+
+
+def request_files(port: int, filenames: list[str], repeat: int) -> None:
+    """Request every representation of every file.
+
+    Args:
+        port: Port of the server.
+        filenames: Files to request.
+        repeat: Number of times each representation is requested.
+    """
+    for filename in filenames:
+        for encoding in ENCODINGS:
+            request = urllib.request.Request(
+                f"http://127.0.0.1:{port}/{filename}", headers={"Accept-Encoding": encoding}
+            )
+            for _ in range(repeat):
+                with urllib.request.urlopen(request, timeout=10) as response:  # nosec B310
+                    response.read()
+
+
+def get_worker_memory(arbiter_pid: int) -> list[dict[str, int]]:
+    """Get the memory usage of the workers of a gunicorn arbiter.
+
+    Args:
+        arbiter_pid: PID of the gunicorn arbiter.
+
+    Returns:
+        Memory usage of every worker, by kind, in bytes.
+    """
+    children = pathlib.Path(f"/proc/{arbiter_pid}/task/{arbiter_pid}/children").read_text(
+        encoding="utf-8"
+    )
+    return [read_memory_usage(f"/proc/{pid}/smaps_rollup") for pid in children.split()]
+
+
+def main() -> None:  # pylint: disable=too-many-locals
+    """Run every mode and print the mean memory of the workers and their total PSS, in MiB."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--versions", type=int, default=6)
+    parser.add_argument("--file-size", type=int, default=8192)
+    args = parser.parse_args()
+
+    files = generate_text_files(generate_versions(args.versions), args.file_size)
+    size = sum(len(content) for content in files.values())
+    print(f"files: {len(files)} ({size / 2**20:.1f} MiB), {args.workers} sync workers\n")
+    print(f"{'source':<8}{'store':<7}" + "".join(f"{kind:>9}" for kind in MEMORY_KINDS), end="")
+    print(f"{'total pss':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        bundle_path = f"{directory}/files.tar"
+        write_bundle(bundle_path, files)
+        sources = {"yaml": {}, "bundle": {"FLASK_FILES_BUNDLE": bundle_path}}
+        for source, source_env in sources.items():
+            for store, store_env in (("off", {}), ("on", {"FLASK_CONTENT_STORE": directory})):
+                extra_env = {**source_env, **store_env}
+                with run_server("sync", args.workers, yaml.safe_dump(files), extra_env) as (
+                    port,
+                    pid,
+                ):
+                    request_files(port, list(files), args.workers * 2)
+                    workers = get_worker_memory(pid)
+                mean = [
+                    sum(worker[kind] for worker in workers) / len(workers) / 2**20
+                    for kind in MEMORY_KINDS
+                ]
+                total = sum(worker["pss"] for worker in workers) / 2**20
+                print(
+                    f"{source:<8}{store:<7}" + "".join(f"{value:>9.1f}" for value in mean), end=""
+                )
+                print(f"{total:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
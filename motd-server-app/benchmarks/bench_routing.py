@@ -0,0 +1,89 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Micro-benchmark of MOTD selection: per-request candidates vs precompiled router.
+
+Run from the motd-server-app directory:
+
+    PYTHONPATH=. python benchmarks/bench_routing.py
+"""
+
+import argparse
+import itertools
+import random
+import time
+
+from motd_server.motd import MotdRouter, extract_user_agent_info, select_motd
+
+VERSIONS = ["20.04", "22.04", "24.04", "24.10", "25.04"]
+ARCHS = ["amd64", "arm64", "s390x", "ppc64el"]
+CLOUDS = ["aws", "azure", "gce", "oracle"]
+
+
+def generate_files() -> dict[str, str]:
+    """Generate a files map with every MOTD key combination.
+
+    Returns:
+        Dictionary mapping of filenames to their content.
+    """
+    files = {"index.txt": "index"}
+    for version, arch, cloud in itertools.product(VERSIONS, ARCHS, CLOUDS):
+        for key in (
+            f"index-{version}-{arch}-{cloud}.txt",
+            f"index-{version}-{arch}.txt",
+            f"index-{version}.txt",
+            f"index-{cloud}.txt",
+        ):
+            files[key] = key
+    return files
+
+
+def generate_user_agents(count: int) -> list[str]:
+    """Generate a list of user agents, including some unknown values.
+
+    Args:
+        count: Number of user agents to generate.
+
+    Returns:
+        List of user agent strings.
+    """
+    rng = random.Random(0)
+    user_agents = []
+    for _ in range(count):
+        version = rng.choice(VERSIONS + ["18.04"])
+        arch = rng.choice(ARCHS + ["riscv64"])
+        cloud = rng.choice(CLOUDS + ["lxd"])
+        user_agents.append(
+            f"wget/1.21.4-1ubuntu4.1 Ubuntu/{version}.1/LTS GNU/Linux/6.8.0/{arch} "
+            f"cloud_id/{cloud}"
+        )
+    return user_agents
+
+
+def main() -> None:
+    """Run the benchmark and print lookups per second for both strategies."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+
+    files = generate_files()
+    requests = [extract_user_agent_info(ua) for ua in generate_user_agents(args.requests)]
+
+    start = time.perf_counter()
+    for version, arch, cloud in requests:
+        select_motd(files, version, arch, cloud)
+    before = args.requests / (time.perf_counter() - start)
+
+    router = MotdRouter(files)
+    start = time.perf_counter()
+    for version, arch, cloud in requests:
+        router.resolve(version, arch, cloud)
+    after = args.requests / (time.perf_counter() - start)
+
+    print(f"files: {len(files)}, routes: {len(router)}, requests: {args.requests}")
+    print(f"select_motd:        {before:>12,.0f} req/s")
+    print(f"MotdRouter.resolve: {after:>12,.0f} req/s ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
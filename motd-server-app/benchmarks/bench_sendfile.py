@@ -0,0 +1,118 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Load test of the serving of large files from memory and from the content store.
+
+The application runs under gunicorn with a large JSON file, with and without the content
+store. Without it the body is copied through Python on every request, with it gunicorn sends
+it with sendfile(2) from the store file. Clients download the file concurrently, and the
+throughput and the CPU time the workers spend per request, read from /proc, are compared.
+Requires gunicorn, run from the motd-server-app directory:
+
+    PYTHONPATH=. python benchmarks/bench_sendfile.py
+"""
+
+import argparse
+import concurrent.futures
+import http.client
+import json
+import os
+import pathlib
+import random
+import tempfile
+import time
+
+from benchmarks.bench_concurrency import run_server
+
+
+def get_workers_cpu(arbiter_pid: int) -> float:
+    """Get the CPU time used by the gunicorn workers so far.
+
+    Args:
+        arbiter_pid: PID of the gunicorn arbiter.
+
+    Returns:
+        User and system time of the workers, in seconds.
+    """
+    children = pathlib.Path(f"/proc/{arbiter_pid}/task/{arbiter_pid}/children").read_text(
+        encoding="ascii"
+    )
+    ticks = 0
+    for pid in children.split():
+        stat = pathlib.Path(f"/proc/{pid}/stat").read_text(encoding="ascii")
+        # The fields after the command name, utime and stime being the 12th and 13th
+        fields = stat.rsplit(")", 1)[1].split()
+        ticks += int(fields[11]) + int(fields[12])
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+
+def download(port: int, requests: int) -> int:
+    """Download the large file repeatedly over a single connection.
+
+    Args:
+        port: Port of the server.
+        requests: Number of requests.
+
+    Returns:
+        Number of bytes received.
+    """
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    received = 0
+    for _ in range(requests):
+        connection.request("GET", "/large.json")
+        received += len(connection.getresponse().read())
+    connection.close()
+    return received
+
+
+def measure(port: int, pid: int, clients: int, requests: int) -> tuple[int, float, float]:
+    """Download the large file from concurrent clients.
+
+    Args:
+        port: Port of the server.
+        pid: PID of the gunicorn arbiter.
+        clients: Number of concurrent clients.
+        requests: Number of requests of each client.
+
+    Returns:
+        Tuple of (bytes received, elapsed seconds, CPU seconds of the workers).
+    """
+    cpu = get_workers_cpu(pid)
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(clients) as executor:
+        received = sum(executor.map(lambda _: download(port, requests), range(clients)))
+    return received, time.perf_counter() - start, get_workers_cpu(pid) - cpu
+
+
+def main() -> None:
+    """Run the load test and print the throughput and worker CPU time of both modes."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=4 * 1024 * 1024)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    # Random digits compress poorly, like the large payloads already compact
+    items = [rng.getrandbits(64) for _ in range(args.size // 21)]
+    files = f"large.json: '{json.dumps(items)}'\n"
+
+    print(f"{'mode':<8}{'size':>10}{'req/s':>10}{'MiB/s':>10}{'cpu/req':>12}")
+    with tempfile.TemporaryDirectory() as store_directory:
+        for mode, extra_env in (
+            ("memory", {}),
+            ("store", {"FLASK_CONTENT_STORE": store_directory}),
+        ):
+            with run_server("sync", args.workers, files, extra_env) as (port, pid):
+                download(port, args.workers)
+                received, seconds, cpu = measure(port, pid, args.clients, args.requests)
+            requests = args.clients * args.requests
+            print(
+                f"{mode:<8}{received // requests:>10}{requests / seconds:>10.1f}"
+                f"{received / seconds / 2**20:>10.1f}{cpu / requests * 1000:>10.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
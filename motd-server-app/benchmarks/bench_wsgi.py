@@ -0,0 +1,77 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Micro-benchmark of the per-request overhead of the Flask application and the fast path.
+
+Run from the motd-server-app directory:
+
+    PYTHONPATH=. python benchmarks/bench_wsgi.py
+"""
+
+import argparse
+import time
+import typing
+
+from app import app, reloader
+from motd_server.motd import process_config
+from motd_server.wsgi import FastPath, WSGIApplication
+
+FILES = """
+index.txt: Welcome to Ubuntu
+index-24.04.txt: Welcome to Ubuntu 24.04
+index-24.04-amd64-aws.txt: Welcome to Ubuntu 24.04 on AWS
+aptnews.json: '{"news": []}'
+"""
+USER_AGENT = "wget/1.21.4-1ubuntu4.1 Ubuntu/24.04.1/LTS GNU/Linux/6.8.0/amd64 cloud_id/aws"
+
+
+def start_response(*_: typing.Any) -> None:
+    """Discard the response status and headers."""
+
+
+def measure(wsgi_app: WSGIApplication, path: str, requests: int) -> float:
+    """Measure the time a WSGI application takes to answer a request.
+
+    Args:
+        wsgi_app: WSGI application to call.
+        path: Path of the request.
+        requests: Number of requests.
+
+    Returns:
+        Mean duration of a request, in microseconds.
+    """
+    environ: dict[str, typing.Any] = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "8000",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "wsgi.url_scheme": "http",
+        "HTTP_USER_AGENT": USER_AGENT,
+        "HTTP_ACCEPT_ENCODING": "gzip",
+    }
+    start = time.perf_counter()
+    for _ in range(requests):
+        b"".join(wsgi_app(dict(environ), start_response))
+    return (time.perf_counter() - start) / requests * 1_000_000
+
+
+def main() -> None:
+    """Run the benchmark and print the request durations of both paths."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    app.config["FILES"] = FILES
+    process_config(app.config)
+    fast_path = FastPath(app.wsgi_app, app.config, reloader, ["/metrics"])
+
+    print(f"{'path':<16}{'Flask':>12}{'fast path':>12}")
+    for path in ("/", "/aptnews.json"):
+        flask = measure(app, path, args.requests)
+        fast = measure(fast_path, path, args.requests)
+        print(f"{path:<16}{flask:>10.1f}us{fast:>10.1f}us ({flask / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
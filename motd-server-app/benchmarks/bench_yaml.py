@@ -0,0 +1,79 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark of loading the files YAML with the pure-Python and libyaml loaders.
+
+Run from the motd-server-app directory:
+
+    PYTHONPATH=. python benchmarks/bench_yaml.py
+"""
+
+import argparse
+import functools
+import time
+
+import yaml
+
+from motd_server.motd import process_config
+
+# Number of files and lines per file of each files map
+SIZES = {"small": (10, 5), "medium": (200, 20), "large": (2000, 50)}
+
+
+def generate_files_yaml(file_count: int, line_count: int) -> str:
+    """Generate a files YAML string.
+
+    Args:
+        file_count: Number of files.
+        line_count: Number of lines per file.
+
+    Returns:
+        YAML string defining files.
+    """
+    lines = "".join(f"  Line {line} of the message of the day\n" for line in range(line_count))
+    return "".join(f"index-{index}.txt: |\n{lines}\n" for index in range(file_count))
+
+
+def measure(function: object, repeat: int) -> float:
+    """Get the best duration of a function over several runs.
+
+    Args:
+        function: Function to call without arguments.
+        repeat: Number of runs.
+
+    Returns:
+        Best duration, in seconds.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()  # type: ignore[operator]
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def main() -> None:
+    """Run the benchmark and print the load durations for every size."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'size':<8}{'bytes':>12}{'SafeLoader':>14}{'CSafeLoader':>14}{'process_config':>16}")
+    for name, (file_count, line_count) in SIZES.items():
+        files_yaml = generate_files_yaml(file_count, line_count)
+        python = measure(
+            functools.partial(yaml.load, files_yaml, Loader=yaml.SafeLoader), args.repeat
+        )
+        if hasattr(yaml, "CSafeLoader"):
+            load = functools.partial(yaml.load, files_yaml, Loader=yaml.CSafeLoader)
+            duration = measure(load, args.repeat)
+            libyaml = f"{duration:>13.3f}s"
+        else:
+            libyaml = f"{'n/a':>14}"
+        config = {"FILES": files_yaml}
+        processing = measure(functools.partial(process_config, config), args.repeat)
+        print(f"{name:<8}{len(files_yaml):>12}{python:>13.3f}s{libyaml}{processing:>15.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark suite of the MOTD server: micro-benchmarks of the request stages and a load test.
+
+The suite generates a synthetic files configuration and a realistic distribution of user
+agents. It replays them against every stage of a request, then against the application
+running under gunicorn. It reports the p50 and p99 latencies and the throughput of each,
+along with the RSS of every worker. The results can be saved and compared with a baseline,
+failing on regressions. Run from the motd-server-app directory:
+
+    tox -e bench
+    tox -e bench -- --save baseline.json
+    tox -e bench -- --baseline baseline.json
+"""
+
+import argparse
+import dataclasses
+import http.client
+import json
+import pathlib
+import random
+import statistics
+import sys
+import threading
+import time
+import typing
+
+from app import app, reloader
+from benchmarks.bench_concurrency import run_server
+from motd_server.motd import MotdRouter, extract_user_agent_info, process_config, select_motd
+from motd_server.wsgi import FastPath
+
+ARCHS = ["amd64", "arm64", "ppc64el", "s390x", "riscv64", "armhf", "i386"]
+CLOUDS = ["aws", "azure", "gce", "oracle", "openstack", "lxd", "ibm", "digitalocean"]
+KERNELS = ["5.15.0", "6.5.0", "6.8.0", "6.11.0", "6.14.0"]
+# Shares of the user agents that are not from Ubuntu machines, or from ones outside clouds
+OTHER_CLIENT_SHARE = 0.02
+EMPTY_USER_AGENT_SHARE = 0.01
+NO_CLOUD_SHARE = 0.3
+
+
+@dataclasses.dataclass(frozen=True)
+class Result:
+    """Measurements of a benchmark.
+
+    Attributes:
+        p50: Median latency, in microseconds.
+        p99: 99th percentile latency, in microseconds.
+        rate: Operations per second.
+    """
+
+    p50: float
+    p99: float
+    rate: float
+
+
+def generate_tokens(known: list[str], count: int, prefix: str) -> list[str]:
+    """Generate a list of tokens, starting with the known ones.
+
+    Args:
+        known: Known tokens, from the most to the least common.
+        count: Number of tokens.
+        prefix: Prefix of the synthetic tokens generated past the known ones.
+
+    Returns:
+        List of tokens.
+    """
+    return (known + [f"{prefix}{index}" for index in range(count - len(known))])[:count]
+
+
+def generate_versions(count: int) -> list[str]:
+    """Generate Ubuntu versions, from the most recent.
+
+    Args:
+        count: Number of versions.
+
+    Returns:
+        List of versions.
+    """
+    versions = []
+    year, month = 26, 4
+    for _ in range(count):
+        versions.append(f"{year:02d}.{month:02d}")
+        year, month = (year, 4) if month == 10 else (year - 1, 10)
+    return versions
+
+
+def generate_files(
+    versions: list[str], archs: list[str], clouds: list[str], file_size: int
+) -> str:
+    """Generate a files configuration with MOTDs for every combination.
+
+    Args:
+        versions: Ubuntu versions.
+        archs: Architectures.
+        clouds: Clouds.
+        file_size: Approximate size of each file, in bytes.
+
+    Returns:
+        YAML string defining files.
+    """
+    keys = ["index.txt"] + [f"index-{cloud}.txt" for cloud in clouds]
+    for version in versions:
+        keys.append(f"index-{version}.txt")
+        for arch in archs:
+            keys.append(f"index-{version}-{arch}.txt")
+            keys.extend(f"index-{version}-{arch}-{cloud}.txt" for cloud in clouds)
+    line = "  Welcome to Ubuntu, see https://ubuntu.com for the news of the day.\n"
+    body = line * max(1, file_size // len(line))
+    files = "".join(f"{key}: |\n  {key}\n{body}" for key in keys)
+    return files + 'aptnews.json: \'{"version": 1, "news": []}\'\n'
+
+
+def zipf_weights(count: int) -> list[float]:
+    """Get weights where the first items are much more common than the last ones.
+
+    Args:
+        count: Number of items.
+
+    Returns:
+        Weight of every item.
+    """
+    return [1 / (rank + 1) for rank in range(count)]
+
+
+def generate_user_agents(  # pylint: disable=too-many-locals
+    count: int, versions: list[str], archs: list[str], clouds: list[str], seed: int = 0
+) -> list[str]:
+    """Generate user agents following the distribution of a fleet of Ubuntu machines.
+
+    The most recent versions, amd64 and the largest clouds dominate. Some machines run an
+    unsupported version or are outside clouds, and some clients are not Ubuntu machines.
+
+    Args:
+        count: Number of user agents.
+        versions: Ubuntu versions, from the most common.
+        archs: Architectures, from the most common.
+        clouds: Clouds, from the most common.
+        seed: Seed of the random generator.
+
+    Returns:
+        List of user agent strings.
+    """
+    rng = random.Random(seed)
+    all_versions = versions + ["14.04"]
+    version_weights = zipf_weights(len(all_versions))
+    arch_weights = zipf_weights(len(archs))
+    cloud_weights = zipf_weights(len(clouds))
+    build_weights = zipf_weights(100)
+    user_agents = []
+    for _ in range(count):
+        draw = rng.random()
+        if draw < EMPTY_USER_AGENT_SHARE:
+            user_agents.append("")
+            continue
+        if draw < EMPTY_USER_AGENT_SHARE + OTHER_CLIENT_SHARE:
+            user_agents.append(f"curl/8.{rng.randrange(10)}.0")
+            continue
+        version = rng.choices(all_versions, version_weights)[0]
+        arch = rng.choices(archs, arch_weights)[0]
+        kernel = f"{rng.choice(KERNELS)}-{rng.choices(range(100), build_weights)[0]}-generic"
+        user_agent = (
+            f"wget/1.21.4-1ubuntu4.1 Ubuntu/{version}.{rng.randrange(4)}/LTS "
+            f"GNU/Linux/{kernel}/{arch}"
+        )
+        if rng.random() >= NO_CLOUD_SHARE:
+            user_agent += f" cloud_id/{rng.choices(clouds, cloud_weights)[0]}"
+        user_agents.append(user_agent)
+    return user_agents
+
+
+def summarize(durations: list[float], elapsed: float) -> Result:
+    """Summarize the durations of operations.
+
+    Args:
+        durations: Duration of every operation, in seconds.
+        elapsed: Time the operations took overall, in seconds.
+
+    Returns:
+        Measurements of the operations.
+    """
+    ordered = sorted(durations)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return Result(
+        p50=statistics.median(ordered) * 1_000_000,
+        p99=p99 * 1_000_000,
+        rate=len(ordered) / elapsed,
+    )
+
+
+def time_calls(
+    function: typing.Callable[..., typing.Any], arguments: list[tuple[typing.Any, ...]]
+) -> Result:
+    """Time the calls of a function.
+
+    Args:
+        function: Function to call.
+        arguments: Positional arguments of every call.
+
+    Returns:
+        Measurements of the calls.
+    """
+    durations = []
+    perf_counter = time.perf_counter
+    start = perf_counter()
+    for call_arguments in arguments:
+        call_start = perf_counter()
+        function(*call_arguments)
+        durations.append(perf_counter() - call_start)
+    return summarize(durations, perf_counter() - start)
+
+
+def make_environ(user_agent: str) -> dict[str, typing.Any]:
+    """Build the WSGI environment of a MOTD request.
+
+    Args:
+        user_agent: User agent of the request.
+
+    Returns:
+        WSGI environment.
+    """
+    return {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": "/",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "8000",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "wsgi.url_scheme": "http",
+        "HTTP_USER_AGENT": user_agent,
+        "HTTP_ACCEPT_ENCODING": "gzip",
+    }
+
+
+def call_wsgi(wsgi_app: typing.Callable[..., typing.Iterable[bytes]], user_agent: str) -> None:
+    """Send a MOTD request to a WSGI application and consume the response.
+
+    Args:
+        wsgi_app: WSGI application.
+        user_agent: User agent of the request.
+    """
+    b"".join(wsgi_app(make_environ(user_agent), lambda *_: None))
+
+
+def run_stages(files: str, user_agents: list[str]) -> dict[str, Result]:
+    """Benchmark every stage of a MOTD request in process.
+
+    Args:
+        files: YAML string defining files.
+        user_agents: User agents to replay.
+
+    Returns:
+        Measurements by stage.
+    """
+    app.config["FILES"] = files
+    process_config(app.config)
+    content = app.config["MOTD_CONTENT"]
+    fast_path = FastPath(app.wsgi_app, app.config, reloader, ["/metrics"])
+
+    results = {}
+    single = [(user_agent,) for user_agent in user_agents]
+    results["extract_user_agent_info (uncached)"] = time_calls(
+        extract_user_agent_info.__wrapped__, single
+    )
+    extract_user_agent_info.cache_clear()
+    results["extract_user_agent_info"] = time_calls(extract_user_agent_info, single)
+    infos = [extract_user_agent_info(user_agent) for user_agent in user_agents]
+    results["select_motd"] = time_calls(select_motd, [(content.files, *info) for info in infos])
+    results["MotdRouter build"] = time_calls(MotdRouter, [(content.files,)])
+    results["MotdRouter.resolve_route"] = time_calls(content.router.resolve_route, infos)
+    results["Flask application"] = time_calls(call_wsgi, [(app, *args) for args in single])
+    results["fast path"] = time_calls(call_wsgi, [(fast_path, *args) for args in single])
+    return results
+
+
+def replay(port: int, user_agents: list[str], clients: int) -> Result:
+    """Replay user agents against a running server from concurrent clients.
+
+    Args:
+        port: Port of the server.
+        user_agents: User agents to replay, one request each.
+        clients: Number of concurrent clients.
+
+    Returns:
+        Measurements of the requests.
+    """
+    durations: list[float] = []
+
+    def client(client_user_agents: list[str]) -> None:
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        client_durations = []
+        for user_agent in client_user_agents:
+            start = time.perf_counter()
+            connection.request("GET", "/", headers={"User-Agent": user_agent})
+            connection.getresponse().read()
+            client_durations.append(time.perf_counter() - start)
+        connection.close()
+        durations.extend(client_durations)
+
+    threads = [
+        threading.Thread(target=client, args=(user_agents[index::clients],))
+        for index in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(durations, time.perf_counter() - start)
+
+
+def get_worker_rss(arbiter_pid: int) -> list[int]:
+    """Get the resident set size of the workers of a gunicorn arbiter.
+
+    Args:
+        arbiter_pid: PID of the gunicorn arbiter.
+
+    Returns:
+        RSS of every worker, in kB, or an empty list where /proc is not available.
+    """
+    try:
+        children = pathlib.Path(f"/proc/{arbiter_pid}/task/{arbiter_pid}/children").read_text(
+            encoding="utf-8"
+        )
+        rss: list[int] = []
+        for pid in children.split():
+            status = pathlib.Path(f"/proc/{pid}/status").read_text(encoding="utf-8")
+            rss.extend(
+                int(line.split()[1]) for line in status.splitlines() if line.startswith("VmRSS:")
+            )
+    except OSError:
+        return []
+    return rss
+
+
+def compare(results: dict[str, Result], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """Find the benchmarks whose throughput regressed compared to a baseline.
+
+    Args:
+        results: Measurements by benchmark.
+        baseline: Baseline measurements by benchmark, as saved.
+        tolerance: Fraction of the baseline throughput that may be lost.
+
+    Returns:
+        Descriptions of the regressions.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]["rate"]
+        if result.rate < expected * (1 - tolerance):
+            regressions.append(f"{name}: {result.rate:,.0f}/s, baseline {expected:,.0f}/s")
+    return regressions
+
+
+def main() -> None:  # pylint: disable=too-many-locals
+    """Run the benchmark suite, print the results and check them against a baseline."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--versions", type=int, default=10)
+    parser.add_argument("--archs", type=int, default=4)
+    parser.add_argument("--clouds", type=int, default=6)
+    parser.add_argument("--file-size", type=int, default=1024)
+    parser.add_argument("--user-agents", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--worker-class", default="sync")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--save", type=pathlib.Path)
+    parser.add_argument("--baseline", type=pathlib.Path)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    versions = generate_versions(args.versions)
+    archs = generate_tokens(ARCHS, args.archs, "arch")
+    clouds = generate_tokens(CLOUDS, args.clouds, "cloud")
+    files = generate_files(versions, archs, clouds, args.file_size)
+    user_agents = generate_user_agents(args.user_agents, versions, archs, clouds)
+    print(
+        f"files: {files.count(': ')} ({len(files):,} bytes), "
+        f"user agents: {len(user_agents):,} ({len(set(user_agents)):,} distinct)\n"
+    )
+
+    results = run_stages(files, user_agents)
+    load_test = f"gunicorn {args.worker_class} x{args.workers}, {args.clients} clients"
+    with run_server(args.worker_class, args.workers, files) as (port, pid):
+        results[load_test] = replay(port, user_agents[: args.requests], args.clients)
+        rss = get_worker_rss(pid)
+
+    print(f"{'benchmark':<44}{'p50':>12}{'p99':>12}{'ops/s':>14}")
+    for name, result in results.items():
+        print(f"{name:<44}{result.p50:>10.1f}us{result.p99:>10.1f}us{result.rate:>14,.0f}")
+    print(f"\nRSS per worker: {', '.join(f'{value / 1024:.1f} MiB' for value in rss) or 'n/a'}")
+
+    if args.save:
+        saved = {name: dataclasses.asdict(result) for name, result in results.items()}
+        args.save.write_text(json.dumps(saved, indent=2), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
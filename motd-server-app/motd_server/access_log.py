@@ -0,0 +1,153 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Sampled JSON access log written off the request threads.
+
+Each sampled request is put on a bounded in-memory queue as a log record holding its
+fields. A background thread formats the records as JSON lines and writes them, so requests
+never wait for the output. Records arriving while the queue is full are dropped and counted
+rather than blocking the request.
+"""
+
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import typing
+
+from motd_server.metrics import ACCESS_LOG_DROPS
+from motd_server.motd import extract_user_agent_info
+
+ACCESS_LOGGER_NAME = "motd_server.access"
+DEFAULT_QUEUE_SIZE = 10000
+
+logger = logging.getLogger(__name__)
+
+
+class JsonFormatter(logging.Formatter):
+    """Format access log records as JSON lines."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format a record.
+
+        Args:
+            record: Record holding the fields of a request in its access attribute.
+
+        Returns:
+            JSON object with the time of the request and its fields.
+        """
+        timestamp = datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+        return json.dumps(
+            {
+                "time": timestamp.isoformat(timespec="milliseconds"),
+                **getattr(record, "access", {}),
+            },
+            separators=(",", ":"),
+        )
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler dropping the records that don't fit in the queue."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Leave the record as is, it is formatted by the background thread.
+
+        Args:
+            record: Record to enqueue.
+
+        Returns:
+            The same record.
+        """
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put a record on the queue without waiting.
+
+        Args:
+            record: Record to enqueue.
+        """
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            ACCESS_LOG_DROPS.inc()
+
+
+class AccessLog:
+    """Sampled access log of the requests."""
+
+    def __init__(
+        self,
+        sample_rate: float,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        stream: typing.TextIO = sys.stdout,
+    ):
+        """Start the background thread writing the access log.
+
+        Args:
+            sample_rate: Share of the requests logged, between 0 and 1.
+            queue_size: Maximum number of records waiting to be written.
+            stream: Stream the access log is written to.
+        """
+        self.sample_rate = sample_rate
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(JsonFormatter())
+        records: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._listener = logging.handlers.QueueListener(records, handler)
+        self._logger = logging.getLogger(ACCESS_LOGGER_NAME)
+        self._logger.setLevel(logging.INFO)
+        # Access records only go to the access log, whatever the root logger does
+        self._logger.propagate = False
+        self._logger.handlers = [DroppingQueueHandler(records)]
+        self._listener.start()
+        self._running = True
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Write the records left in the queue and stop the background thread."""
+        if self._running:
+            self._running = False
+            self._listener.stop()
+
+    def log(self, user_agent: str, seconds: float, **fields: typing.Any) -> None:
+        """Log a request if it is sampled.
+
+        Args:
+            user_agent: User agent of the client, only parsed if the request is sampled.
+            seconds: Time spent answering the request.
+            fields: Route, path, key of the file served, status and bytes of the response.
+        """
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:  # nosec B311
+            return
+        version, arch, cloud = extract_user_agent_info(user_agent)
+        access = {
+            **fields,
+            "version": version,
+            "arch": arch,
+            "cloud": cloud,
+            "latency_ms": round(seconds * 1000, 3),
+        }
+        self._logger.info("access", extra={"access": access})
+
+
+def create_access_log(config: typing.Mapping[str, typing.Any]) -> AccessLog | None:
+    """Create the access log configured by ACCESS_LOG_SAMPLE_RATE and ACCESS_LOG_QUEUE_SIZE.
+
+    Args:
+        config: Application configuration.
+
+    Returns:
+        Access log, or None if no request is sampled.
+    """
+    try:
+        sample_rate = min(max(float(config.get("ACCESS_LOG_SAMPLE_RATE", 0)), 0.0), 1.0)
+        queue_size = int(config.get("ACCESS_LOG_QUEUE_SIZE", DEFAULT_QUEUE_SIZE))
+    except (TypeError, ValueError) as e:
+        logger.error("Invalid access log configuration, the access log is disabled: %s", e)
+        return None
+    if not sample_rate:
+        return None
+    return AccessLog(sample_rate, queue_size)
@@ -0,0 +1,156 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Content bundles shared by the workers through the page cache.
+
+A bundle is an uncompressed tar archive. It is memory-mapped read-only, and every file
+is served from a view of the mapping, so all the workers share the same pages and
+loading it doesn't parse any YAML.
+
+The variants of a rotating file are stored as members with the same name, whose PAX
+headers prefixed with MOTD. hold the settings of the variant, MOTD.variant being its index.
+The settings of a file, such as its schedule, are held by the headers of all its members.
+"""
+
+import datetime
+import logging
+import mmap
+import os
+import tarfile
+
+from motd_server.content import ContentLoadError
+from motd_server.metrics import CONTENT_LOAD_FAILURES
+from motd_server.schedule import FILE_SETTINGS
+
+METADATA_PREFIX = "MOTD."
+
+logger = logging.getLogger(__name__)
+
+
+def load_bundle(bundle_path: str) -> dict[str, memoryview | list[dict] | dict]:
+    """Map the files of a bundle without copying them, if it can be read.
+
+    Args:
+        bundle_path: Path of the bundle.
+
+    Returns:
+        Dictionary mapping of filenames to their content or definition, as read_bundle
+        returns them, empty if the bundle can't be read.
+    """
+    try:
+        return read_bundle(bundle_path)
+    except ContentLoadError:
+        return {}
+
+
+def read_bundle(bundle_path: str) -> dict[str, memoryview | list[dict] | dict]:
+    """Map the files of a bundle without copying them.
+
+    Args:
+        bundle_path: Path of the bundle.
+
+    Returns:
+        Dictionary mapping of filenames to read-only views of their content, to the list
+        of their variants with their settings for rotating files, or to their definition
+        with their content and settings for files with settings.
+
+    Raises:
+        ContentLoadError: If the bundle can't be read, for example if it is truncated.
+    """
+    try:
+        with open(bundle_path, "rb") as bundle_file:
+            # The archive is read through the same file descriptor as the mapping, so a
+            # bundle replaced in the meantime can't mix up offsets
+            with tarfile.open(fileobj=bundle_file, mode="r:") as tar:
+                members = [member for member in tar if member.isfile()]
+                end = tar.offset
+            # tarfile stops silently at a truncated member, so a bundle being written is
+            # only recognized by its missing end-of-archive blocks
+            if os.fstat(bundle_file.fileno()).st_size < end + 2 * tarfile.BLOCKSIZE:
+                raise tarfile.ReadError("unexpected end of the bundle")
+            if not members:
+                return {}
+            bundle = mmap.mmap(bundle_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, tarfile.TarError) as e:
+        logger.error("Could not load FLASK_FILES_BUNDLE: %s", e)
+        CONTENT_LOAD_FAILURES.inc()
+        raise ContentLoadError(f"Could not load FLASK_FILES_BUNDLE: {e}") from e
+
+    view = memoryview(bundle)
+    definitions: dict[str, dict] = {}
+    for member in members:
+        body = view[member.offset_data : member.offset_data + member.size]
+        metadata = {
+            key.removeprefix(METADATA_PREFIX): value
+            for key, value in member.pax_headers.items()
+            if key.startswith(METADATA_PREFIX)
+        }
+        definition = definitions.setdefault(member.name, {})
+        definition.update((key, metadata.pop(key)) for key in FILE_SETTINGS if key in metadata)
+        if metadata.pop("variant", None) is None:
+            definition["content"] = body
+        else:
+            definition.setdefault("content", []).append({**metadata, "content": body})
+
+    return {
+        filename: definition if len(definition) > 1 else definition["content"]
+        for filename, definition in definitions.items()
+    }
+
+
+def get_bundle_members(definition: object) -> list[tuple[dict[str, str], bytes]]:
+    """Get the members a file is bundled as, the inverse of load_bundle.
+
+    Args:
+        definition: Content of the file, list of its variants, or mapping of its content
+            and settings.
+
+    Returns:
+        List of (metadata, data) pairs, the metadata being the PAX headers of the member
+        without their prefix.
+    """
+    settings: dict = {}
+    content = definition
+    if isinstance(definition, dict):
+        settings = {key: value for key, value in definition.items() if key != "content"}
+        content = definition.get("content", "")
+    if not isinstance(content, list):
+        return [(format_metadata(settings), encode_member(content))]
+
+    members = []
+    for index, variant in enumerate(content):
+        if not isinstance(variant, dict):
+            variant = {"content": variant}
+        metadata = {key: value for key, value in variant.items() if key != "content"}
+        metadata.update(settings, variant=index)
+        members.append((format_metadata(metadata), encode_member(variant.get("content", ""))))
+    return members
+
+
+def format_metadata(metadata: dict) -> dict[str, str]:
+    """Format the settings of a member as PAX header values.
+
+    Args:
+        metadata: Settings of the member.
+
+    Returns:
+        Dictionary mapping of the settings to their string value.
+    """
+    return {
+        str(key): value.isoformat() if isinstance(value, datetime.date) else str(value)
+        for key, value in metadata.items()
+    }
+
+
+def encode_member(content: object) -> bytes:
+    """Encode the content of a member.
+
+    Args:
+        content: Content of a file or of a variant, or a view of a bundle.
+
+    Returns:
+        Data of the member.
+    """
+    if isinstance(content, (bytes, memoryview)):
+        return bytes(content)
+    return str(content).encode("utf-8")
@@ -0,0 +1,99 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Cache-Control headers configured per filename pattern."""
+
+import dataclasses
+import fnmatch
+import logging
+
+import yaml
+
+from motd_server.content import Entry
+
+CACHE_CONTROL_DIRECTIVES = ("max-age", "stale-while-revalidate", "stale-if-error")
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache_rules_from_yaml(rules_string: str | dict) -> list[tuple[str, str]]:
+    """Load Cache-Control rules from a YAML string.
+
+    The rules map filename globs to their directives, for example:
+
+        "index*.txt": {max-age: 3600, stale-while-revalidate: 600, stale-if-error: 86400}
+
+    Args:
+        rules_string: YAML string, or already parsed dictionary, defining the rules.
+
+    Returns:
+        List of (glob, Cache-Control header value) in order of precedence.
+    """
+    if not rules_string:
+        return []
+
+    raw_rules = rules_string
+    if isinstance(rules_string, str):
+        try:
+            raw_rules = yaml.safe_load(rules_string)
+        except yaml.YAMLError as e:
+            logger.error("Could not parse FLASK_CACHE_CONTROL: %s", e)
+            return []
+
+    if not isinstance(raw_rules, dict):
+        logger.error("FLASK_CACHE_CONTROL is not a dictionary")
+        return []
+
+    rules = []
+    for pattern, directives in raw_rules.items():
+        header = build_cache_control_header(directives)
+        if header:
+            rules.append((str(pattern), header))
+        else:
+            logger.error("Ignoring invalid Cache-Control rule for %s: %s", pattern, directives)
+
+    return rules
+
+
+def build_cache_control_header(directives: object) -> str:
+    """Build a Cache-Control header value for shared caches.
+
+    Args:
+        directives: Dictionary mapping directive names to their number of seconds.
+
+    Returns:
+        Cache-Control header value, or empty string if the directives are invalid.
+    """
+    if not isinstance(directives, dict) or not directives:
+        return ""
+
+    values = ["public"]
+    for directive, seconds in directives.items():
+        if directive not in CACHE_CONTROL_DIRECTIVES:
+            return ""
+        if isinstance(seconds, bool) or not isinstance(seconds, int) or seconds < 0:
+            return ""
+        values.append(f"{directive}={seconds}")
+
+    return ", ".join(values)
+
+
+def apply_cache_rules(entries: dict[str, Entry], rules: list[tuple[str, str]]) -> dict[str, Entry]:
+    """Attach to every entry the Cache-Control header of the first rule matching its filename.
+
+    Args:
+        entries: Dictionary mapping of filenames to their entries.
+        rules: List of (glob, Cache-Control header value) in order of precedence.
+
+    Returns:
+        Dictionary mapping of filenames to their entries with Cache-Control headers.
+    """
+    if not rules:
+        return entries
+
+    cached_entries = {}
+    for filename, entry in entries.items():
+        header = next((h for pattern, h in rules if fnmatch.fnmatchcase(filename, pattern)), "")
+        cached_entries[filename] = dataclasses.replace(entry, cache_control=header)
+
+    return cached_entries
@@ -0,0 +1,79 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Precompressed variants of the content served by the MOTD server application."""
+
+import dataclasses
+import gzip
+import typing
+
+import brotli
+import zstandard
+
+from motd_server.content import BodyStore, Entry
+
+# Supported content codings, in order of preference when the client accepts several equally.
+# The highest brotli and zstd levels are far slower for little gain, and every worker pays
+# for them at load time.
+ENCODINGS: dict[str, typing.Callable[[bytes | memoryview], bytes]] = {
+    "zstd": zstandard.ZstdCompressor(level=10).compress,
+    "br": lambda body: brotli.compress(body, quality=9),
+    "gzip": lambda body: gzip.compress(body, compresslevel=9, mtime=0),
+}
+# Bodies compressed while answering a request, such as rendered templates, favour speed
+FAST_ENCODINGS: dict[str, typing.Callable[[bytes | memoryview], bytes]] = {
+    "zstd": zstandard.ZstdCompressor(level=1).compress,
+    "br": lambda body: brotli.compress(body, quality=1),
+    "gzip": lambda body: gzip.compress(body, compresslevel=1, mtime=0),
+}
+
+
+def compress_entry(
+    entry: Entry,
+    encodings: typing.Mapping[str, typing.Callable[[bytes | memoryview], bytes]] | None = None,
+) -> Entry:
+    """Build the compressed variants of an entry.
+
+    Variants that are not smaller than the original body are dropped since they would only
+    cost bandwidth.
+
+    Args:
+        entry: Entry to compress.
+        encodings: Compression function of every content coding, defaults to ENCODINGS.
+
+    Returns:
+        Copy of the entry with its compressed variants.
+    """
+    variants: dict[str, bytes | memoryview] = {}
+    for encoding, compress in (ENCODINGS if encodings is None else encodings).items():
+        body = compress(entry.body)
+        if len(body) < len(entry.body):
+            variants[encoding] = body
+
+    return dataclasses.replace(entry, variants=variants)
+
+
+def compress_entries(
+    entries: dict[str, Entry], bodies: BodyStore | None = None
+) -> dict[str, Entry]:
+    """Build the compressed variants of every entry once, at load time.
+
+    Args:
+        entries: Dictionary mapping of filenames to their entries.
+        bodies: Store sharing the variants of identical bodies, if any.
+
+    Returns:
+        Dictionary mapping of filenames to their entries with compressed variants.
+    """
+    if bodies is None:
+        return {filename: compress_entry(entry) for filename, entry in entries.items()}
+    compressed = {}
+    for filename, entry in entries.items():
+        variants = bodies.get_variants(entry.etag)
+        if variants is None:
+            entry = compress_entry(entry)
+            bodies.variants[entry.etag] = entry.variants
+        else:
+            entry = dataclasses.replace(entry, variants=variants)
+        compressed[filename] = entry
+    return compressed
@@ -0,0 +1,174 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Pre-encoded content served by the MOTD server application."""
+
+import dataclasses
+import datetime
+import hashlib
+import typing
+
+from motd_server.utils import get_mime_type
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    from motd_server.template import Template
+
+# Content coding of the body itself, as opposed to its compressed variants
+IDENTITY = "identity"
+
+
+class ContentLoadError(Exception):
+    """Exception raised when the files can't be read or parsed."""
+
+
+@dataclasses.dataclass(frozen=True)
+class FileSpan:
+    """Bytes of a file holding a body.
+
+    Attributes:
+        path: Path of the file.
+        offset: Offset of the body in the file.
+        size: Size of the body, in bytes.
+    """
+
+    path: str
+    offset: int
+    size: int
+
+
+@dataclasses.dataclass(frozen=True)
+class Entry:  # pylint: disable=too-many-instance-attributes
+    """A file ready to be served.
+
+    Attributes:
+        body: Content encoded to UTF-8, or a read-only view of a bundle.
+        etag: Strong entity tag derived from the body.
+        last_modified: Time at which the content was loaded.
+        mimetype: MIME type of the content.
+        variants: Compressed bodies by content coding, or read-only views of the content store.
+        cache_control: Cache-Control header value, if any.
+        template: Compiled template of the body, if it has placeholders.
+        spans: Spans of the content store holding the body and its variants, by content coding.
+    """
+
+    body: bytes | memoryview
+    etag: str
+    last_modified: datetime.datetime
+    mimetype: str
+    variants: dict[str, bytes | memoryview] = dataclasses.field(default_factory=dict)
+    cache_control: str = ""
+    template: "Template | None" = None
+    spans: dict[str, FileSpan] = dataclasses.field(default_factory=dict, compare=False)
+
+
+class BodyStore:
+    """Content-addressed store of the bodies of a content and of their compressed variants.
+
+    Every distinct body is kept once under its SHA-256 digest, which is also the ETag of
+    the entries serving it, so files with the same body share a single copy of it and of
+    its variants, compressed once.
+
+    Attributes:
+        bodies: Dictionary mapping of digests to their body.
+        variants: Dictionary mapping of digests to the compressed variants of their body.
+        references: Number of bodies added, including duplicates.
+        saved_size: Bytes of bodies and variants shared rather than duplicated.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty store."""
+        self.bodies: dict[str, bytes | memoryview] = {}
+        self.variants: dict[str, dict[str, bytes | memoryview]] = {}
+        self.references = 0
+        self.saved_size = 0
+
+    def add(self, body: bytes | memoryview) -> tuple[str, bytes | memoryview]:
+        """Add a body to the store.
+
+        Args:
+            body: Encoded body.
+
+        Returns:
+            Tuple of (digest, body), the body being the copy already stored if any.
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        self.references += 1
+        if digest in self.bodies:
+            self.saved_size += len(body)
+            return digest, self.bodies[digest]
+        self.bodies[digest] = body
+        return digest, body
+
+    def get_variants(self, digest: str) -> dict[str, bytes | memoryview] | None:
+        """Get the compressed variants of a body, if they were already built.
+
+        Args:
+            digest: Digest of the body.
+
+        Returns:
+            Dictionary mapping of content codings to the compressed body, or None.
+        """
+        variants = self.variants.get(digest)
+        if variants is not None:
+            self.saved_size += sum(len(data) for data in variants.values())
+        return variants
+
+    @property
+    def size(self) -> int:
+        """Get the size of the distinct bodies and of their variants.
+
+        Returns:
+            Size in bytes.
+        """
+        return sum(len(body) for body in self.bodies.values()) + sum(
+            len(data) for variants in self.variants.values() for data in variants.values()
+        )
+
+    @property
+    def dedup_ratio(self) -> float:
+        """Get the number of bodies added for each distinct body.
+
+        Returns:
+            Deduplication ratio, 1 if no body is shared.
+        """
+        return self.references / len(self.bodies) if self.bodies else 1.0
+
+
+def build_entries(
+    files: dict,
+    last_modified: datetime.datetime | None = None,
+    bodies: BodyStore | None = None,
+) -> dict[str, Entry]:
+    """Encode every file once so requests don't have to.
+
+    Args:
+        files: Dictionary mapping of filenames to their content.
+        last_modified: Time at which the content was loaded, defaults to now.
+        bodies: Store sharing the identical bodies, if any.
+
+    Returns:
+        Dictionary mapping of filenames to their entries.
+    """
+    if last_modified is None:
+        last_modified = datetime.datetime.now(datetime.timezone.utc)
+    # HTTP dates have a one second resolution
+    last_modified = last_modified.replace(microsecond=0)
+
+    entries = {}
+    for filename, content in files.items():
+        if isinstance(content, (bytes, memoryview)):
+            body = content
+        else:
+            body = str(content).encode("utf-8")
+        if bodies is None:
+            etag = hashlib.sha256(body).hexdigest()
+        else:
+            etag, body = bodies.add(body)
+        entries[filename] = Entry(
+            body=body,
+            etag=etag,
+            last_modified=last_modified,
+            mimetype=get_mime_type(filename),
+        )
+
+    return entries
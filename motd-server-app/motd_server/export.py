@@ -0,0 +1,440 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Static export of the MOTD responses for nginx.
+
+The responses of the MOTD server are a pure function of the files and of the version,
+architecture and cloud of the client, so nginx can serve them without the application:
+
+    python -m motd_server.export --files files.yaml --output /srv/motd
+
+The export writes every body served to the bodies directory, named after its digest, and
+two nginx configuration files:
+
+* motd-maps.conf, for the http block, extracts the version, architecture and cloud from
+  the User-Agent header the way the application does, and maps them to the MOTD file and
+  its body through the routing table of the application;
+* motd-locations.conf, for the server block, serves the bodies with the same headers as
+  the application.
+
+Whatever the export can't answer with a static body is passed to the application: files
+that rotate or are templates, values only matched by MOTD patterns, clients accepting the
+compressed variants, conditional requests other than If-Modified-Since, and the paths of
+the application itself. Scheduled files change over time and can't be exported.
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import re
+import sys
+import typing
+
+from werkzeug.utils import get_content_type
+
+from motd_server.content import ContentLoadError, Entry
+from motd_server.manifest import DELTA_PATH, MANIFEST_PATH
+from motd_server.motd import (
+    HEALTH_PATH,
+    MAX_PRECOMPUTED_ROUTES,
+    Content,
+    collect_motd_tokens,
+    process_config,
+)
+from motd_server.patterns import compile_motd_patterns
+from motd_server.profiling import PROFILE_PATH
+
+BODIES_DIRECTORY = "bodies"
+MAPS_FILENAME = "motd-maps.conf"
+LOCATIONS_FILENAME = "motd-locations.conf"
+DEFAULT_UPSTREAM = "http://127.0.0.1:8000"
+# Paths answered by the application itself, even if a file has the same name
+APP_FILENAMES = ("metrics", HEALTH_PATH, MANIFEST_PATH, DELTA_PATH, PROFILE_PATH)
+# Normalized value of the tokens nginx can't classify, which no static route has
+UNKNOWN = "?"
+# Filenames and tokens written in the nginx configuration as they are
+SAFE_NAME_PATTERN = re.compile(r"^[\w.~+,:@=-]+$", re.ASCII)
+# Headers are decoded as Latin-1, whose word characters \w matches beyond ASCII
+WORD_CLASS = "0-9A-Za-z_" + "".join(
+    f"\\x{code:02x}" for code in range(128, 256) if re.match(r"\w", chr(code))
+)
+USER_AGENT_REGEXES = {
+    "version": r"Ubuntu/(?<motd_capture>[0-9]{2}\.[0-9]{2})",
+    "arch": f"/(?<motd_capture>[{WORD_CLASS}]+) cloud_id",
+    "cloud": f"cloud_id/(?<motd_capture>[{WORD_CLASS}]+)",
+}
+
+logger = logging.getLogger(__name__)
+
+
+class ExportError(Exception):
+    """The content can't be exported statically."""
+
+
+def quote(value: str) -> str:
+    """Quote a string for the nginx configuration.
+
+    Args:
+        value: String without variables.
+
+    Returns:
+        Double-quoted string.
+    """
+    return '"' + value.replace('"', '\\"') + '"'
+
+
+def get_static_entries(content: Content) -> dict[str, Entry]:
+    """Get the files served with the same body to every client.
+
+    Args:
+        content: Content snapshot.
+
+    Returns:
+        Dictionary mapping of filenames to their entries.
+    """
+    return {
+        filename: entry
+        for filename, entry in content.entries.items()
+        if filename not in content.rotations
+        and entry.template is None
+        and filename not in APP_FILENAMES
+        and SAFE_NAME_PATTERN.match(filename)
+    }
+
+
+def build_index_routes(
+    content: Content, static_entries: dict[str, Entry]
+) -> tuple[list[str], list[str], str, dict[tuple[str, str, str], str]]:
+    """Resolve the MOTD of every combination of the values MOTD filenames mention.
+
+    Args:
+        content: Content snapshot.
+        static_entries: Dictionary mapping of the static filenames to their entries.
+
+    Returns:
+        Tuple of (versions, architecture and cloud tokens, normalized value of the other
+        tokens, dictionary mapping of (version, arch, cloud) to the static MOTD filename).
+
+    Raises:
+        ExportError: If nginx can't tell the routes apart.
+    """
+    versions, tokens = collect_motd_tokens(content.files)
+    safe = all(SAFE_NAME_PATTERN.match(token) for token in versions | tokens)
+    # Without patterns, values no filename mentions are routed as if they were missing
+    unknown = "" if safe and not compile_motd_patterns(tuple(content.files)) else UNKNOWN
+    versions_list = sorted(value for value in versions if SAFE_NAME_PATTERN.match(value))
+    tokens_list = sorted(value for value in tokens if SAFE_NAME_PATTERN.match(value))
+    if (len(versions_list) + 1) * (len(tokens_list) + 1) ** 2 > MAX_PRECOMPUTED_ROUTES:
+        raise ExportError("too many MOTD combinations to export")
+
+    routes = {}
+    for key in itertools.product(["", *versions_list], ["", *tokens_list], ["", *tokens_list]):
+        filename = content.router.resolve_filename(*key)
+        if filename in static_entries:
+            routes[key] = filename
+    # nginx compares the keys of maps ignoring case
+    if len({"|".join(key).lower() for key in routes}) != len(routes):
+        raise ExportError("MOTD tokens differing only by case can't be exported")
+    return versions_list, tokens_list, unknown, routes
+
+
+def write_bodies(directory: str, static_entries: dict[str, Entry]) -> dict[str, str]:
+    """Write the body of every static file, once per digest and content type.
+
+    Bodies are named after their digest and an extension standing for their content type,
+    and dated from the time the content was loaded, which nginx sends as Last-Modified.
+
+    Args:
+        directory: Directory of the bodies.
+        static_entries: Dictionary mapping of the static filenames to their entries.
+
+    Returns:
+        Dictionary mapping of filenames to the name of their body.
+    """
+    os.makedirs(directory, exist_ok=True)
+    extensions = get_extensions(static_entries)
+    names = {}
+    for filename, entry in static_entries.items():
+        name = f"{entry.etag}.{extensions[entry.mimetype]}"
+        names[filename] = name
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            with open(path, "wb") as body_file:
+                body_file.write(entry.body)
+        timestamp = entry.last_modified.timestamp()
+        os.utime(path, (timestamp, timestamp))
+    for name in set(os.listdir(directory)) - set(names.values()):
+        os.unlink(os.path.join(directory, name))
+    return names
+
+
+def get_extensions(static_entries: dict[str, Entry]) -> dict[str, str]:
+    """Name an extension for every MIME type, which nginx maps back to the type.
+
+    Args:
+        static_entries: Dictionary mapping of the static filenames to their entries.
+
+    Returns:
+        Dictionary mapping of MIME types to extensions.
+    """
+    mimetypes = sorted({entry.mimetype for entry in static_entries.values()})
+    return {mimetype: f"motd{index}" for index, mimetype in enumerate(mimetypes)}
+
+
+def render_map(
+    source: str, variable: str, values: typing.Iterable[tuple[str, str]], default: str = ""
+) -> list[str]:
+    """Render an nginx map block.
+
+    Args:
+        source: Source string of the map, with variables.
+        variable: Variable set by the map.
+        values: Pairs of (key, value), the keys starting with ~ being regular expressions.
+        default: Value of the variable if no key matches.
+
+    Returns:
+        Lines of the map block.
+    """
+    lines = [f"map {source} ${variable} {{", f"    default {quote(default)};"]
+    for key, value in values:
+        # Values starting with $ are captures or variables
+        lines.append(f"    {quote(key)} {value if value.startswith('$') else quote(value)};")
+    lines.append("}")
+    return lines
+
+
+def render_maps(content: Content, static_entries: dict[str, Entry], bodies: dict[str, str]) -> str:
+    """Render the maps routing the requests to the bodies.
+
+    Args:
+        content: Content snapshot.
+        static_entries: Dictionary mapping of the static filenames to their entries.
+        bodies: Dictionary mapping of filenames to the name of their body.
+
+    Returns:
+        Configuration of the http block.
+    """
+    versions, tokens, unknown, routes = build_index_routes(content, static_entries)
+    # The hashes of the largest maps must hold all their keys, the longest being paths
+    bucket_size = 2 ** (max(map(len, bodies), default=0) + 16).bit_length()
+    lines = [
+        f"# Generated by motd_server.export for content version {content.version}.",
+        "# Include in the http block of the nginx configuration.",
+        f"map_hash_max_size {max(2048, 2 * max(len(routes), len(bodies)))};",
+        f"map_hash_bucket_size {max(128, bucket_size)};",
+        "",
+    ]
+    for name, regex in USER_AGENT_REGEXES.items():
+        lines += render_map(
+            "$http_user_agent", f"motd_raw_{name}", [(f"~{regex}", "$motd_capture")]
+        )
+    # Exact keys would ignore case, so known values are matched by regular expressions
+    for name, values in (("version", versions), ("arch", tokens), ("cloud", tokens)):
+        lines += render_map(
+            f"$motd_raw_{name}",
+            f"motd_{name}",
+            [("~^$", ""), *((f"~^{re.escape(value)}$", value) for value in values)],
+            unknown,
+        )
+    lines += render_map(
+        '"$motd_version|$motd_arch|$motd_cloud"',
+        "motd_index_file",
+        (("|".join(key), filename) for key, filename in routes.items()),
+    )
+    lines += render_map(
+        "$uri", "motd_path_file", ((f"/{filename}", filename) for filename in static_entries)
+    )
+    lines += render_map("$motd_file", "motd_body", bodies.items())
+    lines += render_map(
+        "$motd_file", "motd_digest", ((name, entry.etag) for name, entry in static_entries.items())
+    )
+    lines += render_map(
+        "$motd_file",
+        "motd_cache_control",
+        (
+            (name, entry.cache_control)
+            for name, entry in static_entries.items()
+            if entry.cache_control
+        ),
+    )
+    lines += render_map(
+        "$motd_file",
+        "motd_compressed",
+        ((name, "1") for name, entry in static_entries.items() if entry.variants),
+    )
+    lines += render_map(
+        '"$motd_route|$motd_compressed"',
+        "motd_vary",
+        [
+            ("index|", "User-Agent"),
+            ("index|1", "Accept-Encoding, User-Agent"),
+            ("file|1", "Accept-Encoding"),
+        ],
+    )
+    # The application answers other methods, negotiates the variants and validates ETags
+    lines += render_map(
+        '"$request_method|$motd_compressed|$http_accept_encoding|$http_if_none_match'
+        '$http_if_match$http_if_unmodified_since"',
+        "motd_dynamic",
+        [("~^(GET|HEAD)\\|\\|[^|]*\\|$", ""), ("~^(GET|HEAD)\\|1\\|\\|$", "")],
+        "1",
+    )
+    return "\n".join(lines) + "\n"
+
+
+def render_locations(
+    content: Content, static_entries: dict[str, Entry], bodies_path: str, upstream: str
+) -> str:
+    """Render the locations serving the bodies, and passing other requests to the application.
+
+    Args:
+        content: Content snapshot.
+        static_entries: Dictionary mapping of the static filenames to their entries.
+        bodies_path: Absolute path of the bodies directory.
+        upstream: URL of the application.
+
+    Returns:
+        Configuration of the server block.
+    """
+    extensions = get_extensions(static_entries)
+    text_types = sorted(
+        mimetype for mimetype in extensions if get_content_type(mimetype, "utf-8") != mimetype
+    )
+    lines = [
+        f"# Generated by motd_server.export for content version {content.version}.",
+        "# Include in the server block of the nginx configuration.",
+    ]
+    for path, route, variable in (
+        ("= /", "index", "motd_index_file"),
+        ("/", "file", "motd_path_file"),
+    ):
+        lines += [
+            f"location {path} {{",
+            "    error_page 418 = @motd_app;",
+            f"    set $motd_route {route};",
+            f"    set $motd_file ${variable};",
+            '    if ($motd_body = "") {',
+            "        return 418;",
+            "    }",
+            "    if ($motd_dynamic) {",
+            "        return 418;",
+            "    }",
+            "    rewrite ^ /_motd/$motd_body last;",
+            "}",
+        ]
+    lines += [
+        "location /_motd/ {",
+        "    internal;",
+        f"    alias {quote(bodies_path.rstrip('/') + '/')};",
+        "    types {",
+        *(f"        {mimetype} {extension};" for mimetype, extension in extensions.items()),
+        "    }",
+        "    charset utf-8;",
+        f"    charset_types {' '.join(text_types) or 'text/plain'};",
+        "    etag off;",
+        "    max_ranges 0;",
+        "    if_modified_since before;",
+        '    add_header ETag "\\"$motd_digest\\"";',
+        "    add_header Cache-Control $motd_cache_control;",
+        "    add_header Vary $motd_vary;",
+        f"    add_header X-Content-Version {content.version};",
+        "}",
+        "location @motd_app {",
+        f"    proxy_pass {upstream};",
+        "    proxy_set_header Host $host;",
+        "    proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;",
+        "}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def export_content(content: Content, output: str, upstream: str = DEFAULT_UPSTREAM) -> int:
+    """Export the static responses of a content.
+
+    Args:
+        content: Content snapshot.
+        output: Directory written to.
+        upstream: URL of the application serving what the export can't.
+
+    Returns:
+        Number of static files exported.
+
+    Raises:
+        ExportError: If the content can't be exported.
+    """
+    if content.timeline is not None:
+        raise ExportError("scheduled files change over time and can't be exported")
+    static_entries = get_static_entries(content)
+    bodies_path = os.path.abspath(os.path.join(output, BODIES_DIRECTORY))
+    bodies = write_bodies(bodies_path, static_entries)
+    with open(os.path.join(output, MAPS_FILENAME), "w", encoding="utf-8") as maps_file:
+        maps_file.write(render_maps(content, static_entries, bodies))
+    with open(os.path.join(output, LOCATIONS_FILENAME), "w", encoding="utf-8") as locations_file:
+        locations_file.write(render_locations(content, static_entries, bodies_path, upstream))
+    return len(static_entries)
+
+
+def read_cache_control(path: str | None) -> str:
+    """Read the Cache-Control rules of the export.
+
+    Args:
+        path: YAML file defining the rules, if any.
+
+    Returns:
+        YAML string of the rules, empty without a file.
+    """
+    if not path:
+        return ""
+    with open(path, encoding="utf-8") as cache_control_file:
+        return cache_control_file.read()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Export the static responses of a files configuration.
+
+    Args:
+        argv: Command line arguments, defaults to the arguments of the process.
+
+    Returns:
+        Exit status.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--files", help="YAML file defining the files")
+    source.add_argument("--bundle", help="bundle of the files, as written by the charm")
+    parser.add_argument("--cache-control", help="YAML file defining the Cache-Control rules")
+    parser.add_argument("--output", required=True, help="directory written to")
+    parser.add_argument("--upstream", default=DEFAULT_UPSTREAM, help="URL of the application")
+    args = parser.parse_args(argv)
+
+    try:
+        cache_control = read_cache_control(args.cache_control)
+    except OSError as e:
+        print(f"Could not read the Cache-Control rules: {e}", file=sys.stderr)
+        return 1
+    config = {
+        "FILES_PATH": args.files,
+        "FILES_BUNDLE": args.bundle,
+        "CACHE_CONTROL": cache_control,
+    }
+    try:
+        # The export replaces the bodies, so files that can't be loaded must not empty it
+        process_config(config, strict=True)
+    except ContentLoadError as e:
+        print(f"Could not load the files: {e}", file=sys.stderr)
+        return 1
+    try:
+        os.makedirs(args.output, exist_ok=True)
+        count = export_content(config["MOTD_CONTENT"], args.output, args.upstream)
+    except (ExportError, OSError) as e:
+        print(f"Could not export the content: {e}", file=sys.stderr)
+        return 1
+    print(f"Exported {count} files of content version {config['MOTD_CONTENT'].version}")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
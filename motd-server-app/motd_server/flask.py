@@ -3,6 +3,9 @@
 
 import flask
 
+from motd_server.content import Entry
+from motd_server.sendfile import get_span, send_span
+
 
 class TextResponse(flask.Response):
     """Custom Flask response class to set default mimetype to text/plain.
@@ -12,3 +15,48 @@ class TextResponse(flask.Response):
     """
 
     default_mimetype = "text/plain"
+
+
+def entry_response(entry: Entry, request: flask.Request) -> flask.Response:
+    """Build the response serving an entry, honouring content negotiation and conditional headers.
+
+    Large bodies of the content store are sent from the store file, and support range requests.
+
+    Args:
+        entry: Entry to serve.
+        request: Request being answered.
+
+    Returns:
+        Response with the entry body, or an empty 304 if the client copy is still fresh.
+    """
+    encoding = request.accept_encodings.best_match(entry.variants)
+    data = entry.variants[encoding] if encoding else entry.body
+    span = get_span(entry, encoding)
+    # WSGI servers only accept bytes, so views of a bundle or of the store are copied here,
+    # unless they are sent from the store file
+    response = TextResponse(() if span else bytes(data), mimetype=entry.mimetype)
+    if encoding:
+        response.content_encoding = encoding
+        # Each representation needs its own strong validator
+        response.set_etag(f"{entry.etag}-{encoding}")
+    else:
+        response.set_etag(entry.etag)
+    if entry.variants:
+        response.vary.add("Accept-Encoding")
+    if entry.cache_control:
+        response.headers["Cache-Control"] = entry.cache_control
+    response.last_modified = entry.last_modified
+    if span is None:
+        response.make_conditional(request)
+        return response
+
+    response.content_length = span.size
+    response.make_conditional(request, accept_ranges=True, complete_length=span.size)
+    if response.status_code not in (200, 206) or request.method == "HEAD":
+        return response
+    start = (response.content_range.start or 0) if response.status_code == 206 else 0
+    length = response.content_length or 0
+    body = send_span(request.environ, span, start, length)
+    response.response = body if body is not None else [bytes(data[start : start + length])]
+    response.direct_passthrough = True
+    return response
@@ -0,0 +1,192 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Manifest of the files and delta archives for mirrors.
+
+The manifest lists every file with the digest and size of its definition, as bundled, and
+its version is a hash of the list. A delta is a bundle holding the files added or changed
+since an earlier manifest version, which a mirror merges into its copy of the files. Its
+PAX global headers, prefixed with MOTD_DELTA., hold the version it brings the files to, the
+version it applies to, empty if the delta holds all the files, and the JSON list of the
+files removed since.
+
+Deltas are computed against the last manifests loaded by the worker. A mirror sending a
+version the worker doesn't know, for example after a restart, gets all the files.
+"""
+
+import dataclasses
+import hashlib
+import io
+import json
+import tarfile
+import typing
+
+from motd_server.bundle import METADATA_PREFIX, get_bundle_members
+
+MANIFEST_PATH = "_manifest"
+DELTA_PATH = "_delta"
+DELTA_PREFIX = "MOTD_DELTA."
+# Manifests kept by every worker to compute deltas from
+MANIFEST_HISTORY = 16
+
+
+@dataclasses.dataclass(frozen=True)
+class Manifest:
+    """List of the files with the digest and size of their definition.
+
+    Attributes:
+        version: Hash identifying the files.
+        digests: Dictionary mapping of filenames to the SHA-256 digest of their definition.
+        sizes: Dictionary mapping of filenames to the size of their content, in bytes.
+        files: Dictionary mapping of filenames to their definition.
+    """
+
+    version: str
+    digests: dict[str, str]
+    sizes: dict[str, int]
+    files: dict = dataclasses.field(compare=False, repr=False)
+
+    def to_json(self) -> str:
+        """Serialize the manifest.
+
+        Returns:
+            JSON object of the version and of the digest and size of every file.
+        """
+        return json.dumps(
+            {
+                "version": self.version,
+                "files": {
+                    filename: {"digest": digest, "size": self.sizes[filename]}
+                    for filename, digest in self.digests.items()
+                },
+            },
+            separators=(",", ":"),
+        )
+
+
+def build_manifest(files: dict) -> Manifest:
+    """Build the manifest of a set of files.
+
+    Args:
+        files: Dictionary mapping of filenames to their definition.
+
+    Returns:
+        Manifest of the files.
+    """
+    digests = {}
+    sizes = {}
+    for filename in sorted(files):
+        digest = hashlib.sha256()
+        size = 0
+        for metadata, data in get_bundle_members(files[filename]):
+            digest.update(f"{json.dumps(metadata, sort_keys=True)}\0{len(data)}\0".encode())
+            digest.update(data)
+            size += len(data)
+        digests[filename] = digest.hexdigest()
+        sizes[filename] = size
+    version = hashlib.sha256(json.dumps(digests, separators=(",", ":")).encode()).hexdigest()
+    return Manifest(version, digests, sizes, files)
+
+
+def record_manifest(history: dict[str, Manifest], manifest: Manifest) -> dict[str, Manifest]:
+    """Add a manifest to the last manifests loaded.
+
+    Args:
+        history: Dictionary mapping of versions to the last manifests, oldest first.
+        manifest: Manifest loaded.
+
+    Returns:
+        New history, without the oldest manifests beyond MANIFEST_HISTORY.
+    """
+    manifests = [item for item in history.items() if item[0] != manifest.version]
+    manifests.append((manifest.version, manifest))
+    return dict(manifests[-MANIFEST_HISTORY:])
+
+
+def get_delta(manifest: Manifest, base: Manifest | None) -> tuple[list[str], list[str]]:
+    """Get the files changed between two manifests.
+
+    Args:
+        manifest: Current manifest.
+        base: Manifest of the mirror, None if unknown.
+
+    Returns:
+        Tuple of (files added or changed, files removed).
+    """
+    if base is None:
+        return list(manifest.digests), []
+    changed = [
+        filename
+        for filename, digest in manifest.digests.items()
+        if base.digests.get(filename) != digest
+    ]
+    removed = [filename for filename in base.digests if filename not in manifest.digests]
+    return changed, removed
+
+
+class _Chunks:
+    """Write-only file collecting the chunks of an archive until they are sent."""
+
+    def __init__(self) -> None:
+        """Initialize an empty buffer."""
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        """Collect a chunk.
+
+        Args:
+            data: Chunk written.
+
+        Returns:
+            Size of the chunk.
+        """
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        """Take the chunks written so far.
+
+        Returns:
+            Chunks, joined.
+        """
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_delta(manifest: Manifest, base: Manifest | None) -> typing.Iterator[bytes]:
+    """Stream the delta bringing a mirror from a manifest to another.
+
+    The archive is written one member at a time, so it is never held in memory as a whole.
+
+    Args:
+        manifest: Current manifest.
+        base: Manifest of the mirror, None if unknown.
+
+    Yields:
+        Chunks of the archive.
+    """
+    changed, removed = get_delta(manifest, base)
+    headers = {
+        f"{DELTA_PREFIX}version": manifest.version,
+        f"{DELTA_PREFIX}base": base.version if base else "",
+        f"{DELTA_PREFIX}removed": json.dumps(removed),
+    }
+    output = _Chunks()
+    with tarfile.open(
+        fileobj=typing.cast(typing.IO[bytes], output),
+        mode="w|",
+        format=tarfile.PAX_FORMAT,
+        pax_headers=headers,
+    ) as tar:
+        for filename in changed:
+            for metadata, data in get_bundle_members(manifest.files[filename]):
+                member = tarfile.TarInfo(filename)
+                member.size = len(data)
+                member.mode = 0o444
+                member.pax_headers = {
+                    f"{METADATA_PREFIX}{key}": value for key, value in metadata.items()
+                }
+                tar.addfile(member, io.BytesIO(data))
+                yield output.drain()
+    yield output.drain()
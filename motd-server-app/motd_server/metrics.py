@@ -0,0 +1,170 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Prometheus metrics of the MOTD server application.
+
+When PROMETHEUS_MULTIPROC_DIR is set, every gunicorn worker writes its metrics to that
+directory and a scrape aggregates all of them, whichever worker answers it.
+"""
+
+import os
+import typing
+
+import prometheus_client
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# Fields of /proc/self/smaps_rollup summed into each kind of worker memory
+MEMORY_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared",
+    "Shared_Dirty": "shared",
+    "Private_Clean": "private",
+    "Private_Dirty": "private",
+}
+SMAPS_ROLLUP_PATH = "/proc/self/smaps_rollup"
+
+if "PROMETHEUS_MULTIPROC_DIR" in os.environ:  # pragma: no cover
+    # Workers write their metrics there as soon as they are created, at import time
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+REQUESTS = prometheus_client.Counter(
+    "motd_requests_total", "Requests served, per route and status.", ["route", "status"]
+)
+REQUEST_DURATION = prometheus_client.Histogram(
+    "motd_request_duration_seconds",
+    "Time spent answering requests, per route.",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = prometheus_client.Histogram(
+    "motd_response_size_bytes",
+    "Size of the response bodies, per route.",
+    ["route"],
+    buckets=SIZE_BUCKETS,
+)
+MOTD_SELECTIONS = prometheus_client.Counter(
+    "motd_selections_total", "MOTD selections, per matched candidate level.", ["level"]
+)
+VARIANT_SELECTIONS = prometheus_client.Counter(
+    "motd_variant_selections_total", "Variants picked, per file and variant.", ["file", "variant"]
+)
+RATE_LIMITED = prometheus_client.Counter(
+    "motd_rate_limited_total", "Requests over the rate limit, per status sent.", ["status"]
+)
+ACCESS_LOG_DROPS = prometheus_client.Counter(
+    "motd_access_log_drops_total", "Access log records dropped because the queue was full."
+)
+CONTENT_RELOADS = prometheus_client.Counter(
+    "motd_content_reloads_total", "Content reloads after the files source changed."
+)
+CONTENT_LOAD_FAILURES = prometheus_client.Counter(
+    "motd_content_load_failures_total", "Files that could not be read or parsed."
+)
+CONTENT_FILES = prometheus_client.Gauge(
+    "motd_content_files", "Number of files being served.", multiprocess_mode="mostrecent"
+)
+CONTENT_SIZE = prometheus_client.Gauge(
+    "motd_content_size_bytes",
+    "Total size of the files being served.",
+    multiprocess_mode="mostrecent",
+)
+CONTENT_DEDUP_RATIO = prometheus_client.Gauge(
+    "motd_content_dedup_ratio",
+    "Files and variants served for each distinct body.",
+    multiprocess_mode="mostrecent",
+)
+CONTENT_DEDUP_SAVED = prometheus_client.Gauge(
+    "motd_content_dedup_saved_bytes",
+    "Bytes of bodies and compressed variants shared by identical files instead of duplicated.",
+    multiprocess_mode="mostrecent",
+)
+CONTENT_LOAD_DURATION = prometheus_client.Gauge(
+    "motd_content_load_seconds",
+    "Time spent loading and parsing the files being served.",
+    multiprocess_mode="mostrecent",
+)
+PROFILE_SAMPLES = prometheus_client.Counter(
+    "motd_profile_samples_total", "Requests traced by the sampling profiler."
+)
+PROFILE_SECONDS = prometheus_client.Counter(
+    "motd_profile_seconds",
+    "Time spent by the profiled requests in each function, excluding its callees, per stack.",
+    ["stack"],
+)
+WORKER_MEMORY = prometheus_client.Gauge(
+    "motd_worker_memory_bytes",
+    "Memory of the worker after loading the content, per kind (rss, pss, shared, private).",
+    ["kind"],
+    multiprocess_mode="liveall",
+)
+
+USER_AGENT_CACHE = prometheus_client.Gauge(
+    "motd_user_agent_cache",
+    "Parsed user agents cache of the live workers, per statistic (hits, misses, size).",
+    ["statistic"],
+    multiprocess_mode="livesum",
+)
+
+
+def read_memory_usage(path: str = SMAPS_ROLLUP_PATH) -> dict[str, int]:
+    """Read the memory usage of the current process.
+
+    Args:
+        path: Path of the smaps_rollup file of the process.
+
+    Returns:
+        Dictionary mapping of the memory kinds to their size in bytes, empty if the kernel
+        doesn't report them.
+    """
+    usage = dict.fromkeys(MEMORY_FIELDS.values(), 0)
+    try:
+        with open(path, encoding="ascii") as smaps:
+            for line in smaps:
+                field, _, value = line.partition(":")
+                if field in MEMORY_FIELDS:
+                    usage[MEMORY_FIELDS[field]] += int(value.split()[0]) * 1024
+    except OSError:
+        return {}
+    return usage
+
+
+def update_worker_memory() -> None:
+    """Report the memory usage of the current worker."""
+    for kind, size in read_memory_usage().items():
+        WORKER_MEMORY.labels(kind).set(size)
+
+
+def get_registry() -> prometheus_client.CollectorRegistry:
+    """Get the registry of the metrics of all the workers.
+
+    Returns:
+        Registry aggregating the metrics directory if set, otherwise the default registry.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return prometheus_client.REGISTRY
+    registry = prometheus_client.CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def generate_metrics() -> tuple[bytes, str]:
+    """Render the metrics in the Prometheus text format.
+
+    Returns:
+        Tuple of (metrics, content type).
+    """
+    return prometheus_client.generate_latest(get_registry()), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def update_user_agent_cache(cache_info: typing.Any) -> None:
+    """Report the statistics of the parsed user agents cache of the current worker.
+
+    Args:
+        cache_info: Statistics of the cache, as returned by the cache_info() of an lru_cache.
+    """
+    USER_AGENT_CACHE.labels("hits").set(cache_info.hits)
+    USER_AGENT_CACHE.labels("misses").set(cache_info.misses)
+    USER_AGENT_CACHE.labels("size").set(cache_info.currsize)
@@ -1,31 +1,512 @@
 # Copyright 2025 Canonical Ltd.
 # See LICENSE file for licensing details.
 
+import dataclasses
+import datetime
+import functools
+import hashlib
+import itertools
 import logging
+import math
 import re
+import time
+import typing
 import yaml
 
+from motd_server.bundle import read_bundle
+from motd_server.caching import apply_cache_rules, get_cache_rules_from_yaml
+from motd_server.compression import compress_entries
+from motd_server.content import BodyStore, ContentLoadError, Entry, build_entries
+from motd_server.manifest import build_manifest, record_manifest
+from motd_server.metrics import (
+    CONTENT_DEDUP_RATIO,
+    CONTENT_DEDUP_SAVED,
+    CONTENT_FILES,
+    CONTENT_LOAD_DURATION,
+    CONTENT_LOAD_FAILURES,
+    CONTENT_SIZE,
+    VARIANT_SELECTIONS,
+    update_worker_memory,
+)
+from motd_server.patterns import (
+    VERSION_PATTERN,
+    MotdPattern,
+    compile_motd_patterns,
+    is_motd_pattern,
+)
+from motd_server.rotation import Rotation, build_rotations
+from motd_server.schedule import Timeline, parse_schedule
+from motd_server.store import share_entries
+from motd_server.template import compile_template
+
 HEALTH_CONTENT = "OK"
 HEALTH_PATH = "_health"
 
 DEFAULT_FILES = {HEALTH_PATH: HEALTH_CONTENT}
 
+MOTD_KEY_PATTERN = re.compile(r"^index((?:-[^-]+){1,3})\.txt$")
+
+# Specificity levels of the MOTD candidates, from most to least specific
+MOTD_LEVELS = (
+    "exact",
+    "version-arch",
+    "version-cloud",
+    "version",
+    "arch-cloud",
+    "arch",
+    "cloud",
+    "fallback",
+)
+NOT_FOUND_LEVEL = "not-found"
+
+# Upper bound on the number of routes resolved eagerly at load time
+MAX_PRECOMPUTED_ROUTES = 65536
+
+# Three searches for literal prefixes are several times faster than a single pass
+# alternating between them
+USER_AGENT_VERSION_PATTERN = re.compile(r"Ubuntu/(\d{2}\.\d{2})")
+USER_AGENT_ARCH_PATTERN = re.compile(r"/(\w+) cloud_id")
+USER_AGENT_CLOUD_PATTERN = re.compile(r"cloud_id/(\w+)")
+USER_AGENT_CACHE_SIZE = 4096
+
+# Use the libyaml-backed loader when PyYAML was built with it, it is an order of magnitude faster
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)  # pylint: disable=invalid-name
+
 logger = logging.getLogger(__name__)
 
 
-def process_config(config) -> None:
-    """Load and process configuration from environment variables."""
-    config["PROCESSED_FILES"] = get_files_from_yaml(config.get("FILES", {}))
+@dataclasses.dataclass(frozen=True)
+class Content:  # pylint: disable=too-many-instance-attributes
+    """Snapshot of everything needed to answer requests.
+
+    A snapshot is never modified once built, so it can be swapped atomically while
+    requests are being served.
+
+    Attributes:
+        files: Dictionary mapping of filenames to their content.
+        entries: Dictionary mapping of filenames to their entries.
+        router: Router resolving MOTD filenames.
+        version: Hash identifying the content.
+        size: Total size of the files, in bytes.
+        load_seconds: Time spent loading and parsing the files.
+        rotations: Dictionary mapping of filenames to the variants they rotate between.
+        expires: Time at which the scheduled files change, in seconds since the epoch.
+        timeline: Content of every segment of the schedule, if some files are scheduled.
+    """
+
+    files: dict
+    entries: dict[str, Entry]
+    router: "MotdRouter"
+    version: str
+    size: int = 0
+    load_seconds: float = 0.0
+    rotations: dict[str, Rotation] = dataclasses.field(default_factory=dict)
+    expires: float = math.inf
+    timeline: "Timeline[Content] | None" = dataclasses.field(default=None, compare=False)
+
+    def at(self, now: float) -> "Content":
+        """Get the content to serve at a time.
+
+        Args:
+            now: Timestamp, in seconds since the epoch.
+
+        Returns:
+            This content until it expires, then the content of the following segment.
+        """
+        if now < self.expires or self.timeline is None:
+            return self
+        return self.timeline.at(now)
+
+    def get_entry(self, filename: str, identifier: str | None = None) -> tuple[Entry | None, str]:
+        """Get the entry serving a file, picking one of its variants if it rotates.
+
+        Args:
+            filename: Name of the file.
+            identifier: Stable identifier of the client pinning it to a variant, if any.
+
+        Returns:
+            Tuple of (entry, variant name), the entry is None if there is no such file and
+            the variant name is empty if the file doesn't rotate.
+        """
+        rotation = self.rotations.get(filename)
+        if rotation is None:
+            return self.entries.get(filename), ""
+        variant, entry = rotation.pick(identifier)
+        VARIANT_SELECTIONS.labels(filename, variant).inc()
+        return entry, variant
+
+
+def process_config(config, strict: bool = False) -> None:
+    """Load and process configuration from environment variables.
+
+    The files are loaded from the FILES_BUNDLE bundle if set, otherwise from the FILES_PATH
+    file if set, otherwise from FILES. The new content is fully built before it replaces
+    the current one in the configuration.
+
+    Raises:
+        ContentLoadError: If strict and the files can't be read or parsed, the current
+            content being left as it is. Otherwise only the default files are served.
+    """
+    start = time.perf_counter()
+    try:
+        files = load_files(config)
+    except ContentLoadError:
+        if strict:
+            raise
+        files = DEFAULT_FILES.copy()
+    load_seconds = time.perf_counter() - start
+
+    bodies = BodyStore()
+    content = dataclasses.replace(
+        build_content(
+            files,
+            config.get("CACHE_CONTROL", ""),
+            store_directory=config.get("CONTENT_STORE"),
+            bodies=bodies,
+        ),
+        load_seconds=load_seconds,
+    )
+    manifest = build_manifest(files)
+    config["PROCESSED_FILES"] = files
+    config["FILES_MANIFEST"] = manifest
+    config["MANIFESTS"] = record_manifest(config.get("MANIFESTS", {}), manifest)
+    config["MOTD_CONTENT"] = content
+    CONTENT_FILES.set(len(files))
+    CONTENT_SIZE.set(content.size)
+    CONTENT_LOAD_DURATION.set(load_seconds)
+    CONTENT_DEDUP_RATIO.set(bodies.dedup_ratio)
+    CONTENT_DEDUP_SAVED.set(bodies.saved_size)
+    update_worker_memory()
+    logger.info(
+        "Loaded %d files (%d bytes) in %.3fs, content version %s, "
+        "%d distinct bodies (dedup ratio %.2f, %d bytes saved)",
+        len(files),
+        content.size,
+        load_seconds,
+        content.version,
+        len(bodies.bodies),
+        bodies.dedup_ratio,
+        bodies.saved_size,
+    )
+
+
+def get_files_source(config: typing.Mapping[str, typing.Any]) -> str | None:
+    """Get the path the files are loaded from, if any.
+
+    Args:
+        config: Application configuration.
+
+    Returns:
+        Path of the FILES_BUNDLE bundle or of the FILES_PATH file, None if files come from FILES.
+    """
+    return config.get("FILES_BUNDLE") or config.get("FILES_PATH")
+
+
+def load_files(config: typing.Mapping[str, typing.Any]) -> dict:
+    """Load the files from the FILES_BUNDLE bundle, the FILES_PATH file or FILES.
+
+    Args:
+        config: Application configuration.
+
+    Returns:
+        Dictionary mapping of filenames to their content or definition.
+
+    Raises:
+        ContentLoadError: If the bundle or the file can't be read or parsed.
+    """
+    bundle_path = config.get("FILES_BUNDLE")
+    if bundle_path:
+        return {**DEFAULT_FILES, **read_bundle(bundle_path)}
+    files_path = config.get("FILES_PATH")
+    if files_path:
+        return parse_files_yaml(read_files_path(files_path))
+    return parse_files_yaml(config.get("FILES", ""))
+
+
+def read_files_path(files_path: str) -> str:
+    """Read the YAML string defining files from a file.
+
+    Args:
+        files_path: Path of the file.
+
+    Returns:
+        YAML string defining files.
+
+    Raises:
+        ContentLoadError: If the file can't be read.
+    """
+    try:
+        with open(files_path, encoding="utf-8") as files_file:
+            return files_file.read()
+    except (OSError, UnicodeError) as e:
+        logger.error("Could not read FLASK_FILES_PATH: %s", e)
+        CONTENT_LOAD_FAILURES.inc()
+        raise ContentLoadError(f"Could not read FLASK_FILES_PATH: {e}") from e
+
+
+def build_content(
+    files: dict,
+    cache_control: str | dict,
+    now: float | None = None,
+    store_directory: str | None = None,
+    bodies: BodyStore | None = None,
+) -> Content:
+    """Build the content snapshot for a set of files.
+
+    Every entry is built once, the contents of the segments of the schedule only pick the
+    entries of the files active during them.
+
+    Args:
+        files: Dictionary mapping of filenames to their content or definition.
+        cache_control: YAML string defining the Cache-Control rules.
+        now: Time the content is served from, in seconds since the epoch, defaults to now.
+        store_directory: Directory of the content store shared by the workers, if any.
+        bodies: Store sharing the identical bodies and their variants, if any.
+
+    Returns:
+        Content snapshot ready to be served.
+    """
+    files, windows = parse_schedule(files)
+    last_modified = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    cache_rules = get_cache_rules_from_yaml(cache_control)
+    plain_files = {name: value for name, value in files.items() if not isinstance(value, list)}
+    entries = build_entries(plain_files, last_modified, bodies)
+    entries = apply_cache_rules(entries, cache_rules)
+    # With a store, the entries are only compressed by the worker writing it
+    rotations = build_rotations(
+        files, cache_rules, last_modified, bodies, compress=not store_directory
+    )
+    if store_directory:
+        entries, rotations = share_content(store_directory, entries, rotations, bodies)
+    else:
+        entries = compress_entries(entries, bodies)
+    entries, rotations = compile_templates(entries, rotations)
+    # The first variant stands for a rotating file wherever a single entry is needed
+    entries.update((filename, rotation.entries[0]) for filename, rotation in rotations.items())
+    if not windows:
+        return assemble_content(files, entries, rotations)
+
+    def build_segment(active: frozenset[str], start: float, expires: float) -> Content:
+        """Assemble the content of a segment of the schedule.
+
+        The files of a segment are modified when it starts if it starts after the load, so
+        that a client revalidating with If-Modified-Since gets the files it activates.
+
+        Args:
+            active: Scheduled files active during the segment.
+            start: Time the segment starts at.
+            expires: Time the segment ends at.
+
+        Returns:
+            Content snapshot without the inactive files.
+        """
+        inactive = windows.keys() - active
+        modified = last_modified
+        if start > last_modified.timestamp():
+            # Last-Modified has a precision of a second, rounded down
+            modified = datetime.datetime.fromtimestamp(math.ceil(start), datetime.timezone.utc)
+        return assemble_content(
+            {name: value for name, value in files.items() if name not in inactive},
+            {
+                name: set_last_modified(entry, modified)
+                for name, entry in entries.items()
+                if name not in inactive
+            },
+            {
+                name: dataclasses.replace(
+                    rotation,
+                    entries=tuple(
+                        set_last_modified(entry, modified) for entry in rotation.entries
+                    ),
+                )
+                for name, rotation in rotations.items()
+                if name not in inactive
+            },
+            expires=expires,
+            timeline=timeline,
+        )
+
+    timeline = Timeline(windows, build_segment)
+    return timeline.at(time.time() if now is None else now)
+
+
+def set_last_modified(entry: Entry, last_modified: datetime.datetime) -> Entry:
+    """Change the time at which an entry, and the entries its template renders, were modified.
+
+    Args:
+        entry: Entry of a file.
+        last_modified: New modification time.
+
+    Returns:
+        Copy of the entry, or the entry itself if it already has that modification time.
+    """
+    if entry.last_modified == last_modified:
+        return entry
+    template = entry.template
+    if template is not None:
+        template = dataclasses.replace(
+            template, entry=dataclasses.replace(template.entry, last_modified=last_modified)
+        )
+    return dataclasses.replace(entry, last_modified=last_modified, template=template)
+
+
+def share_content(
+    directory: str,
+    entries: dict[str, Entry],
+    rotations: dict[str, Rotation],
+    bodies: BodyStore | None = None,
+) -> tuple[dict[str, Entry], dict[str, Rotation]]:
+    """Move the entries and the variants of rotating files to the shared content store.
+
+    Args:
+        directory: Directory of the content store.
+        entries: Dictionary mapping of filenames to their uncompressed entries.
+        rotations: Dictionary mapping of filenames to the variants they rotate between.
+        bodies: Store sharing the variants of identical bodies, if any.
+
+    Returns:
+        Tuple of (entries, rotations) backed by the content store.
+    """
+    variants = {
+        f"{filename}\0{index}": entry
+        for filename, rotation in rotations.items()
+        for index, entry in enumerate(rotation.entries)
+    }
+    shared = share_entries(
+        directory,
+        {**entries, **variants},
+        lambda uncompressed: compress_entries(uncompressed, bodies),
+    )
+    rotations = {
+        filename: dataclasses.replace(
+            rotation,
+            entries=tuple(
+                shared[f"{filename}\0{index}"] for index in range(len(rotation.entries))
+            ),
+        )
+        for filename, rotation in rotations.items()
+    }
+    return {filename: shared[filename] for filename in entries}, rotations
+
+
+def compile_templates(
+    entries: dict[str, Entry], rotations: dict[str, Rotation]
+) -> tuple[dict[str, Entry], dict[str, Rotation]]:
+    """Compile the MOTD bodies and variants that are templates.
+
+    Args:
+        entries: Dictionary mapping of filenames to their entries.
+        rotations: Dictionary mapping of filenames to the variants they rotate between.
+
+    Returns:
+        Tuple of (entries, rotations) with their templates compiled.
+    """
+    entries = {
+        filename: compile_template(entry) if is_motd_filename(filename) else entry
+        for filename, entry in entries.items()
+    }
+    rotations = {
+        filename: (
+            dataclasses.replace(
+                rotation, entries=tuple(compile_template(entry) for entry in rotation.entries)
+            )
+            if is_motd_filename(filename)
+            else rotation
+        )
+        for filename, rotation in rotations.items()
+    }
+    return entries, rotations
+
+
+def is_motd_filename(filename: str) -> bool:
+    """Check whether a file is a MOTD, which the index route can serve.
+
+    Args:
+        filename: Name of the file.
+
+    Returns:
+        True for index.txt, exact MOTD filenames and MOTD patterns.
+    """
+    return (
+        filename == "index.txt"
+        or bool(MOTD_KEY_PATTERN.match(filename))
+        or is_motd_pattern(filename)
+    )
+
+
+def assemble_content(
+    files: dict,
+    entries: dict[str, Entry],
+    rotations: dict[str, Rotation],
+    expires: float = math.inf,
+    timeline: Timeline[Content] | None = None,
+) -> Content:
+    """Assemble a content snapshot from built entries.
+
+    Args:
+        files: Dictionary mapping of filenames to their content.
+        entries: Dictionary mapping of filenames to their entries.
+        rotations: Dictionary mapping of filenames to the variants they rotate between.
+        expires: Time at which the scheduled files change.
+        timeline: Content of every segment of the schedule, if some files are scheduled.
+
+    Returns:
+        Content snapshot ready to be served.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for filename in sorted(entries):
+        digest.update(f"{filename}\0{entries[filename].etag}\n".encode("utf-8"))
+        size += len(entries[filename].body)
+    for filename in sorted(rotations):
+        rotation = rotations[filename]
+        for name, entry in zip(rotation.names, rotation.entries):
+            digest.update(f"{filename}\0{name}\0{entry.etag}\n".encode("utf-8"))
+        size += sum(len(entry.body) for entry in rotation.entries[1:])
+
+    return Content(
+        files=files,
+        entries=entries,
+        # Files whose variants are all invalid can't be served, so they must not be routed to
+        router=MotdRouter({name: value for name, value in files.items() if name in entries}),
+        version=digest.hexdigest(),
+        size=size,
+        rotations=rotations,
+        expires=expires,
+        timeline=timeline,
+    )
 
 
 def get_files_from_yaml(files_string: str) -> dict[str, str]:
+    """Load files from a YAML string, if it is valid.
+
+    Args:
+        files_string: YAML string defining files.
+
+    Returns:
+        Dictionary mapping of filenames to their content or definition, as parse_files_yaml
+        returns them, or only the default files if the YAML string is not valid.
+    """
+    try:
+        return parse_files_yaml(files_string)
+    except ContentLoadError:
+        return DEFAULT_FILES.copy()
+
+
+def parse_files_yaml(files_string: str) -> dict[str, str]:
     """Load files from a YAML string.
 
+    A file is defined by its content, by a list of variants to rotate between, or by a
+    mapping with its content and the optional start and end timestamps it is served between.
+
     Args:
         files_string: YAML string defining files.
 
     Returns:
-        Dictionary mapping of filenames to their content.
+        Dictionary mapping of filenames to their content or definition.
+
+    Raises:
+        ContentLoadError: If the YAML string is not a valid mapping.
     """
     files = DEFAULT_FILES.copy()
     logger.debug("Loading files from yaml string: %s", files_string)
@@ -35,25 +516,32 @@ def get_files_from_yaml(files_string: str) -> dict[str, str]:
         return files
 
     try:
-        raw_files = yaml.safe_load(files_string)
+        raw_files = yaml.load(files_string, Loader=SafeLoader)
     except yaml.YAMLError as e:
         logger.error("Could not parse FLASK_FILES: %s", e)
-        return files
+        CONTENT_LOAD_FAILURES.inc()
+        raise ContentLoadError(f"Could not parse FLASK_FILES: {e}") from e
 
     if not isinstance(raw_files, dict):
         logger.error("FLASK_FILES is not a dictionary")
-        return files
+        CONTENT_LOAD_FAILURES.inc()
+        raise ContentLoadError("FLASK_FILES is not a dictionary")
 
-    files.update(raw_files)
+    # YAML keys such as 1 or 24.04 aren't strings, the files are still served at their name
+    files.update((str(filename), content) for filename, content in raw_files.items())
 
     logger.debug("Loaded files: %s", files)
 
     return files
 
 
+@functools.lru_cache(maxsize=USER_AGENT_CACHE_SIZE)
 def extract_user_agent_info(user_agent: str) -> tuple[str, str, str]:
     """Extract version, architecture, and cloud information from user agent.
 
+    Results are kept in a bounded LRU cache, whose hits, misses and size are reported in
+    the metrics.
+
     Args:
         user_agent: User agent string to parse.
 
@@ -63,9 +551,9 @@ def extract_user_agent_info(user_agent: str) -> tuple[str, str, str]:
     if not user_agent:
         return "", "", ""
 
-    version = re.search(r"Ubuntu/(\d{2}\.\d{2})", user_agent)
-    arch = re.search(r"/(\w+) cloud_id", user_agent)
-    cloud = re.search(r"cloud_id/(\w+)", user_agent)
+    version = USER_AGENT_VERSION_PATTERN.search(user_agent)
+    arch = USER_AGENT_ARCH_PATTERN.search(user_agent)
+    cloud = USER_AGENT_CLOUD_PATTERN.search(user_agent)
 
     return (
         version.group(1) if version else "",
@@ -88,20 +576,211 @@ def select_motd(files: dict, version: str, arch: str, cloud: str) -> str:
     Returns:
         Selected MOTD content or empty string if no match found.
     """
+    filename = select_motd_filename(files, version, arch, cloud)
+    return files[filename] if filename else ""
+
+
+def select_motd_filename(files: dict, version: str, arch: str, cloud: str) -> str:
+    """Select the filename of the appropriate MOTD based on version, architecture, and cloud.
+
+    Args:
+        files: Dictionary of available files.
+        version: Ubuntu version (e.g., "24.04").
+        arch: System architecture (e.g., "amd64").
+        cloud: Cloud provider ID.
+
+    Returns:
+        Selected MOTD filename or empty string if no match found.
+    """
+    return select_motd_route(files, version, arch, cloud)[0]
+
+
+def select_motd_route(
+    files: dict,
+    version: str,
+    arch: str,
+    cloud: str,
+    patterns: dict[int, tuple[MotdPattern, ...]] | None = None,
+) -> tuple[str, str]:
+    """Select the filename and specificity level of the appropriate MOTD.
+
+    Each candidate is looked up as an exact filename first, then matched against the MOTD
+    patterns with as many tokens in the order they are defined.
+
+    Args:
+        files: Dictionary of available files.
+        version: Ubuntu version (e.g., "24.04").
+        arch: System architecture (e.g., "amd64").
+        cloud: Cloud provider ID.
+        patterns: MOTD patterns of the files by token count, compiled from them if None.
+
+    Returns:
+        Tuple of (filename, level), the filename is empty if no match found.
+    """
+    if patterns is None:
+        patterns = compile_motd_patterns(tuple(files))
     # Try all combinations in order of specificity
     candidates = [
-        f"index-{version}-{arch}-{cloud}.txt" if (version and arch and cloud) else None,
-        f"index-{version}-{arch}.txt" if (version and arch) else None,
-        f"index-{version}-{cloud}.txt" if (version and cloud) else None,
-        f"index-{version}.txt" if version else None,
-        f"index-{arch}-{cloud}.txt" if (arch and cloud) else None,
-        f"index-{arch}.txt" if arch else None,
-        f"index-{cloud}.txt" if cloud else None,
-        "index.txt",
+        (version, arch, cloud) if (version and arch and cloud) else None,
+        (version, arch) if (version and arch) else None,
+        (version, cloud) if (version and cloud) else None,
+        (version,) if version else None,
+        (arch, cloud) if (arch and cloud) else None,
+        (arch,) if arch else None,
+        (cloud,) if cloud else None,
+        (),
     ]
 
-    for candidate in candidates:
-        if candidate and candidate in files:
-            return files[candidate]
+    for tokens, level in zip(candidates, MOTD_LEVELS):
+        if tokens is None:
+            continue
+        candidate = "-".join(("index", *tokens)) + ".txt"
+        if candidate in files:
+            return candidate, level
+        for pattern in patterns.get(len(tokens), ()):
+            if pattern.matches(tokens):
+                return pattern.filename, level
+
+    return "", NOT_FOUND_LEVEL
+
+
+def collect_motd_tokens(files: dict) -> tuple[frozenset[str], frozenset[str]]:
+    """Collect the versions and the other tokens used by exact MOTD filenames.
+
+    Args:
+        files: Dictionary of available files.
+
+    Returns:
+        Tuple of (versions, architecture and cloud tokens).
+    """
+    versions = set()
+    tokens = set()
+    for filename in files:
+        match = MOTD_KEY_PATTERN.match(filename)
+        if not match or is_motd_pattern(filename):
+            continue
+        for token in match.group(1)[1:].split("-"):
+            if VERSION_PATTERN.match(token):
+                versions.add(token)
+            else:
+                tokens.add(token)
+
+    return frozenset(versions), frozenset(tokens)
+
+
+class MotdRouter:
+    """Resolve (version, arch, cloud) tuples to MOTD filenames with a single lookup.
+
+    A value that no MOTD filename mentions can never change the outcome of
+    select_motd, so unknown values are normalized to an empty string before
+    falling back. Values matched by MOTD patterns are normalized to the first value
+    matched by the same patterns. This keeps the routing table bounded whatever
+    clients send.
+    """
+
+    def __init__(self, files: dict):
+        """Build the routing table for the given files.
+
+        Args:
+            files: Dictionary of available files.
+        """
+        self._files = files
+        self._versions, self._tokens = collect_motd_tokens(files)
+        self._patterns = compile_motd_patterns(tuple(files))
+        self._classes: dict[tuple[bool, tuple[bool, ...]], str] = {}
+        self._normalize = functools.lru_cache(maxsize=USER_AGENT_CACHE_SIZE)(self._classify)
+        self._routes: dict[tuple[str, str, str], tuple[str, str]] = {}
+
+        versions = ["", *sorted(self._versions)]
+        tokens = ["", *sorted(self._tokens)]
+        if len(versions) * len(tokens) ** 2 > MAX_PRECOMPUTED_ROUTES:
+            logger.warning("Too many MOTD combinations, routes will be resolved on demand")
+            return
+
+        for key in itertools.product(versions, tokens, tokens):
+            self._routes[key] = select_motd_route(files, *key, self._patterns)
+
+    def __len__(self) -> int:
+        """Get the number of resolved routes.
+
+        Returns:
+            Number of routes held in the routing table.
+        """
+        return len(self._routes)
+
+    def resolve(self, version: str, arch: str, cloud: str) -> str:
+        """Get the MOTD for the given version, architecture, and cloud.
+
+        Args:
+            version: Ubuntu version (e.g., "24.04").
+            arch: System architecture (e.g., "amd64").
+            cloud: Cloud provider ID.
+
+        Returns:
+            Selected MOTD content or empty string if no match found.
+        """
+        filename = self.resolve_filename(version, arch, cloud)
+        return self._files[filename] if filename else ""
+
+    def resolve_filename(self, version: str, arch: str, cloud: str) -> str:
+        """Get the MOTD filename for the given version, architecture, and cloud.
+
+        Args:
+            version: Ubuntu version (e.g., "24.04").
+            arch: System architecture (e.g., "amd64").
+            cloud: Cloud provider ID.
+
+        Returns:
+            Selected MOTD filename or empty string if no match found.
+        """
+        return self.resolve_route(version, arch, cloud)[0]
+
+    def resolve_route(self, version: str, arch: str, cloud: str) -> tuple[str, str]:
+        """Get the MOTD filename and specificity level for the given version, arch, and cloud.
+
+        Args:
+            version: Ubuntu version (e.g., "24.04").
+            arch: System architecture (e.g., "amd64").
+            cloud: Cloud provider ID.
+
+        Returns:
+            Tuple of (filename, level), the filename is empty if no match found.
+        """
+        route = self._routes.get((version, arch, cloud))
+        if route is not None:
+            return route
+
+        key = (
+            self._normalize(version, True),
+            self._normalize(arch, False),
+            self._normalize(cloud, False),
+        )
+        route = self._routes.get(key)
+        if route is None:
+            route = self._routes.setdefault(
+                key, select_motd_route(self._files, *key, self._patterns)
+            )
+        return route
+
+    def _classify(self, value: str, is_version: bool) -> str:
+        """Normalize a value to the value standing for every value routed the same way.
+
+        Args:
+            value: Version, or architecture or cloud.
+            is_version: Whether the value is a version.
 
-    return ""
+        Returns:
+            The value if an exact MOTD filename mentions it, otherwise the first value
+            matched by the same patterns, or an empty string if no pattern matches it.
+        """
+        if not value or value in (self._versions if is_version else self._tokens):
+            return value
+        signature = tuple(
+            matcher(value)
+            for patterns in self._patterns.values()
+            for pattern in patterns
+            for matcher in pattern.matchers
+        )
+        if not any(signature):
+            return ""
+        return self._classes.setdefault((is_version, signature), value)
@@ -0,0 +1,129 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""MOTD filenames matching several versions, architectures or clouds.
+
+Each token of a pattern filename is matched on its own, and can be a glob, a set of
+alternatives or an inclusive range of versions:
+
+    index-2?.04-arm64.txt
+    index-{22.04,24.04}-{amd64,arm64}.txt
+    index-20.04..24.04-aws.txt
+
+A pattern only stands in for the candidates with as many tokens as it has, after the exact
+filename of the candidate, so it never overrides a more specific MOTD.
+"""
+
+import dataclasses
+import fnmatch
+import functools
+import logging
+import re
+import typing
+
+from motd_server.metrics import CONTENT_LOAD_FAILURES
+
+VERSION_PATTERN = re.compile(r"^\d{2}\.\d{2}$")
+PATTERN_CHARACTERS = re.compile(r"[*?\[{]|\.\.")
+# Hyphens separate tokens, except inside the brackets of a glob
+TOKEN_SEPARATOR = re.compile(r"-(?![^\[]*\])")
+PATTERN_CACHE_SIZE = 16
+
+logger = logging.getLogger(__name__)
+
+TokenMatcher = typing.Callable[[str], bool]
+
+
+@dataclasses.dataclass(frozen=True)
+class MotdPattern:
+    """MOTD filename with patterns in its tokens.
+
+    Attributes:
+        filename: Name of the file.
+        matchers: Matcher of every token.
+    """
+
+    filename: str
+    matchers: tuple[TokenMatcher, ...]
+
+    def matches(self, tokens: tuple[str, ...]) -> bool:
+        """Check whether the pattern matches the tokens of a candidate filename.
+
+        Args:
+            tokens: Tokens of the candidate, as many as the matchers.
+
+        Returns:
+            True if every token matches.
+        """
+        return all(matcher(token) for matcher, token in zip(self.matchers, tokens))
+
+
+def is_motd_pattern(filename: str) -> bool:
+    """Check whether a filename is a MOTD pattern.
+
+    Args:
+        filename: Name of the file.
+
+    Returns:
+        True if the filename is a MOTD filename with patterns in its tokens.
+    """
+    return (
+        filename.startswith("index-")
+        and filename.endswith(".txt")
+        and PATTERN_CHARACTERS.search(filename[6:-4]) is not None
+    )
+
+
+def compile_token(token: str) -> TokenMatcher:
+    """Compile the matcher of a token.
+
+    Args:
+        token: Glob, set of alternatives in braces, or inclusive range of versions.
+
+    Returns:
+        Function checking whether a value matches the token.
+
+    Raises:
+        ValueError: If the token is not a valid pattern.
+    """
+    if token.startswith("{") and token.endswith("}"):
+        alternatives = tuple(compile_token(alternative) for alternative in token[1:-1].split(","))
+        return lambda value: any(alternative(value) for alternative in alternatives)
+    if ".." in token:
+        low, _, high = token.partition("..")
+        if not (VERSION_PATTERN.match(low) and VERSION_PATTERN.match(high)):
+            raise ValueError(f"{token} is not a range of versions")
+        return lambda value: VERSION_PATTERN.match(value) is not None and low <= value <= high
+    if not token or "{" in token or "}" in token:
+        raise ValueError(f"{token!r} is not a valid token")
+    regex = re.compile(fnmatch.translate(token))
+    return lambda value: regex.match(value) is not None
+
+
+@functools.lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_motd_patterns(filenames: tuple[str, ...]) -> dict[int, tuple[MotdPattern, ...]]:
+    """Compile the MOTD patterns among filenames into a precedence-ordered table.
+
+    Args:
+        filenames: Names of the files, in the order they are defined.
+
+    Returns:
+        Dictionary mapping of token counts to the patterns with as many tokens, in the order
+        they are defined, which is their order of precedence. Invalid patterns are left out.
+    """
+    patterns: dict[int, list[MotdPattern]] = {}
+    for filename in filenames:
+        if not is_motd_pattern(filename):
+            continue
+        tokens = TOKEN_SEPARATOR.split(filename[6:-4])
+        try:
+            if len(tokens) > 3:
+                raise ValueError("more than 3 tokens")
+            matchers = tuple(compile_token(token) for token in tokens)
+        except (ValueError, re.error) as e:
+            logger.error("Invalid MOTD pattern %s: %s", filename, e)
+            CONTENT_LOAD_FAILURES.inc()
+            continue
+        patterns.setdefault(len(tokens), []).append(MotdPattern(filename, matchers))
+
+    return {count: tuple(table) for count, table in patterns.items()}
@@ -0,0 +1,178 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Opt-in sampling profiler of the requests.
+
+A share of the requests, set by PROFILE_SAMPLE_RATE, is traced with sys.setprofile. Every
+call of the application functions is timed, and the time spent in each of them, excluding
+the application functions it calls, is added to a counter labelled with its folded stack,
+such as request;app:index;motd_server.motd:extract_user_agent_info. Time spent in libraries,
+for example by Flask building the response, goes to the application function calling them,
+and time outside of any of them to the request root. The counters are Prometheus metrics, so
+the samples of all the workers are aggregated, and they are rendered in the folded format
+read by flamegraph tools.
+
+Requests that aren't sampled only cost a random number, and the profiler isn't installed at
+all when the sample rate is 0.
+
+sys.setprofile is set per thread, and the greenlets of a gevent worker all run on the same
+thread, so a trace would also time the requests served while its own waits. The profiler is
+disabled in processes monkey-patched by gevent, as gunicorn gevent workers are.
+"""
+
+import logging
+import random
+import sys
+import time
+import types
+import typing
+
+from gevent import monkey
+
+from motd_server import metrics
+from motd_server.wsgi import StartResponse, WSGIApplication, WSGIEnvironment
+
+PROFILE_PATH = "_profile"
+ROOT_STACK = "request"
+
+logger = logging.getLogger(__name__)
+
+
+class Trace:
+    """Self time of the application functions called while answering a request."""
+
+    def __init__(self, prefixes: tuple[str, ...]):
+        """Start timing the request.
+
+        Args:
+            prefixes: Path prefixes of the source files of the application functions.
+        """
+        self._prefixes = prefixes
+        self._frames: list[types.FrameType | None] = [None]
+        self._stacks = [ROOT_STACK]
+        self._mark = time.perf_counter()
+        self.self_times: dict[str, float] = {}
+
+    def _charge(self) -> None:
+        """Add the time elapsed since the last event to the function running."""
+        now = time.perf_counter()
+        stack = self._stacks[-1]
+        self.self_times[stack] = self.self_times.get(stack, 0.0) + now - self._mark
+        self._mark = now
+
+    def profile(self, frame: types.FrameType, event: str, _arg: typing.Any) -> None:
+        """Record the calls and returns of the application functions, for sys.setprofile.
+
+        Args:
+            frame: Frame of the function called or returning.
+            event: Kind of event.
+            _arg: Value returned or C function called, unused.
+        """
+        if event == "call":
+            if frame.f_code.co_filename.startswith(self._prefixes):
+                self._charge()
+                name = f"{frame.f_globals.get('__name__')}:{frame.f_code.co_name}"
+                self._frames.append(frame)
+                self._stacks.append(f"{self._stacks[-1]};{name}")
+        elif event == "return" and frame is self._frames[-1]:
+            self._charge()
+            self._frames.pop()
+            self._stacks.pop()
+
+    def finish(self) -> dict[str, float]:
+        """Stop timing the request.
+
+        Returns:
+            Dictionary mapping of folded stacks to their self time, in seconds.
+        """
+        self._charge()
+        self._frames.clear()
+        return self.self_times
+
+
+class Profiler:  # pylint: disable=too-few-public-methods
+    """WSGI middleware tracing a share of the requests."""
+
+    def __init__(
+        self, wsgi_app: WSGIApplication, sample_rate: float, prefixes: typing.Iterable[str]
+    ):
+        """Initialize the profiler.
+
+        Args:
+            wsgi_app: Application serving the requests.
+            sample_rate: Share of the requests traced, between 0 and 1.
+            prefixes: Path prefixes of the source files of the application functions.
+        """
+        self._wsgi_app = wsgi_app
+        self._sample_rate = sample_rate
+        self._prefixes = tuple(prefixes)
+
+    def __call__(
+        self, environ: WSGIEnvironment, start_response: StartResponse
+    ) -> typing.Iterable[bytes]:
+        """Serve a request, tracing it if it is sampled.
+
+        The body is traced until it is handed to the WSGI server, which sends it afterwards.
+
+        Args:
+            environ: WSGI environment of the request.
+            start_response: Callable starting the response.
+
+        Returns:
+            Response body.
+        """
+        if random.random() >= self._sample_rate:  # nosec B311
+            return self._wsgi_app(environ, start_response)
+        trace = Trace(self._prefixes)
+        previous = sys.getprofile()
+        sys.setprofile(trace.profile)
+        try:
+            return self._wsgi_app(environ, start_response)
+        finally:
+            sys.setprofile(previous)
+            record_trace(trace.finish())
+
+
+def record_trace(self_times: dict[str, float]) -> None:
+    """Add the self times of a traced request to the profile.
+
+    Args:
+        self_times: Dictionary mapping of folded stacks to their self time, in seconds.
+    """
+    metrics.PROFILE_SAMPLES.inc()
+    for stack, seconds in self_times.items():
+        metrics.PROFILE_SECONDS.labels(stack).inc(seconds)
+
+
+def render_profile() -> str:
+    """Render the profile of all the workers in the folded stacks format.
+
+    Returns:
+        One line per stack with its self time in microseconds, such as
+        request;app:index 42, sorted by stack.
+    """
+    lines = []
+    for metric in metrics.get_registry().collect():
+        if metric.name != "motd_profile_seconds":
+            continue
+        for sample in metric.samples:
+            microseconds = round(sample.value * 1_000_000)
+            if sample.name.endswith("_total") and microseconds:
+                lines.append(f"{sample.labels['stack']} {microseconds}\n")
+    return "".join(sorted(lines))
+
+
+def get_profile_sample_rate(config: typing.Mapping[str, typing.Any]) -> float:
+    """Get the share of the requests traced, configured by PROFILE_SAMPLE_RATE.
+
+    Args:
+        config: Application configuration.
+
+    Returns:
+        Sample rate between 0 and 1, 0 disabling the profiler, as it is under gevent.
+    """
+    sample_rate = min(max(float(config.get("PROFILE_SAMPLE_RATE", 0)), 0.0), 1.0)
+    if sample_rate and monkey.is_module_patched("threading"):
+        logger.warning("The profiler can't trace the requests of gevent workers, it is disabled")
+        return 0.0
+    return sample_rate
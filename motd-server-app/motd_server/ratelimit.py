@@ -0,0 +1,176 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Per-client rate limit absorbing the synchronized bursts of motd-news clients.
+
+Every client, identified by its address and the class of its user agent, has a token bucket
+refilled at a steady rate up to a burst size. A request takes a token; a client with an
+empty bucket is told when to come back instead of being served:
+
+* a client revalidating its copy gets a 304 Not Modified, and keeps its last good response;
+* any other client gets a 429 Too Many Requests.
+
+Both responses carry a Retry-After header and can be cached by the client until then.
+"""
+
+import collections
+import math
+import threading
+import time
+import typing
+
+from motd_server import metrics
+from motd_server.motd import extract_user_agent_info
+from motd_server.wsgi import (
+    CONDITIONAL_HEADERS,
+    StartResponse,
+    WSGIApplication,
+    WSGIEnvironment,
+)
+
+DEFAULT_BURST = 10
+DEFAULT_MAX_CLIENTS = 100000
+TOO_MANY_REQUESTS = b"Too many requests"
+
+ClientKey = tuple[str, tuple[str, str, str]]
+
+
+class TokenBucketLimiter:
+    """Token buckets of the clients, kept in memory."""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = DEFAULT_MAX_CLIENTS):
+        """Initialize the limiter.
+
+        Args:
+            rate: Tokens added to every bucket per second.
+            burst: Size of the buckets, at least 1.
+            max_clients: Number of buckets above which the least recently seen are forgotten.
+        """
+        self._rate = rate
+        self._burst = max(burst, 1.0)
+        self._max_clients = max_clients
+        # Ordered from the least to the most recently seen client
+        self._buckets: collections.OrderedDict[typing.Hashable, tuple[float, float]] = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Get the number of buckets.
+
+        Returns:
+            Number of clients with a bucket.
+        """
+        return len(self._buckets)
+
+    def acquire(self, key: typing.Hashable) -> float:
+        """Take a token from the bucket of a client.
+
+        Args:
+            key: Identifier of the client.
+
+        Returns:
+            0 if the client got a token, otherwise the seconds until its next token.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self._burst, now))
+            tokens = min(self._burst, tokens + (now - last) * self._rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / self._rate
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self._max_clients:
+                # Forgetting a bucket refills it, the least recently seen client is the most
+                # likely to have a full bucket anyway, and this costs the same for any number
+                # of clients
+                self._buckets.popitem(last=False)
+            return 0.0
+
+
+def get_client_key(environ: WSGIEnvironment) -> ClientKey:
+    """Identify the client of a request.
+
+    Args:
+        environ: WSGI environment of the request.
+
+    Returns:
+        Tuple of (address, (version, architecture, cloud)), the address being the one the
+        closest proxy saw if the request went through proxies.
+    """
+    forwarded = environ.get("HTTP_X_FORWARDED_FOR")
+    if forwarded:
+        address = forwarded.rsplit(",", 1)[-1].strip()
+    else:
+        address = environ.get("REMOTE_ADDR", "")
+    return address, extract_user_agent_info(environ.get("HTTP_USER_AGENT", ""))
+
+
+class RateLimit:  # pylint: disable=too-few-public-methods
+    """WSGI middleware answering the clients over their rate limit without serving them."""
+
+    def __init__(
+        self,
+        wsgi_app: WSGIApplication,
+        limiter: TokenBucketLimiter,
+        exempt_paths: typing.Iterable[str] = (),
+    ):
+        """Initialize the rate limit.
+
+        Args:
+            wsgi_app: Application serving the requests within the limit.
+            limiter: Token buckets of the clients.
+            exempt_paths: Paths that are never limited, matched exactly.
+        """
+        self._wsgi_app = wsgi_app
+        self._limiter = limiter
+        self._exempt_paths = frozenset(exempt_paths)
+
+    def __call__(
+        self, environ: WSGIEnvironment, start_response: StartResponse
+    ) -> typing.Iterable[bytes]:
+        """Serve a request, or tell the client to retry later.
+
+        Args:
+            environ: WSGI environment of the request.
+            start_response: Callable starting the response.
+
+        Returns:
+            Response body.
+        """
+        if environ.get("PATH_INFO") in self._exempt_paths:
+            return self._wsgi_app(environ, start_response)
+        wait = self._limiter.acquire(get_client_key(environ))
+        if not wait:
+            return self._wsgi_app(environ, start_response)
+
+        retry_after = str(math.ceil(wait))
+        headers = [
+            ("Retry-After", retry_after),
+            ("Cache-Control", f"private, max-age={retry_after}"),
+        ]
+        # Clients revalidating their copy can keep using it
+        if any(header in environ for header in CONDITIONAL_HEADERS):
+            metrics.RATE_LIMITED.labels(304).inc()
+            start_response("304 NOT MODIFIED", headers)
+            return []
+        metrics.RATE_LIMITED.labels(429).inc()
+        headers.append(("Content-Type", "text/plain; charset=utf-8"))
+        headers.append(("Content-Length", str(len(TOO_MANY_REQUESTS))))
+        start_response("429 TOO MANY REQUESTS", headers)
+        return [] if environ["REQUEST_METHOD"] == "HEAD" else [TOO_MANY_REQUESTS]
+
+
+def create_rate_limiter(config: typing.Mapping[str, typing.Any]) -> TokenBucketLimiter | None:
+    """Create the rate limiter configured by RATE_LIMIT and RATE_LIMIT_BURST.
+
+    Args:
+        config: Application configuration.
+
+    Returns:
+        Rate limiter, or None if requests are not limited.
+    """
+    rate = float(config.get("RATE_LIMIT", 0))
+    if rate <= 0:
+        return None
+    return TokenBucketLimiter(rate, float(config.get("RATE_LIMIT_BURST", DEFAULT_BURST)))
@@ -0,0 +1,123 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Hot reload of the MOTD content without restarting the workers."""
+
+import logging
+import os
+import threading
+import time
+import typing
+
+from motd_server.content import ContentLoadError
+from motd_server.metrics import CONTENT_RELOADS, update_user_agent_cache
+from motd_server.motd import extract_user_agent_info, get_files_source, process_config
+
+DEFAULT_RELOAD_INTERVAL = 5
+# Statistics of the caches are reported to the metrics of the worker at most this often
+CACHE_REPORT_INTERVAL = 10
+
+logger = logging.getLogger(__name__)
+
+
+class ContentReloader:  # pylint: disable=too-few-public-methods
+    """Reload the content when the FILES_BUNDLE bundle or the FILES_PATH file changes.
+
+    The content of the next segment of the schedule replaces the current one as soon as it
+    expires. The file is checked at most once per interval. A new content snapshot is fully built
+    before it replaces the current one, so requests never see a partial update, and a file
+    that can't be loaded, for example while it is being written, leaves the current one.
+    The statistics of the caches of the worker are reported to the metrics along the way.
+    """
+
+    def __init__(self, config: typing.MutableMapping[str, typing.Any]):
+        """Initialize the reloader.
+
+        Args:
+            config: Application configuration, updated in place on reload.
+        """
+        self._config = config
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._next_report = 0.0
+        self._signature = self._stat()
+
+    def _stat(self) -> tuple[int, int] | None:
+        """Get the signature of the files source.
+
+        Returns:
+            Tuple of (modification time, size), or None if there is no file.
+        """
+        files_source = get_files_source(self._config)
+        if not files_source:
+            return None
+        try:
+            stat = os.stat(files_source)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def maybe_reload(self) -> bool:
+        """Reload the content if the files source changed since the last check.
+
+        Returns:
+            True if the content was reloaded.
+        """
+        self.advance_schedule()
+        self.report_caches()
+        if not get_files_source(self._config) or time.monotonic() < self._next_check:
+            return False
+        # Only one thread checks, the others keep serving the current content
+        if not self._lock.acquire(blocking=False):  # pylint: disable=consider-using-with
+            return False
+        try:
+            interval = self._config.get("FILES_RELOAD_INTERVAL", DEFAULT_RELOAD_INTERVAL)
+            self._next_check = time.monotonic() + interval
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                return False
+
+            previous = self._config["MOTD_CONTENT"].version
+            # A file that can't be loaded is not retried until it changes again
+            self._signature = signature
+            try:
+                process_config(self._config, strict=True)
+            except ContentLoadError as e:
+                logger.error("Keeping content version %s: %s", previous, e)
+                return False
+            CONTENT_RELOADS.inc()
+            logger.info(
+                "Reloaded content version %s (was %s)",
+                self._config["MOTD_CONTENT"].version,
+                previous,
+            )
+            return True
+        finally:
+            self._lock.release()
+
+    def report_caches(self) -> None:
+        """Report the statistics of the caches of the worker if the last report is old enough."""
+        now = time.monotonic()
+        if now < self._next_report:
+            return
+        self._next_report = now + CACHE_REPORT_INTERVAL
+        update_user_agent_cache(extract_user_agent_info.cache_info())
+
+    def advance_schedule(self) -> bool:
+        """Switch to the content of the current segment of the schedule if the previous expired.
+
+        Returns:
+            True if the content changed.
+        """
+        now = time.time()
+        if now < self._config["MOTD_CONTENT"].expires:
+            return False
+        # Happens once per boundary, and must not undo a reload running concurrently
+        with self._lock:
+            content = self._config["MOTD_CONTENT"]
+            current = content.at(now)
+            if current is content:
+                return False
+            self._config["MOTD_CONTENT"] = current
+        logger.info("Scheduled content version %s (was %s)", current.version, content.version)
+        return True
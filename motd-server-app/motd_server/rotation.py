@@ -0,0 +1,177 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Weighted rotation between several variants of a file.
+
+A file defined as a list rotates between its variants:
+
+    index-24.04.txt:
+      - name: upgrade
+        weight: 3
+        content: Upgrade to 24.04.1 now
+      - Read the 24.04 release notes
+
+Each variant is picked in constant time from an alias table built at load time, either at
+random or from the hash of an identifier so that a client always gets the same variant.
+"""
+
+import dataclasses
+import datetime
+import hashlib
+import logging
+import random
+
+from motd_server.caching import apply_cache_rules
+from motd_server.compression import compress_entries
+from motd_server.content import BodyStore, Entry, build_entries
+from motd_server.metrics import CONTENT_LOAD_FAILURES
+
+VARIANT_HEADER = "X-MOTD-Variant"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class Rotation:
+    """Variants of a file with an alias table picking them according to their weights.
+
+    Attributes:
+        names: Name of every variant.
+        entries: Entry of every variant.
+        probabilities: Probability of keeping every slot of the alias table.
+        aliases: Variant picked instead of every slot when it is not kept.
+    """
+
+    names: tuple[str, ...]
+    entries: tuple[Entry, ...]
+    probabilities: tuple[float, ...]
+    aliases: tuple[int, ...]
+
+    def pick(self, identifier: str | None = None) -> tuple[str, Entry]:
+        """Pick a variant.
+
+        Args:
+            identifier: Stable identifier of the client, if any.
+
+        Returns:
+            Tuple of (variant name, entry), always the same for the same identifier.
+        """
+        scaled = get_uniform(identifier) * len(self.names)
+        index = int(scaled)
+        if scaled - index >= self.probabilities[index]:
+            index = self.aliases[index]
+        return self.names[index], self.entries[index]
+
+
+def get_uniform(identifier: str | None) -> float:
+    """Get a number uniformly distributed in [0, 1).
+
+    Args:
+        identifier: Identifier the number is derived from, or None for a random number.
+
+    Returns:
+        Random number, or the same number for the same identifier in every worker.
+    """
+    if identifier is None:
+        return random.random()  # nosec B311
+    digest = hashlib.blake2b(identifier.encode("utf-8"), digest_size=8).digest()
+    # Only the 53 bits a float holds exactly, dividing 64 bits can round up to 1.0
+    return (int.from_bytes(digest, "big") >> 11) / 2**53
+
+
+def build_alias_table(weights: list[float]) -> tuple[tuple[float, ...], tuple[int, ...]]:
+    """Build the alias table of a discrete distribution with Vose's method.
+
+    Args:
+        weights: Positive weight of every outcome.
+
+    Returns:
+        Tuple of (probabilities, aliases) of every slot.
+    """
+    count = len(weights)
+    total = sum(weights)
+    scaled = [weight * count / total for weight in weights]
+    probabilities = [1.0] * count
+    aliases = list(range(count))
+    small = [index for index, value in enumerate(scaled) if value < 1]
+    large = [index for index, value in enumerate(scaled) if value >= 1]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        probabilities[less] = scaled[less]
+        aliases[less] = more
+        scaled[more] += scaled[less] - 1
+        (small if scaled[more] < 1 else large).append(more)
+    # Whatever is left is only off 1 by rounding errors
+    return tuple(probabilities), tuple(aliases)
+
+
+def parse_variants(filename: str, definitions: list) -> list[tuple[str, float, object]]:
+    """Parse the variants of a file, skipping the invalid ones.
+
+    Args:
+        filename: Name of the file.
+        definitions: Variants, as content or as mappings with content, weight and name.
+
+    Returns:
+        List of (name, weight, content) of the valid variants.
+    """
+    variants = []
+    for index, definition in enumerate(definitions):
+        if not isinstance(definition, dict):
+            definition = {"content": definition}
+        try:
+            weight = float(definition.get("weight", 1))
+        except (TypeError, ValueError):
+            weight = 0
+        if "content" not in definition or not weight > 0:
+            logger.error("Variant %d of %s needs a content and a positive weight", index, filename)
+            CONTENT_LOAD_FAILURES.inc()
+            continue
+        variants.append((str(definition.get("name", index)), weight, definition["content"]))
+
+    return variants
+
+
+def build_rotations(
+    files: dict,
+    cache_rules: list[tuple[str, str]],
+    last_modified: datetime.datetime,
+    bodies: BodyStore | None = None,
+    compress: bool = True,
+) -> dict[str, Rotation]:
+    """Build the rotation of every file defined as a list of variants.
+
+    Args:
+        files: Dictionary mapping of filenames to their content.
+        cache_rules: List of (glob, Cache-Control header value) in order of precedence.
+        last_modified: Time at which the content was loaded.
+        bodies: Store sharing the identical bodies, if any.
+        compress: Whether to build the compressed variants of the entries.
+
+    Returns:
+        Dictionary mapping of filenames to their rotations, for files with valid variants.
+    """
+    rotations = {}
+    for filename, definitions in files.items():
+        if not isinstance(definitions, list):
+            continue
+        variants = parse_variants(filename, definitions)
+        if not variants:
+            continue
+
+        entries = []
+        for _, _, content in variants:
+            variant_entries = build_entries({filename: content}, last_modified, bodies)
+            variant_entries = apply_cache_rules(variant_entries, cache_rules)
+            if compress:
+                variant_entries = compress_entries(variant_entries, bodies)
+            entries.append(variant_entries[filename])
+        probabilities, aliases = build_alias_table([weight for _, weight, _ in variants])
+        rotations[filename] = Rotation(
+            names=tuple(name for name, _, _ in variants),
+            entries=tuple(entries),
+            probabilities=probabilities,
+            aliases=aliases,
+        )
+
+    return rotations
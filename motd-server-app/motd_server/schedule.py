@@ -0,0 +1,145 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Files served only between a start and an end time.
+
+A file defined as a mapping is scheduled by its optional start and end timestamps:
+
+    index-20.04.txt:
+      start: 2025-04-01T00:00:00Z
+      end: 2025-06-01T00:00:00Z
+      content: Ubuntu 20.04 reaches the end of its standard support on May 31
+
+The start and end times of every file split time into segments during which the same files
+are active. The content of a segment is built the first time it is needed, then reused until
+the next boundary, so requests never go through the schedule.
+"""
+
+import bisect
+import datetime
+import logging
+import math
+import threading
+import typing
+
+from motd_server.metrics import CONTENT_LOAD_FAILURES
+
+# Settings of a file, as opposed to the settings of its variants
+FILE_SETTINGS = ("start", "end")
+
+logger = logging.getLogger(__name__)
+
+T = typing.TypeVar("T")
+
+
+def parse_timestamp(value: object) -> float:
+    """Parse a timestamp of the files configuration.
+
+    Args:
+        value: Timestamp, as parsed by YAML or as an ISO 8601 string, in UTC unless specified.
+
+    Returns:
+        Timestamp, in seconds since the epoch.
+
+    Raises:
+        ValueError: If the value is not a timestamp.
+    """
+    if isinstance(value, str):
+        # Python 3.10 doesn't support the Z suffix
+        value = datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        value = datetime.datetime(value.year, value.month, value.day)
+    if not isinstance(value, datetime.datetime):
+        raise ValueError(f"{value!r} is not a timestamp")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+
+def parse_schedule(files: dict) -> tuple[dict, dict[str, tuple[float, float]]]:
+    """Extract the schedule of the files defined as mappings.
+
+    Args:
+        files: Dictionary mapping of filenames to their content or definition.
+
+    Returns:
+        Tuple of (dictionary mapping of filenames to their content, dictionary mapping of
+        scheduled filenames to their start and end timestamps). Files with an invalid
+        definition are left out.
+    """
+    contents = {}
+    windows = {}
+    for filename, definition in files.items():
+        if not isinstance(definition, dict):
+            contents[filename] = definition
+            continue
+        try:
+            if "content" not in definition:
+                raise ValueError("no content")
+            start = parse_timestamp(definition["start"]) if "start" in definition else -math.inf
+            end = parse_timestamp(definition["end"]) if "end" in definition else math.inf
+        except ValueError as e:
+            logger.error("Invalid definition of %s: %s", filename, e)
+            CONTENT_LOAD_FAILURES.inc()
+            continue
+        contents[filename] = definition["content"]
+        if start > -math.inf or end < math.inf:
+            windows[filename] = (start, end)
+
+    return contents, windows
+
+
+class Timeline(typing.Generic[T]):
+    """Objects built for the files active in each segment of a schedule."""
+
+    def __init__(
+        self,
+        windows: dict[str, tuple[float, float]],
+        build: typing.Callable[[frozenset[str], float, float], T],
+    ):
+        """Initialize the timeline.
+
+        Args:
+            windows: Dictionary mapping of scheduled filenames to their start and end.
+            build: Function building the object of a segment from the scheduled files
+                active during it and the times it starts and ends at.
+        """
+        self._windows = windows
+        self._build = build
+        self._boundaries = sorted(
+            {bound for window in windows.values() for bound in window if math.isfinite(bound)}
+        )
+        self._segments: dict[int, T] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def boundaries(self) -> list[float]:
+        """Times at which the active files change.
+
+        Returns:
+            Sorted timestamps.
+        """
+        return self._boundaries
+
+    def at(self, now: float) -> T:
+        """Get the object of the segment of a time.
+
+        Args:
+            now: Timestamp, in seconds since the epoch.
+
+        Returns:
+            Object built for the files active at that time.
+        """
+        index = bisect.bisect_right(self._boundaries, now)
+        # Only called when a segment expires, so taking the lock is cheap enough
+        with self._lock:
+            if index not in self._segments:
+                start = self._boundaries[index - 1] if index else -math.inf
+                end = self._boundaries[index] if index < len(self._boundaries) else math.inf
+                active = frozenset(
+                    filename
+                    for filename, (file_start, file_end) in self._windows.items()
+                    if file_start <= start < file_end
+                )
+                self._segments[index] = self._build(active, start, end)
+            return self._segments[index]
@@ -0,0 +1,148 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Zero-copy sending of the bodies held by the content store.
+
+Large bodies of the content store are handed to the WSGI server as a file wrapping their span
+of the store file, which gunicorn sends with sendfile(2) straight from the page cache rather
+than copying them through Python on every request. Smaller bodies, for which the system
+calls cost more than the copy, and bodies only held in memory are sent as bytes.
+"""
+
+import io
+import logging
+import typing
+
+from werkzeug.wsgi import wrap_file
+
+from motd_server.content import IDENTITY, Entry, FileSpan
+
+# Bodies smaller than this are copied from memory
+SENDFILE_MIN_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class SpanFile(io.RawIOBase):
+    """Read-only file limited to a span of another file.
+
+    WSGI servers sending files with sendfile(2) start at the position of its descriptor and
+    stop at the Content-Length of the response, the others read it until its end. Positions
+    are the positions in the whole file, which sendfile(2) works with.
+    """
+
+    def __init__(self, path: str, offset: int, size: int):
+        """Open a span of a file.
+
+        Args:
+            path: Path of the file.
+            offset: Offset of the span in the file.
+            size: Size of the span, in bytes.
+        """
+        super().__init__()
+        self._file = open(path, "rb", buffering=0)  # pylint: disable=consider-using-with
+        self._file.seek(offset)
+        self._remaining = size
+
+    def readable(self) -> bool:
+        """Tell whether the file can be read.
+
+        Returns:
+            True.
+        """
+        return True
+
+    def seekable(self) -> bool:
+        """Tell whether the file supports random access.
+
+        Returns:
+            True.
+        """
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Move to a position of the whole file.
+
+        Args:
+            offset: Position, relative to whence.
+            whence: Reference of the position.
+
+        Returns:
+            New position in the whole file.
+        """
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        """Get the position in the whole file.
+
+        Returns:
+            Current position.
+        """
+        return self._file.tell()
+
+    def fileno(self) -> int:
+        """Get the descriptor of the file, positioned at the next byte of the span.
+
+        Returns:
+            File descriptor.
+        """
+        return self._file.fileno()
+
+    def readinto(self, buffer: typing.Any) -> int:
+        """Read the next bytes of the span.
+
+        Args:
+            buffer: Writable buffer the bytes are read into.
+
+        Returns:
+            Number of bytes read, 0 at the end of the span.
+        """
+        size = self._file.readinto(memoryview(buffer)[: self._remaining]) or 0
+        self._remaining -= size
+        return size
+
+    def close(self) -> None:
+        """Close the file."""
+        self._file.close()
+        super().close()
+
+
+def get_span(entry: Entry, encoding: str | None) -> FileSpan | None:
+    """Get the span of the content store to send a body from, if it is worth it.
+
+    Args:
+        entry: Entry being served.
+        encoding: Content coding of the variant sent, None for the body itself.
+
+    Returns:
+        Span of the store file holding the body, or None if it must be sent from memory.
+    """
+    span = entry.spans.get(encoding or IDENTITY)
+    if span is None or span.size < SENDFILE_MIN_SIZE:
+        return None
+    return span
+
+
+def send_span(
+    environ: dict[str, typing.Any], span: FileSpan, start: int = 0, length: int | None = None
+) -> typing.Iterable[bytes] | None:
+    """Wrap a span for the WSGI server to send it from its file.
+
+    Args:
+        environ: WSGI environment of the request.
+        span: Span of the body.
+        start: Offset of the first byte sent in the body.
+        length: Number of bytes sent, defaults to the rest of the body.
+
+    Returns:
+        Body of the response, or None if the file can't be opened, for example because a
+        newer content removed it, and the body must be sent from memory.
+    """
+    if length is None:
+        length = span.size - start
+    try:
+        span_file = SpanFile(span.path, span.offset + start, length)
+    except OSError as e:
+        logger.warning("Could not send the body from %s, sending it from memory: %s", span.path, e)
+        return None
+    return wrap_file(environ, typing.cast(typing.IO[bytes], span_file))
@@ -0,0 +1,204 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Content store shared by the workers through the page cache.
+
+The bodies and the compressed variants of every entry are written once to a store file,
+named after a hash of the entries, then memory-mapped read-only by every worker. Only the
+worker writing the store compresses the entries, the others find their variants in it. Entries
+point at views of the mapping rather than at bytes of their own, so all the workers share a
+single copy of the content however many of them there are.
+
+A store file starts with the length of its JSON index, as an unsigned 64-bit little-endian
+integer, followed by the index and the data. The index maps every entry to the offset and
+size of its body and of each of its variants, entries with the same ETag sharing them.
+"""
+
+import dataclasses
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+import typing
+
+from motd_server.content import IDENTITY, Entry, FileSpan
+from motd_server.metrics import CONTENT_LOAD_FAILURES
+
+HEADER = struct.Struct("<Q")
+STORE_SUFFIX = ".store"
+# Stores of other entries are kept this long, for the workers still loading them
+STORE_RETENTION = 60
+# Key of the body of an entry in the index, next to the content codings of its variants
+BODY = ""
+
+logger = logging.getLogger(__name__)
+
+StoreIndex = dict[str, dict[str, tuple[int, int]]]
+
+
+def get_store_key(entries: dict[str, Entry]) -> str:
+    """Get the key identifying the store of a set of entries.
+
+    Args:
+        entries: Dictionary mapping of unique names to entries.
+
+    Returns:
+        Hash of the names and bodies of the entries, known before they are compressed.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(entries):
+        digest.update(f"{name}\0{entries[name].etag}\n".encode())
+    return digest.hexdigest()
+
+
+def write_store(path: str, entries: dict[str, Entry]) -> None:
+    """Write the store of a set of entries, atomically.
+
+    Args:
+        path: Path of the store file.
+        entries: Dictionary mapping of unique names to entries.
+    """
+    index: StoreIndex = {}
+    # Entries with the same ETag have the same body and variants, which are written once
+    items: dict[tuple[str, str], tuple[int, int]] = {}
+    chunks = []
+    offset = 0
+    for name, entry in entries.items():
+        index[name] = {}
+        for key, data in ((BODY, entry.body), *entry.variants.items()):
+            if (entry.etag, key) not in items:
+                items[entry.etag, key] = (offset, len(data))
+                chunks.append(data)
+                offset += len(data)
+            index[name][key] = items[entry.etag, key]
+    header = json.dumps(index, separators=(",", ":")).encode("utf-8")
+
+    directory = os.path.dirname(path)
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=".tmp", delete=False) as store_file:
+        store_file.write(HEADER.pack(len(header)))
+        store_file.write(header)
+        for data in chunks:
+            store_file.write(data)
+    # Workers loading the same content concurrently write the same bytes, any of them wins
+    os.replace(store_file.name, path)
+
+
+def read_store(path: str, entries: dict[str, Entry]) -> dict[str, Entry]:
+    """Map a store file and point the entries at it.
+
+    Args:
+        path: Path of the store file.
+        entries: Dictionary mapping of unique names to entries.
+
+    Returns:
+        Dictionary mapping of the same names to copies of the entries whose body and
+        variants, as written to the store, are read-only views of the store, along with
+        their spans of the store file.
+
+    Raises:
+        ValueError: If the store doesn't hold the entries.
+    """
+    with open(path, "rb") as store_file:
+        store = mmap.mmap(store_file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(store)
+    (length,) = HEADER.unpack_from(view)
+    index: StoreIndex = json.loads(bytes(view[HEADER.size : HEADER.size + length]))
+    start = HEADER.size + length
+
+    def get_view(name: str, key: str) -> memoryview:
+        """Get the view of an item of the store.
+
+        Args:
+            name: Name of the entry.
+            key: Content coding of the variant, or BODY.
+
+        Returns:
+            Read-only view of the item.
+        """
+        offset, size = index[name][key]
+        return view[start + offset : start + offset + size]
+
+    def get_spans(name: str) -> dict[str, FileSpan]:
+        """Get the spans of the store file holding the items of an entry.
+
+        Args:
+            name: Name of the entry.
+
+        Returns:
+            Dictionary mapping of content codings to spans, IDENTITY for the body.
+        """
+        return {
+            key or IDENTITY: FileSpan(path, start + offset, size)
+            for key, (offset, size) in index[name].items()
+        }
+
+    try:
+        return {
+            name: dataclasses.replace(
+                entry,
+                body=get_view(name, BODY),
+                variants={key: get_view(name, key) for key in index[name] if key != BODY},
+                spans=get_spans(name),
+            )
+            for name, entry in entries.items()
+        }
+    except KeyError as e:
+        raise ValueError(f"{path} has no {e}") from e
+
+
+def share_entries(
+    directory: str,
+    entries: dict[str, Entry],
+    compress: typing.Callable[[dict[str, Entry]], dict[str, Entry]],
+) -> dict[str, Entry]:
+    """Move the bodies and variants of entries to the shared store.
+
+    The store is only written, and the entries compressed, by the first worker loading the
+    entries, the others map it. Older stores of other entries are then removed, the workers
+    still mapping them keep their pages.
+
+    Args:
+        directory: Directory of the store files.
+        entries: Dictionary mapping of unique names to entries, without their variants.
+        compress: Function building the variants of entries.
+
+    Returns:
+        Dictionary mapping of the same names to entries backed by the store, or the entries
+        compressed in memory if the store can't be used.
+    """
+    path = os.path.join(directory, get_store_key(entries) + STORE_SUFFIX)
+    compressed = None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(path):
+            compressed = compress(entries)
+            write_store(path, compressed)
+            remove_stores(directory, time.time() - STORE_RETENTION)
+        return read_store(path, entries)
+    except (OSError, ValueError) as e:
+        logger.error("Could not use the content store, the content is not shared: %s", e)
+        CONTENT_LOAD_FAILURES.inc()
+        return compress(entries) if compressed is None else compressed
+
+
+def remove_stores(directory: str, before: float) -> None:
+    """Remove the store files last modified before a time.
+
+    Args:
+        directory: Directory of the store files.
+        before: Timestamp, in seconds since the epoch.
+    """
+    for filename in os.listdir(directory):
+        if not filename.endswith(STORE_SUFFIX):
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            if os.stat(path).st_mtime < before:
+                os.unlink(path)
+        except FileNotFoundError:
+            # Another worker removed it first
+            continue
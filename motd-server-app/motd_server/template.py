@@ -0,0 +1,113 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""MOTD bodies filled with the version, architecture and cloud of each client.
+
+A MOTD body containing {version}, {arch} or {cloud} is a template:
+
+    index.txt: Welcome to Ubuntu {version} on {cloud}
+
+Templates are split into literal text and placeholders once at load time. Every rendered
+body is encoded, hashed and compressed once, at fast levels since it is on the path of a
+request, and kept in a bounded LRU cache of the template, so serving a client the cache
+already saw costs a single lookup. The cache is keyed on the placeholders the template
+uses only, and the templates are compiled again with the content, which drops their cache.
+"""
+
+import dataclasses
+import functools
+import hashlib
+import re
+import typing
+
+from motd_server.compression import FAST_ENCODINGS, compress_entry
+from motd_server.content import Entry
+
+PLACEHOLDER_PATTERN = re.compile(r"\{(version|arch|cloud)\}")
+TEMPLATE_CACHE_SIZE = 4096
+
+
+@dataclasses.dataclass(frozen=True, eq=False)
+class Template:
+    """Compiled template of a MOTD body.
+
+    Templates are compared by identity, which keeps them cheap to use as cache keys.
+
+    Attributes:
+        parts: Literal text at even positions, placeholder names at odd positions.
+        entry: Entry serving the template itself, whose settings the rendered entries share.
+    """
+
+    parts: tuple[str, ...]
+    entry: Entry
+    _placeholders: frozenset[str] = dataclasses.field(init=False, repr=False)
+    _render: typing.Callable[[str, str, str], Entry] = dataclasses.field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        """Create the cache of the rendered entries."""
+        object.__setattr__(self, "_placeholders", frozenset(self.parts[1::2]))
+        render = functools.partial(render_template, self.parts, self.entry)
+        object.__setattr__(self, "_render", functools.lru_cache(TEMPLATE_CACHE_SIZE)(render))
+
+    def render(self, version: str, arch: str, cloud: str) -> Entry:
+        """Get the entry of the template filled with the information of a client.
+
+        Args:
+            version: Ubuntu version (e.g., "24.04").
+            arch: System architecture (e.g., "amd64").
+            cloud: Cloud provider ID.
+
+        Returns:
+            Entry of the rendered body, from the cache if it was rendered before.
+        """
+        # Values the template doesn't use can't change the body, so they share its render
+        return self._render(
+            version if "version" in self._placeholders else "",
+            arch if "arch" in self._placeholders else "",
+            cloud if "cloud" in self._placeholders else "",
+        )
+
+
+def compile_template(entry: Entry) -> Entry:
+    """Compile the body of an entry if it is a template.
+
+    Args:
+        entry: Entry of a MOTD file.
+
+    Returns:
+        Copy of the entry with its compiled template, or the entry itself if its body has
+        no placeholder or is not UTF-8.
+    """
+    try:
+        parts = tuple(PLACEHOLDER_PATTERN.split(bytes(entry.body).decode("utf-8")))
+    except UnicodeDecodeError:
+        return entry
+    if len(parts) == 1:
+        return entry
+    return dataclasses.replace(entry, template=Template(parts, entry))
+
+
+def render_template(
+    parts: tuple[str, ...], entry: Entry, version: str, arch: str, cloud: str
+) -> Entry:
+    """Render a template for a client.
+
+    Args:
+        parts: Literal text at even positions, placeholder names at odd positions.
+        entry: Entry serving the template itself.
+        version: Ubuntu version (e.g., "24.04").
+        arch: System architecture (e.g., "amd64").
+        cloud: Cloud provider ID.
+
+    Returns:
+        Entry of the rendered body with its compressed variants.
+    """
+    values = {"version": version, "arch": arch, "cloud": cloud}
+    body = "".join(values[part] if index % 2 else part for index, part in enumerate(parts)).encode(
+        "utf-8"
+    )
+    # The rendered body is only held in memory, unlike the template it may come from
+    rendered = dataclasses.replace(
+        entry, body=body, etag=hashlib.sha256(body).hexdigest(), spans={}
+    )
+    return compress_entry(rendered, FAST_ENCODINGS)
@@ -0,0 +1,230 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Lean WSGI fast path serving the MOTD and the files without going through Flask."""
+
+import time
+import typing
+
+from werkzeug.http import http_date, is_resource_modified, parse_accept_header
+from werkzeug.utils import get_content_type
+
+from motd_server import metrics
+from motd_server.access_log import AccessLog
+from motd_server.content import Entry, FileSpan
+from motd_server.motd import Content, extract_user_agent_info
+from motd_server.reload import ContentReloader
+from motd_server.rotation import VARIANT_HEADER
+from motd_server.sendfile import get_span, send_span
+
+WSGIEnvironment = dict[str, typing.Any]
+StartResponse = typing.Callable[..., typing.Any]
+WSGIApplication = typing.Callable[[WSGIEnvironment, StartResponse], typing.Iterable[bytes]]
+
+# Requests with these headers need the full conditional and range handling of Flask
+FALLBACK_HEADERS = ("HTTP_IF_MATCH", "HTTP_IF_RANGE", "HTTP_RANGE")
+# Requests without these headers always get the full response
+CONDITIONAL_HEADERS = ("HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE")
+# Headers kept in a 304 response, the others describe the body that is not sent
+NOT_MODIFIED_HEADERS = frozenset(
+    ("ETag", "Vary", "Cache-Control", "Date", "X-Content-Version", "Accept-Ranges", VARIANT_HEADER)
+)
+
+
+class FastPath:  # pylint: disable=too-few-public-methods
+    """WSGI middleware answering the MOTD and file requests straight from the content table.
+
+    It sends the same responses as the Flask views, without building a request context,
+    matching the URL map or creating request and response objects. Every other request,
+    including the ones that end up as errors, is passed to the wrapped application.
+    """
+
+    def __init__(
+        self,
+        wsgi_app: WSGIApplication,
+        config: typing.Mapping[str, typing.Any],
+        reloader: ContentReloader,
+        reserved_paths: typing.Iterable[str] = (),
+        access_log: AccessLog | None = None,
+    ):
+        """Initialize the fast path.
+
+        Args:
+            wsgi_app: Application serving the requests the fast path doesn't handle.
+            config: Application configuration holding the current content.
+            reloader: Reloader of the content.
+            reserved_paths: Path prefixes of the routes of the wrapped application.
+            access_log: Access log of the requests the fast path serves, if enabled.
+        """
+        self._wsgi_app = wsgi_app
+        self._config = config
+        self._reloader = reloader
+        self._reserved_paths = tuple(reserved_paths)
+        self._access_log = access_log
+
+    def __call__(  # pylint: disable=too-many-locals
+        self, environ: WSGIEnvironment, start_response: StartResponse
+    ) -> typing.Iterable[bytes]:
+        """Serve a request.
+
+        Args:
+            environ: WSGI environment of the request.
+            start_response: Callable starting the response.
+
+        Returns:
+            Response body.
+        """
+        start = time.perf_counter()
+        match = self._match(environ)
+        if match is None:
+            return self._wsgi_app(environ, start_response)
+
+        route, filename, content, client = match
+        entry, variant, vary = self._get_entry(environ, content, filename)
+        if entry is None:
+            return self._wsgi_app(environ, start_response)
+
+        if client:
+            if entry.template:
+                entry = entry.template.render(*client)
+            # The selected content depends on the user agent, so shared caches must key on it
+            vary.append("User-Agent")
+        status, body, span, headers = build_entry_response(
+            environ, entry, content.version, vary, variant
+        )
+
+        seconds = time.perf_counter() - start
+        metrics.REQUESTS.labels(route, status).inc()
+        metrics.REQUEST_DURATION.labels(route).observe(seconds)
+        metrics.RESPONSE_SIZE.labels(route).observe(len(body))
+        if self._access_log:
+            self._access_log.log(
+                environ.get("HTTP_USER_AGENT", ""),
+                seconds,
+                route=route,
+                path=environ.get("PATH_INFO") or "/",
+                key=filename,
+                status=status,
+                bytes=len(body),
+            )
+        start_response("200 OK" if status == 200 else "304 NOT MODIFIED", headers)
+        if status == 304 or environ["REQUEST_METHOD"] == "HEAD":
+            return []
+        if span is not None:
+            span_body = send_span(environ, span)
+            if span_body is not None:
+                return span_body
+        # WSGI servers only accept bytes, so views of a bundle or of the store are copied here
+        return [bytes(body)]
+
+    def _match(
+        self, environ: WSGIEnvironment
+    ) -> tuple[str, str, Content, tuple[str, str, str] | None] | None:
+        """Find the file answering a request, if the fast path can serve it.
+
+        Args:
+            environ: WSGI environment of the request.
+
+        Returns:
+            Tuple of (route, filename, content, client), client being the version,
+            architecture and cloud of the client for the MOTD, or None if the wrapped
+            application must serve the request.
+        """
+        if environ["REQUEST_METHOD"] not in ("GET", "HEAD") or any(
+            header in environ for header in FALLBACK_HEADERS
+        ):
+            return None
+        try:
+            # WSGI servers decode the path as latin-1, URLs are UTF-8
+            path = (environ.get("PATH_INFO") or "/").encode("latin-1").decode("utf-8")
+        except UnicodeError:
+            return None
+        if "//" in path or path.startswith(self._reserved_paths):
+            return None
+
+        self._reloader.maybe_reload()
+        content = self._config["MOTD_CONTENT"]
+        if path != "/":
+            return "serve_file", path[1:], content, None
+
+        client = extract_user_agent_info(environ.get("HTTP_USER_AGENT", ""))
+        filename, level = content.router.resolve_route(*client)
+        if not filename:
+            return None
+        metrics.MOTD_SELECTIONS.labels(level).inc()
+        return "index", filename, content, client
+
+    def _get_entry(
+        self, environ: WSGIEnvironment, content: Content, filename: str
+    ) -> tuple[Entry | None, str, list[str]]:
+        """Get the entry serving a file, picking one of its variants if it rotates.
+
+        Args:
+            environ: WSGI environment of the request.
+            content: Content the file belongs to.
+            filename: Name of the file.
+
+        Returns:
+            Tuple of (entry, variant name, request headers the variant was picked from).
+        """
+        pin_header = self._config.get("VARIANT_PIN_HEADER")
+        identifier = None
+        if pin_header:
+            identifier = environ.get(f"HTTP_{pin_header.upper().replace('-', '_')}")
+        entry, variant = content.get_entry(filename, identifier)
+        return entry, variant, [pin_header] if variant and pin_header else []
+
+
+def build_entry_response(
+    environ: WSGIEnvironment, entry: Entry, content_version: str, vary: list[str], variant: str
+) -> tuple[int, bytes | memoryview, FileSpan | None, list[tuple[str, str]]]:
+    """Build the response serving an entry, like entry_response does for Flask.
+
+    Args:
+        environ: WSGI environment of the request.
+        entry: Entry to serve.
+        content_version: Version of the content the entry belongs to.
+        vary: Request headers the entry was selected from.
+        variant: Name of the variant of the entry, empty if its file doesn't rotate.
+
+    Returns:
+        Tuple of (status, body, span, headers), the status being 304 if the client copy is
+        fresh, and the span being the span of the store file to send the body from, if any.
+    """
+    encoding = None
+    if entry.variants:
+        vary = ["Accept-Encoding", *vary]
+        encoding = parse_accept_header(environ.get("HTTP_ACCEPT_ENCODING")).best_match(
+            entry.variants
+        )
+
+    headers = [("Content-Type", get_content_type(entry.mimetype, "utf-8"))]
+    if encoding:
+        body = entry.variants[encoding]
+        etag = f'"{entry.etag}-{encoding}"'
+        headers.append(("Content-Encoding", encoding))
+    else:
+        body = entry.body
+        etag = f'"{entry.etag}"'
+    span = get_span(entry, encoding)
+    if span is not None:
+        # Range requests go through Flask, which supports them for bodies sent from a file
+        headers.append(("Accept-Ranges", "bytes"))
+    last_modified = http_date(entry.last_modified)
+    headers.append(("Content-Length", str(len(body))))
+    headers.append(("ETag", etag))
+    if vary:
+        headers.append(("Vary", ", ".join(vary)))
+    if entry.cache_control:
+        headers.append(("Cache-Control", entry.cache_control))
+    headers.append(("Last-Modified", last_modified))
+    headers.append(("Date", http_date()))
+    headers.append(("X-Content-Version", content_version))
+    if variant:
+        headers.append((VARIANT_HEADER, variant))
+
+    if not any(header in environ for header in CONDITIONAL_HEADERS) or is_resource_modified(
+        environ, etag, last_modified=last_modified
+    ):
+        return 200, body, span, headers
+    return 304, body, span, [header for header in headers if header[0] in NOT_MODIFIED_HEADERS]
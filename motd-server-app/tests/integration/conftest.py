@@ -3,6 +3,10 @@
 
 """Generated expected results for integration tests."""
 
+import shutil
+import socket
+import subprocess  # nosec B404
+import time
 from pathlib import Path
 
 import pytest
@@ -11,6 +15,27 @@ from app import app
 from motd_server.motd import process_config
 
 MOTD_CONFIG = "../tests/integration/charm-files.yaml"
+NGINX_CONFIG = """
+daemon off;
+master_process off;
+pid {prefix}/nginx.pid;
+error_log {prefix}/error.log;
+events {{
+}}
+http {{
+    access_log off;
+    client_body_temp_path {prefix}/client_body;
+    proxy_temp_path {prefix}/proxy;
+    fastcgi_temp_path {prefix}/fastcgi;
+    uwsgi_temp_path {prefix}/uwsgi;
+    scgi_temp_path {prefix}/scgi;
+    include {maps};
+    server {{
+        listen 127.0.0.1:{port};
+        include {locations};
+    }}
+}}
+"""
 
 
 @pytest.fixture(name="test_app")
@@ -38,6 +63,59 @@ def client_fixture(test_app):
         yield client
 
 
+@pytest.fixture(name="nginx")
+def nginx_fixture(tmp_path_factory):
+    """Fixture running nginx, skipping the test if nginx is not installed.
+
+    Yields:
+        Function starting nginx with the configuration files of the http and server blocks,
+        returning the local port it listens on.
+    """
+    executable = shutil.which("nginx")
+    if executable is None:
+        pytest.skip("nginx is not installed")
+    processes = []
+
+    def start(maps: Path, locations: Path) -> int:
+        """Start nginx.
+
+        Args:
+            maps: Configuration of the http block.
+            locations: Configuration of the server block.
+
+        Returns:
+            Port nginx listens on.
+        """
+        prefix = tmp_path_factory.mktemp("nginx")
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        config_path = prefix / "nginx.conf"
+        config_path.write_text(
+            NGINX_CONFIG.format(prefix=prefix, port=port, maps=maps, locations=locations),
+            encoding="utf-8",
+        )
+        command = [str(executable), "-p", str(prefix), "-c", str(config_path)]
+        # The processes are stopped once the test is done
+        process = subprocess.Popen(command)  # pylint: disable=consider-using-with  # nosec B603
+        processes.append(process)
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return port
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    yield start
+
+    for process in processes:
+        process.terminate()
+        process.wait()
+
+
 @pytest.fixture(name="expected_motd_contents")
 def generate_expected_contents() -> dict[str, str]:
     """Generate expected content for all combinations of version, arch, cloud."""
@@ -3,13 +3,43 @@
 
 """Tests for the Flask application serving Ubuntu MOTD content."""
 
-from motd_server.motd import HEALTH_CONTENT, HEALTH_PATH
+import gzip
+import http.client
+import importlib.util
+import io
+import json
+import os
+import pathlib
+import re
+import tarfile
+import threading
+
+import pytest
+from werkzeug.http import http_date
+from werkzeug.serving import make_server
+from werkzeug.test import Client
+
+import app as app_module
+from app import CONTENT_VERSION_HEADER
+from motd_server.access_log import AccessLog
+from motd_server.bundle import load_bundle
+from motd_server.export import BODIES_DIRECTORY, LOCATIONS_FILENAME, MAPS_FILENAME, export_content
+from motd_server.manifest import DELTA_PATH, DELTA_PREFIX, MANIFEST_PATH
+from motd_server.motd import HEALTH_CONTENT, HEALTH_PATH, build_content, process_config
+from motd_server.profiling import PROFILE_PATH, Profiler
+from motd_server.ratelimit import RateLimit, TokenBucketLimiter
+from motd_server.reload import ContentReloader
+from motd_server.rotation import VARIANT_HEADER
+from motd_server.sendfile import SENDFILE_MIN_SIZE
+from motd_server.wsgi import FastPath
 
 MOTD_CONFIG = "../tests/integration/charm-files.yaml"
+EXPORT_MAPS_PATH = pathlib.Path(__file__).parent / "export-maps.conf"
 DEFAULT_MOTD = """index
 This is a great MOTD
 With a lot of interesting content
 """
+LARGE_MOTD = "This is a great MOTD. " * 50
 
 
 def test_health(client):
@@ -73,6 +103,265 @@ def test_motd(client, expected_motd_contents):
         assert response.content_type == "text/plain; charset=utf-8"
 
 
+def test_etag(client):
+    """
+    arrange: given a motd server with a valid config
+    act: when we call a file again with the ETag of the first response
+    assert: then we get a 304 with no content
+    """
+    response = client.get("/aptnews.json")
+    assert response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+
+    response = client.get("/aptnews.json", headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_etag_changed(client):
+    """
+    arrange: given a motd server with a valid config
+    act: when we call the root of the website with an outdated ETag
+    assert: then we get a 200 OK with the index.txt content
+    """
+    response = client.get("/", headers={"If-None-Match": '"outdated"'})
+    assert response.status_code == 200
+    assert response.data.decode() == DEFAULT_MOTD
+
+
+def test_if_modified_since(client):
+    """
+    arrange: given a motd server with a valid config
+    act: when we call the root of the website with the Last-Modified of the first response
+    assert: then we get a 304 with no content
+    """
+    response = client.get("/")
+
+    response = client.get("/", headers={"If-Modified-Since": response.headers["Last-Modified"]})
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_compressed(test_app, client):
+    """
+    arrange: given a motd server with a large index.txt
+    act: when we call the root of the website accepting gzip
+    assert: then we get the gzip variant of the index.txt content
+    """
+    test_app.config["FILES"] = f"index.txt: '{LARGE_MOTD}'"
+    process_config(test_app.config)
+
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.vary
+    assert gzip.decompress(response.data).decode() == LARGE_MOTD
+
+
+def test_compressed_preference(test_app, client):
+    """
+    arrange: given a motd server with a large index.txt
+    act: when we call the root of the website accepting several encodings
+    assert: then we get the variant the client prefers, with its own ETag
+    """
+    test_app.config["FILES"] = f"index.txt: '{LARGE_MOTD}'"
+    process_config(test_app.config)
+
+    identity = client.get("/")
+    response = client.get("/", headers={"Accept-Encoding": "gzip;q=0.5, br, zstd;q=0"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.headers["ETag"] != identity.headers["ETag"]
+
+    response = client.get(
+        "/",
+        headers={"Accept-Encoding": "br", "If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 304
+
+
+def test_uncompressed_small_file(client):
+    """
+    arrange: given a motd server with a valid config
+    act: when we call the health endpoint accepting gzip
+    assert: then we get the uncompressed content since compression does not pay off
+    """
+    response = client.get(f"/{HEALTH_PATH}", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert "Vary" not in response.headers
+    assert response.data.decode() == HEALTH_CONTENT
+
+
+def test_cache_control(monkeypatch, test_app, client):
+    """
+    arrange: given a motd server with Cache-Control rules for MOTDs
+    act: when we call the root of the website and a non-motd file
+    assert: then the MOTD is cacheable per user agent and the other file is not cacheable
+    """
+    monkeypatch.setitem(
+        test_app.config, "CACHE_CONTROL", '"index*.txt": {max-age: 3600, stale-if-error: 60}'
+    )
+    process_config(test_app.config)
+
+    response = client.get("/")
+    assert response.headers["Cache-Control"] == "public, max-age=3600, stale-if-error=60"
+    assert "User-Agent" in response.vary
+
+    response = client.get("/aptnews.json")
+    assert "Cache-Control" not in response.headers
+
+
+def test_content_version(test_app, client):
+    """
+    arrange: given a motd server with a valid config
+    act: when the content is reloaded with different files
+    assert: then the responses report the new content version
+    """
+    version = client.get("/").headers["X-Content-Version"]
+    assert version == test_app.config["MOTD_CONTENT"].version
+
+    test_app.config["FILES"] = "index.txt: reloaded"
+    process_config(test_app.config)
+
+    response = client.get("/")
+    assert response.data.decode() == "reloaded"
+    assert response.headers["X-Content-Version"] != version
+
+
+def test_files_bundle(monkeypatch, tmp_path, test_app, client):
+    """
+    arrange: given a motd server loading its files from a bundle
+    act: when we call the root of the website
+    assert: then we get the index.txt content from the bundle
+    """
+    bundle_path = tmp_path / "files.tar"
+    with tarfile.open(bundle_path, "w") as tar:
+        member = tarfile.TarInfo("index.txt")
+        member.size = len(DEFAULT_MOTD)
+        tar.addfile(member, io.BytesIO(DEFAULT_MOTD.encode("utf-8")))
+    monkeypatch.setitem(test_app.config, "FILES_BUNDLE", str(bundle_path))
+    process_config(test_app.config)
+
+    response = client.get("/", headers={"User-Agent": ""})
+    assert response.status_code == 200
+    assert response.data.decode() == DEFAULT_MOTD
+
+
+def test_metrics(client):
+    """
+    arrange: given a motd server that served a MOTD and a missing file
+    act: when we call the metrics endpoint
+    assert: then we get the request, latency, size and selection metrics
+    """
+    client.get("/", headers={"User-Agent": "curl/7.68.0 Ubuntu/24.04"})
+    client.get("/does_not_exist")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=")
+    metrics = response.data.decode()
+    assert 'motd_requests_total{route="index",status="200"}' in metrics
+    assert 'motd_requests_total{route="serve_file",status="404"}' in metrics
+    assert 'motd_request_duration_seconds_count{route="index"}' in metrics
+    assert 'motd_response_size_bytes_sum{route="index"}' in metrics
+    assert 'motd_selections_total{level="version"}' in metrics
+
+
+ROTATING_MOTD = f"""
+index.txt: [A, B, C]
+index-24.04.txt: [{{name: x, weight: 2, content: '{LARGE_MOTD}'}}, Y]
+aptnews.json: ['{{}}', '[]']
+"""
+
+
+TEMPLATE_MOTD = f"""
+index.txt: Ubuntu {{version}} on {{arch}} in {{cloud}}
+index-24.04.txt: ['{LARGE_MOTD} {{cloud}}', '{{version}} {{arch}}']
+aptnews.json: '{{"version": "{{version}}"}}'
+"""
+
+
+@pytest.mark.parametrize("files", ["", "large", "rotating", "template"])
+def test_fast_path(monkeypatch, test_app, client, expected_motd_contents, files):
+    """
+    arrange: given a motd server and a fast path over it, with small, compressible,
+        rotating or template files
+    act: when we send the same requests to both
+    assert: then they send the same responses
+    """
+    pin = {}
+    if files == "large":
+        files = "".join(f"index{key}.txt: '{LARGE_MOTD}'\n" for key in ("", "-24.04", "-aws"))
+        monkeypatch.setitem(test_app.config, "FILES", files)
+        monkeypatch.setitem(test_app.config, "CACHE_CONTROL", '"*.txt": {max-age: 60}')
+        process_config(test_app.config)
+    elif files == "rotating":
+        # Unpinned variants are picked at random, so both paths must get pinned requests
+        pin = {"X-Machine-Id": "machine"}
+        monkeypatch.setitem(test_app.config, "FILES", ROTATING_MOTD)
+        monkeypatch.setitem(test_app.config, "VARIANT_PIN_HEADER", "X-Machine-Id")
+        process_config(test_app.config)
+    elif files == "template":
+        pin = {"X-Machine-Id": "machine"}
+        monkeypatch.setitem(test_app.config, "FILES", TEMPLATE_MOTD)
+        monkeypatch.setitem(test_app.config, "VARIANT_PIN_HEADER", "X-Machine-Id")
+        process_config(test_app.config)
+    fast_path = FastPath(
+        test_app.wsgi_app, test_app.config, ContentReloader(test_app.config), ["/metrics"]
+    )
+    fast_client = Client(fast_path)
+    etag = client.get("/", headers=pin).headers["ETag"]
+    requests = [
+        ("GET", "/", {"User-Agent": user_agent, "Accept-Encoding": encoding})
+        for user_agent in expected_motd_contents
+        for encoding in ("", "gzip", "br;q=0.5, zstd", "*")
+    ]
+    requests += [
+        ("GET", "/", {"If-None-Match": etag}),
+        ("GET", "/", {"If-None-Match": '"outdated"'}),
+        ("GET", "/", {"If-Modified-Since": "Sat, 01 Jan 2000 00:00:00 GMT"}),
+        ("GET", "/", {"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}),
+        ("HEAD", "/", {}),
+        ("GET", "/aptnews.json", {}),
+        ("GET", f"/{HEALTH_PATH}", {"Accept-Encoding": "gzip"}),
+        ("GET", "/index.txt", {"Range": "bytes=0-1"}),
+        ("GET", "/does_not_exist", {}),
+        ("POST", "/", {}),
+    ]
+
+    for method, path, headers in requests:
+        headers.update(pin)
+        expected = client.open(path, method=method, headers=headers)
+        response = fast_client.open(path, method=method, headers=headers)
+        assert response.status == expected.status, (method, path, headers)
+        assert response.data == expected.data, (method, path, headers)
+        response.headers.remove("Date")
+        expected.headers.remove("Date")
+        assert sorted(response.headers) == sorted(expected.headers), (method, path, headers)
+
+
+def test_variant(monkeypatch, test_app, client):
+    """
+    arrange: given a motd server with a rotating index.txt pinned by a request header
+    act: when we call the root of the website from two machines
+    assert: then every machine always gets the same variant, reported in a header
+    """
+    monkeypatch.setitem(test_app.config, "FILES", "index.txt: [A, B, C, D]")
+    monkeypatch.setitem(test_app.config, "VARIANT_PIN_HEADER", "X-Machine-Id")
+    process_config(test_app.config)
+
+    for machine in ("machine-1", "machine-2"):
+        response = client.get("/", headers={"X-Machine-Id": machine})
+        variant = response.headers["X-MOTD-Variant"]
+        assert response.data.decode() == "ABCD"[int(variant)]
+        assert "X-Machine-Id" in response.vary
+        for _ in range(10):
+            response = client.get("/", headers={"X-Machine-Id": machine})
+            assert response.headers["X-MOTD-Variant"] == variant
+
+    metrics = client.get("/metrics").data.decode()
+    assert f'motd_variant_selections_total{{file="index.txt",variant="{variant}"}}' in metrics
+
+
 def test_404(client):
     """
     arrange: given a motd server with a valid config
@@ -91,8 +380,562 @@ def test_no_index(test_app, client):
     act: when we call the root of the website
     assert: then we get a 404 with "Not found" content
     """
-    test_app.config["PROCESSED_FILES"] = ""
+    test_app.config["FILES"] = "aptnews.json: '{}'"
+    process_config(test_app.config)
     response = client.get("/", headers={"User-Agent": ""})
     assert response.data.decode() == "Not found"
     assert response.status_code == 404
     assert response.content_type == "text/plain; charset=utf-8"
+
+
+def test_template(monkeypatch, test_app, client):
+    """
+    arrange: given a motd server with a template index.txt
+    act: when we call the root of the website and ask for index.txt directly
+    assert: then the MOTD is filled with the client information, and the file is not
+    """
+    monkeypatch.setitem(test_app.config, "FILES", "index.txt: Ubuntu {version} on {cloud}")
+    process_config(test_app.config)
+
+    aws = client.get("/", headers={"User-Agent": "wget Ubuntu/24.04.1/LTS cloud_id/aws"})
+    gcp = client.get("/", headers={"User-Agent": "wget Ubuntu/22.04.5/LTS cloud_id/gcp"})
+
+    assert aws.data == b"Ubuntu 24.04 on aws"
+    assert gcp.data == b"Ubuntu 22.04 on gcp"
+    assert aws.headers["ETag"] != gcp.headers["ETag"]
+    assert "User-Agent" in aws.headers["Vary"]
+    assert client.get("/index.txt").data == b"Ubuntu {version} on {cloud}"
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_access_log(monkeypatch, test_app, client, fast):
+    """
+    arrange: given a motd server, with or without the fast path, logging every request
+    act: when we call the root of the website and a missing file
+    assert: then both requests are logged with the client information and the file served
+    """
+    stream = io.StringIO()
+    access_log = AccessLog(1, stream=stream)
+    monkeypatch.setattr(app_module, "access_log", access_log)
+    if fast:
+        fast_path = FastPath(
+            test_app.wsgi_app, test_app.config, ContentReloader(test_app.config), [], access_log
+        )
+        client = Client(fast_path)
+    user_agent = "wget/1.21.4-1ubuntu4.1 Ubuntu/24.04.1/LTS GNU/Linux/6.8.0/arm64 cloud_id/aws"
+
+    client.get("/", headers={"User-Agent": user_agent})
+    client.get("/does_not_exist")
+    access_log.stop()
+
+    index, missing = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert index["route"] == "index"
+    assert (index["version"], index["arch"], index["cloud"]) == ("24.04", "arm64", "aws")
+    assert index["key"] == "index-24.04-arm64-aws.txt"
+    assert index["status"] == 200
+    assert index["bytes"] > 0
+    assert missing["route"] == "serve_file"
+    assert missing["key"] == ""
+    assert missing["status"] == 404
+
+
+def test_rate_limit(test_app, client):
+    """
+    arrange: given a motd server allowing a burst of 2 requests per client
+    act: when a client sends a burst of requests
+    assert: then it gets 2 MOTDs, then 304 or 429 responses, and health checks still pass
+    """
+    client = Client(RateLimit(test_app.wsgi_app, TokenBucketLimiter(0.01, 2), [f"/{HEALTH_PATH}"]))
+
+    first = client.get("/")
+    assert client.get("/").status_code == 200
+    assert client.get("/", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    limited = client.get("/")
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) > 0
+    assert client.get(f"/{HEALTH_PATH}").status_code == 200
+
+
+@pytest.fixture(name="rate_limited_app")
+def rate_limited_app_fixture(monkeypatch):
+    """Fixture providing another instance of the application, limited to 1 request per client.
+
+    Returns:
+        Flask app.
+    """
+    monkeypatch.setenv("FLASK_FILES", "index.txt: index")
+    monkeypatch.setenv("FLASK_RATE_LIMIT", "0.01")
+    monkeypatch.setenv("FLASK_RATE_LIMIT_BURST", "1")
+    spec = importlib.util.spec_from_file_location("rate_limited_app", app_module.__file__)
+    assert spec and spec.loader
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.app
+
+
+def test_rate_limit_config(rate_limited_app):
+    """
+    arrange: given a motd server configured with a rate limit of 1 request per client
+    act: when a client sends requests to the MOTD, the other routes and the monitoring routes
+    assert: then only the first request and the monitoring requests are served
+    """
+    client = rate_limited_app.test_client()
+
+    assert client.get("/").status_code == 200
+    assert client.get("/").status_code == 429
+    for path in (MANIFEST_PATH, DELTA_PATH, PROFILE_PATH, f"{DELTA_PATH}XYZ", "index.txt"):
+        assert client.get(f"/{path}").status_code == 429
+    assert client.get("/metrics").status_code == 200
+    assert client.get(f"/{HEALTH_PATH}").status_code == 200
+
+
+NGINX_MAP_PATTERN = re.compile(r"^map (\S+) \$(\w+) \{$")
+NGINX_STRING = r'"((?:[^"\\]|\\.)*)"'
+NGINX_MAP_VALUE_PATTERN = re.compile(
+    rf"^    (?:default|{NGINX_STRING}) (?:{NGINX_STRING}|\$(\w+));$"
+)
+
+
+def parse_nginx_maps(text: str) -> dict[str, tuple[str, str, list[tuple[str, str]]]]:
+    """Parse the maps of an nginx configuration.
+
+    Args:
+        text: nginx configuration.
+
+    Returns:
+        Dictionary mapping of variables to their source, default and (key, value) pairs.
+    """
+    maps = {}
+    lines = iter(text.splitlines())
+    for line in lines:
+        match = NGINX_MAP_PATTERN.match(line)
+        if not match:
+            continue
+        source, variable = match.groups()
+        default, pairs = "", []
+        for value_line in lines:
+            if value_line == "}":
+                break
+            value_match = NGINX_MAP_VALUE_PATTERN.match(value_line)
+            assert value_match, value_line
+            key, value, capture = (
+                group.replace('\\"', '"') if group else group for group in value_match.groups()
+            )
+            value = f"${capture}" if capture else value
+            if key is None:
+                default = value
+            else:
+                pairs.append((key, value))
+        maps[variable] = (source.strip('"'), default, pairs)
+    return maps
+
+
+def evaluate_nginx_variable(maps: dict, variable: str, variables: dict[str, str]) -> str:
+    """Evaluate a variable the way nginx does, from its maps.
+
+    Args:
+        maps: Maps of the configuration, as parsed by parse_nginx_maps.
+        variable: Name of the variable.
+        variables: Values of the variables set by the request and the locations.
+
+    Returns:
+        Value of the variable.
+    """
+    if variable not in maps:
+        return variables.get(variable, "")
+    source, default, pairs = maps[variable]
+    value = re.sub(
+        r"\$(\w+)", lambda match: evaluate_nginx_variable(maps, match.group(1), variables), source
+    )
+    # Exact keys are compared ignoring case and first, then regular expressions in order
+    for key, result in pairs:
+        if not key.startswith("~") and key.lower() == value.lower():
+            return result
+    for key, result in pairs:
+        if key.startswith("~"):
+            match = re.search(key[1:].replace("(?<", "(?P<"), value)
+            if match:
+                return match.group(result[1:]) if result.startswith("$") else result
+    return default
+
+
+def serve_exported(output, method: str, path: str, headers: dict[str, str]) -> tuple | None:
+    """Answer a request from a model of nginx with the exported configuration.
+
+    The model only evaluates the maps and the headers of the export, so it stands in for
+    nginx where it isn't installed but doesn't check how nginx itself parses them.
+
+    Args:
+        output: Directory of the export.
+        method: Request method.
+        path: Request path.
+        headers: Request headers.
+
+    Returns:
+        Tuple of (body, headers), or None if the request is passed to the application.
+    """
+    maps = parse_nginx_maps((output / MAPS_FILENAME).read_text(encoding="utf-8"))
+    locations = (output / LOCATIONS_FILENAME).read_text(encoding="utf-8")
+    variables = {
+        f"http_{name.lower().replace('-', '_')}": value for name, value in headers.items()
+    }
+    variables.update(request_method=method, uri=path)
+    variables["motd_route"] = "index" if path == "/" else "file"
+    variables["motd_file"] = evaluate_nginx_variable(
+        maps, "motd_index_file" if path == "/" else "motd_path_file", variables
+    )
+    body_name = evaluate_nginx_variable(maps, "motd_body", variables)
+    if not body_name or evaluate_nginx_variable(maps, "motd_dynamic", variables):
+        return None
+
+    body_path = output / BODIES_DIRECTORY / body_name
+    types = dict(
+        (extension, mimetype)
+        for mimetype, extension in re.findall(r"^ {8}(\S+) (motd\d+);$", locations, re.MULTILINE)
+    )
+    mimetype = types[body_name.rsplit(".", 1)[1]]
+    charset_types = re.findall(r"charset_types (.*);", locations)[0].split()
+    response_headers = {
+        "Content-Type": f"{mimetype}; charset=utf-8" if mimetype in charset_types else mimetype,
+        "Last-Modified": http_date(int(os.stat(body_path).st_mtime)),
+        "ETag": f'"{evaluate_nginx_variable(maps, "motd_digest", variables)}"',
+        "Cache-Control": evaluate_nginx_variable(maps, "motd_cache_control", variables),
+        "Vary": evaluate_nginx_variable(maps, "motd_vary", variables),
+        CONTENT_VERSION_HEADER: re.findall(r"X-Content-Version (\w+);", locations)[0],
+    }
+    # nginx leaves out the headers whose value is empty
+    return body_path.read_bytes(), {
+        name: value for name, value in response_headers.items() if value
+    }
+
+
+def compare_exported(output, client, method: str, path: str, headers: dict[str, str]) -> bool:
+    """Check that the model of the export answers a request like the application.
+
+    Args:
+        output: Directory of the export.
+        client: Flask test client.
+        method: Request method.
+        path: Request path.
+        headers: Request headers.
+
+    Returns:
+        Whether the export answers the request rather than passing it to the application.
+    """
+    exported = serve_exported(output, method, path, headers)
+    expected = client.open(path, method=method, headers=headers)
+    if exported is None:
+        return False
+    body, exported_headers = exported
+    assert expected.status_code == 200, (method, path, headers)
+    assert body == expected.data or method == "HEAD", (method, path, headers)
+    for name, value in exported_headers.items():
+        assert expected.headers[name] == value, (method, path, headers, name)
+    assert set(exported_headers) >= {
+        name
+        for name in expected.headers.keys()
+        if name not in ("Date", "Content-Length", VARIANT_HEADER)
+    }, (method, path, headers)
+    return True
+
+
+def load_export_files(monkeypatch, test_app, files: str):
+    """Load the files of an export test into the application.
+
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        test_app: Flask application.
+        files: Kind of files, empty for the files of the client fixture.
+
+    Returns:
+        Content snapshot of the application.
+    """
+    if files == "large":
+        files = "".join(f"index{key}.txt: '{LARGE_MOTD}'\n" for key in ("", "-24.04", "-aws"))
+        monkeypatch.setitem(test_app.config, "CACHE_CONTROL", '"*.txt": {max-age: 60}')
+    if files:
+        files = {"rotating": ROTATING_MOTD, "template": TEMPLATE_MOTD}.get(files, files)
+        monkeypatch.setitem(test_app.config, "FILES", files)
+        process_config(test_app.config)
+    return test_app.config["MOTD_CONTENT"]
+
+
+def get_export_requests(content, user_agents) -> list[tuple[str, str, dict[str, str]]]:
+    """Get the requests sent to both an export and the application.
+
+    Args:
+        content: Content snapshot.
+        user_agents: User agents matching the MOTDs of the client fixture.
+
+    Returns:
+        List of (method, path, headers) of the requests.
+    """
+    user_agents = [
+        *user_agents,
+        "",
+        "Ubuntu/24.04 Ubuntu/22.04 GNU/Linux/6.8.0/s390x cloud_id/gcp",
+        "Ubuntu/26.04 GNU/Linux/6.8.0/AMD64 cloud_id/AWS",
+        "Ubuntu/24.04.1/LTS GNU/Linux/6.8.0/\xe4rm64 cloud_id/\xe9tendu",
+        "cloud_id/azure cloud_id/aws",
+    ]
+    requests = [("GET", "/", {"User-Agent": user_agent}) for user_agent in user_agents]
+    requests += [("GET", f"/{filename}", {}) for filename in content.entries]
+    requests += [
+        ("HEAD", "/", {}),
+        ("GET", "/", {"Accept-Encoding": "gzip"}),
+        ("GET", "/", {"If-None-Match": '"outdated"'}),
+        ("GET", "/does_not_exist", {}),
+        ("POST", "/", {}),
+    ]
+    return requests
+
+
+@pytest.mark.parametrize(
+    "files, static", [("", True), ("large", True), ("rotating", False), ("template", True)]
+)
+def test_export(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    monkeypatch, tmp_path, test_app, client, expected_motd_contents, files, static
+):
+    """
+    arrange: given a motd server and a static export of its files for nginx
+    act: when we send the same requests to both, through a model of nginx
+    assert: then the export answers the requests it doesn't pass to the application with
+        the same bodies and headers, and passes the rotating files and templates
+    """
+    content = load_export_files(monkeypatch, test_app, files)
+    export_content(content, str(tmp_path))
+    requests = get_export_requests(content, expected_motd_contents)
+
+    served = [
+        compare_exported(tmp_path, client, method, path, headers)
+        for method, path, headers in requests
+    ]
+    assert any(served) == static
+
+
+# Headers nginx and the application server set on their own
+SERVER_HEADERS = ("Date", "Server", "Connection", "Content-Length", "Transfer-Encoding")
+
+
+def compare_nginx(port: int, client, method: str, path: str, headers: dict[str, str]) -> None:
+    """Check that nginx, with the export, answers a request like the application.
+
+    Args:
+        port: Port nginx listens on.
+        client: Flask test client.
+        method: Request method.
+        path: Request path.
+        headers: Request headers.
+    """
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        connection.request(method, path, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+    finally:
+        connection.close()
+    expected = client.open(path, method=method, headers=headers)
+
+    assert response.status == expected.status_code, (method, path, headers)
+    assert body == expected.data, (method, path, headers)
+    for name, value in expected.headers.items():
+        if name not in SERVER_HEADERS:
+            assert response.getheader(name) == value, (method, path, headers, name)
+
+
+@pytest.mark.parametrize("files", ["", "large", "rotating", "template"])
+def test_export_nginx(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    monkeypatch, tmp_path, test_app, client, expected_motd_contents, nginx, files
+):
+    """
+    arrange: given a motd server, and nginx serving a static export of its files in front
+        of it
+    act: when we send the same requests to nginx and to the application
+    assert: then nginx answers every request with the same status, body and headers,
+        whether it serves it statically or passes it to the application
+    """
+    # Both must pick the same variant of the rotating files
+    monkeypatch.setitem(test_app.config, "VARIANT_PIN_HEADER", "X-Machine-Id")
+    content = load_export_files(monkeypatch, test_app, files)
+    server = make_server("127.0.0.1", 0, test_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        export_content(content, str(tmp_path), f"http://127.0.0.1:{server.server_port}")
+        port = nginx(tmp_path / MAPS_FILENAME, tmp_path / LOCATIONS_FILENAME)
+        for method, path, headers in get_export_requests(content, expected_motd_contents):
+            compare_nginx(port, client, method, path, {**headers, "X-Machine-Id": "machine"})
+    finally:
+        server.shutdown()
+
+
+def test_export_maps(tmp_path):
+    """
+    arrange: given files with MOTDs for a version and a cloud, and a cached JSON file
+    act: when we export them for nginx
+    assert: then the maps are the ones expected, in export-maps.conf next to this file
+    """
+    content = build_content(
+        {
+            "index.txt": "Welcome",
+            "index-24.04.txt": "Noble",
+            "index-aws.txt": "AWS",
+            "aptnews.json": "{}",
+        },
+        '"*.json": {max-age: 60}',
+    )
+
+    export_content(content, str(tmp_path))
+
+    maps = (tmp_path / MAPS_FILENAME).read_text(encoding="utf-8")
+    assert maps == EXPORT_MAPS_PATH.read_text(encoding="utf-8")
+
+
+def test_sendfile(monkeypatch, tmp_path, test_app, client):
+    """
+    arrange: given a motd server with a content store holding a large file
+    act: when we request the file, ranges of it, and the same through the fast path
+    assert: then the file is sent from the store with ranges support, the fast path sends the
+        same response, and the file is sent from memory once the store is removed
+    """
+    large = "".join(f"{index:08d}," for index in range(SENDFILE_MIN_SIZE // 9 + 1))
+    monkeypatch.setitem(test_app.config, "FILES", f"large.txt: '{large}'")
+    monkeypatch.setitem(test_app.config, "CONTENT_STORE", str(tmp_path))
+    process_config(test_app.config)
+    fast_client = Client(
+        FastPath(test_app.wsgi_app, test_app.config, ContentReloader(test_app.config))
+    )
+
+    response = client.get("/large.txt")
+    fast_response = fast_client.get("/large.txt")
+    partial = client.get("/large.txt", headers={"Range": "bytes=9-17"})
+    suffix = client.get("/large.txt", headers={"Range": "bytes=-9"})
+    not_satisfiable = client.get("/large.txt", headers={"Range": "bytes=10000000-"})
+    head = client.head("/large.txt")
+    not_modified = client.get("/large.txt", headers={"If-None-Match": response.headers["ETag"]})
+    (store,) = tmp_path.iterdir()
+    store.unlink()
+    memory_partial = client.get("/large.txt", headers={"Range": "bytes=9-17"})
+
+    assert response.status_code == 200
+    assert response.data == large.encode()
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.headers["Content-Length"] == str(len(large))
+    assert fast_response.data == response.data
+    response.headers.remove("Date")
+    fast_response.headers.remove("Date")
+    assert sorted(fast_response.headers) == sorted(response.headers)
+    assert partial.status_code == 206
+    assert partial.data == b"00000001,"
+    assert partial.headers["Content-Range"] == f"bytes 9-17/{len(large)}"
+    assert suffix.data == large[-9:].encode()
+    assert not_satisfiable.status_code == 416
+    assert head.data == b""
+    assert head.headers["Content-Length"] == str(len(large))
+    assert not_modified.status_code == 304
+    assert memory_partial.status_code == 206
+    assert memory_partial.data == b"00000001,"
+
+
+def test_manifest(monkeypatch, test_app, client):
+    """
+    arrange: given a motd server with a valid config
+    act: when we get the manifest, then again with its ETag and after the files changed
+    assert: then every file is listed, the mirror copy is fresh until the files change
+    """
+    filenames = set(test_app.config["PROCESSED_FILES"])
+    response = client.get(f"/{MANIFEST_PATH}")
+    not_modified = client.get(
+        f"/{MANIFEST_PATH}", headers={"If-None-Match": response.headers["ETag"]}
+    )
+    monkeypatch.setitem(test_app.config, "FILES", "index.txt: Welcome")
+    process_config(test_app.config)
+    changed = client.get(f"/{MANIFEST_PATH}", headers={"If-None-Match": response.headers["ETag"]})
+
+    manifest = response.get_json()
+    assert response.content_type == "application/json"
+    assert set(manifest["files"]) == filenames
+    assert manifest["files"]["index.txt"]["size"] == len(DEFAULT_MOTD)
+    assert response.headers["ETag"] == f'"{manifest["version"]}"'
+    assert not_modified.status_code == 304
+    assert changed.status_code == 200
+    assert set(changed.get_json()["files"]) == {HEALTH_PATH, "index.txt"}
+
+
+def test_delta(monkeypatch, tmp_path, test_app, client):
+    """
+    arrange: given a motd server whose files changed since a mirror got their manifest
+    act: when the mirror gets the delta since its manifest, from an unknown manifest and
+        without a manifest
+    assert: then it gets the changed files and the removed ones in an archive it can load,
+        or all the files flagged as such
+    """
+    base = client.get(f"/{MANIFEST_PATH}").get_json()["version"]
+    files = "index.txt: Welcome\nindex-24.04.txt: [A, B]\n"
+    monkeypatch.setitem(test_app.config, "FILES", files)
+    process_config(test_app.config)
+
+    response = client.get(f"/{DELTA_PATH}", query_string={"since": base})
+    full = client.get(f"/{DELTA_PATH}", query_string={"since": "unknown"})
+    missing = client.get(f"/{DELTA_PATH}")
+
+    assert response.content_type == "application/x-tar"
+    assert response.headers["X-Manifest-Base"] == base
+    assert "X-Manifest-Full" not in response.headers
+    version = response.headers["X-Manifest-Version"]
+    assert version == test_app.config["FILES_MANIFEST"].version
+    bundle_path = tmp_path / "delta.tar"
+    bundle_path.write_bytes(response.data)
+    assert load_bundle(str(bundle_path)) == {
+        "index.txt": b"Welcome",
+        "index-24.04.txt": [{"content": b"A"}, {"content": b"B"}],
+    }
+    with tarfile.open(bundle_path) as tar:
+        removed = json.loads(tar.pax_headers[f"{DELTA_PREFIX}removed"])
+    assert len(removed) == 48
+    assert "X-Manifest-Base" not in full.headers
+    assert full.headers["X-Manifest-Full"] == missing.headers["X-Manifest-Full"] == "true"
+    assert missing.data == full.data
+    bundle_path.write_bytes(full.data)
+    assert set(load_bundle(str(bundle_path))) == {HEALTH_PATH, "index.txt", "index-24.04.txt"}
+
+
+@pytest.mark.parametrize(
+    "fast_path, cloud",
+    [
+        # User agents are parsed once, so each case needs its own
+        pytest.param(False, "aws", id="flask"),
+        pytest.param(True, "gcp", id="fast path"),
+    ],
+)
+def test_profile(test_app, client, fast_path, cloud):
+    """
+    arrange: given a motd server profiling every request, with or without the fast path
+    act: when a client gets its MOTD, then we get the profile
+    assert: then the profile has the stages of the MOTD request in the folded stacks format
+    """
+    wsgi_app = test_app.wsgi_app
+    stages = [
+        "app:index;motd_server.motd:extract_user_agent_info",
+        "app:index;motd_server.motd:resolve_route",
+        "app:serve_entry;motd_server.flask:entry_response",
+    ]
+    if fast_path:
+        wsgi_app = FastPath(wsgi_app, test_app.config, ContentReloader(test_app.config))
+        stages = [
+            "motd_server.wsgi:_match;motd_server.motd:extract_user_agent_info",
+            "motd_server.wsgi:_match;motd_server.motd:resolve_route",
+            "motd_server.wsgi:__call__;motd_server.wsgi:build_entry_response",
+        ]
+    prefixes = [os.path.dirname(app_module.__file__) + os.sep]
+    profiled = Client(Profiler(wsgi_app, 1.0, prefixes))
+
+    user_agent = f"wget/1.21.4 Ubuntu/24.04.1/LTS GNU/Linux/6.8.0/aarch64 cloud_id/{cloud}"
+    assert profiled.get("/", headers={"User-Agent": user_agent}).status_code == 200
+    response = client.get(f"/{PROFILE_PATH}")
+
+    stacks = dict(line.rsplit(" ", 1) for line in response.text.splitlines())
+    assert response.mimetype == "text/plain"
+    assert all(stack.startswith("request") for stack in stacks)
+    assert all(int(microseconds) > 0 for microseconds in stacks.values())
+    for stage in stages:
+        assert any(stack.endswith(f";{stage}") for stack in stacks)
@@ -0,0 +1,35 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Fixtures for the unit tests."""
+
+import io
+import pathlib
+import tarfile
+import typing
+
+import pytest
+
+
+def _write_bundle(bundle_path: pathlib.Path, files: dict[str, str]) -> None:
+    """Write a bundle with the given files.
+
+    Args:
+        bundle_path: Path of the bundle.
+        files: Dictionary mapping of filenames to their content.
+    """
+    with tarfile.open(bundle_path, "w", format=tarfile.PAX_FORMAT) as tar:
+        directory = tarfile.TarInfo("directory")
+        directory.type = tarfile.DIRTYPE
+        tar.addfile(directory)
+        for filename, content in files.items():
+            data = content.encode("utf-8")
+            member = tarfile.TarInfo(filename)
+            member.size = len(data)
+            tar.addfile(member, io.BytesIO(data))
+
+
+@pytest.fixture(name="write_bundle")
+def write_bundle_fixture() -> typing.Callable[[pathlib.Path, dict[str, str]], None]:
+    """Fixture providing a function writing bundles."""
+    return _write_bundle
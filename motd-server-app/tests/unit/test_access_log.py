@@ -0,0 +1,102 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/access_log.py."""
+
+import io
+import json
+
+import pytest
+
+from motd_server import access_log
+from motd_server.access_log import AccessLog, create_access_log
+from motd_server.metrics import ACCESS_LOG_DROPS
+
+USER_AGENT = "wget/1.21.4-1ubuntu4.1 Ubuntu/24.04.1/LTS GNU/Linux/6.8.0/amd64 cloud_id/aws"
+
+
+def test_log():
+    """
+    arrange: an access log sampling every request
+    act: when we log a request and stop the access log
+    assert: a JSON line with the parsed client and the response is written
+    """
+    stream = io.StringIO()
+    log = AccessLog(1, stream=stream)
+
+    log.log(USER_AGENT, 0.0012345, route="index", path="/", key="index-24.04.txt", status=200)
+    log.stop()
+    log.stop()
+
+    record = json.loads(stream.getvalue())
+    assert record.pop("time").endswith("+00:00")
+    assert record == {
+        "route": "index",
+        "path": "/",
+        "version": "24.04",
+        "arch": "amd64",
+        "cloud": "aws",
+        "key": "index-24.04.txt",
+        "status": 200,
+        "latency_ms": 1.234,
+    }
+
+
+def test_log_sampling(monkeypatch):
+    """
+    arrange: an access log sampling a quarter of the requests
+    act: when we log requests drawing random numbers around the rate
+    assert: only the requests drawing less than the rate are written
+    """
+    stream = io.StringIO()
+    log = AccessLog(0.25, stream=stream)
+
+    for draw in (0.1, 0.25, 0.9, 0.2):
+        monkeypatch.setattr(access_log.random, "random", lambda draw=draw: draw)
+        log.log("", 0.001, route="serve_file")
+    log.stop()
+
+    assert len(stream.getvalue().splitlines()) == 2
+
+
+def test_log_queue_full():
+    """
+    arrange: an access log whose queue holds a single record and is not written anymore
+    act: when we log two requests
+    assert: the second record is dropped and counted instead of blocking
+    """
+    log = AccessLog(1, queue_size=1, stream=io.StringIO())
+    log.stop()
+    drops = ACCESS_LOG_DROPS._value.get()  # pylint: disable=protected-access
+
+    log.log("", 0.001, route="index")
+    log.log("", 0.001, route="index")
+
+    assert ACCESS_LOG_DROPS._value.get() == drops + 1  # pylint: disable=protected-access
+
+
+@pytest.mark.parametrize(
+    "config,sample_rate",
+    [
+        ({}, None),
+        ({"ACCESS_LOG_SAMPLE_RATE": 0}, None),
+        ({"ACCESS_LOG_SAMPLE_RATE": "often"}, None),
+        ({"ACCESS_LOG_SAMPLE_RATE": 0.1, "ACCESS_LOG_QUEUE_SIZE": None}, None),
+        ({"ACCESS_LOG_SAMPLE_RATE": 0.1}, 0.1),
+        ({"ACCESS_LOG_SAMPLE_RATE": 3}, 1),
+    ],
+)
+def test_create_access_log(config, sample_rate):
+    """
+    arrange: access log configurations
+    act: when we create the access log
+    assert: it is only enabled with a valid positive sample rate, capped to 1
+    """
+    log = create_access_log(config)
+
+    if sample_rate is None:
+        assert log is None
+    else:
+        assert log is not None
+        assert log.sample_rate == sample_rate
+        log.stop()
@@ -0,0 +1,148 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/bundle.py."""
+
+import datetime
+import io
+import tarfile
+
+import pytest
+
+from motd_server.bundle import get_bundle_members, load_bundle, read_bundle
+from motd_server.content import ContentLoadError
+
+
+def test_load_bundle(tmp_path, write_bundle):
+    """
+    arrange: a bundle with MOTD and nested files
+    act: when we load the bundle
+    assert: every regular file is mapped to a read-only view of its content
+    """
+    bundle_path = tmp_path / "files.tar"
+    write_bundle(bundle_path, {"index.txt": "Welcome to Ubuntü", "directory/a.json": "{}"})
+
+    files = load_bundle(str(bundle_path))
+
+    assert set(files) == {"index.txt", "directory/a.json"}
+    assert isinstance(files["index.txt"], memoryview)
+    assert files["index.txt"].readonly
+    assert bytes(files["index.txt"]).decode("utf-8") == "Welcome to Ubuntü"
+    assert files["directory/a.json"] == b"{}"
+
+
+def test_load_empty_bundle(tmp_path, write_bundle):
+    """
+    arrange: a bundle without files
+    act: when we load the bundle
+    assert: we get no files
+    """
+    bundle_path = tmp_path / "files.tar"
+    write_bundle(bundle_path, {})
+
+    assert load_bundle(str(bundle_path)) == {}
+
+
+def test_load_invalid_bundle(tmp_path):
+    """
+    arrange: a missing bundle and a bundle that is not a tar archive
+    act: when we load the bundles
+    assert: we get no files
+    """
+    bundle_path = tmp_path / "files.tar"
+    bundle_path.write_bytes(b"not a tar archive")
+
+    assert load_bundle(str(bundle_path)) == {}
+    assert load_bundle(str(tmp_path / "missing.tar")) == {}
+
+
+def test_read_truncated_bundle(tmp_path, write_bundle):
+    """
+    arrange: bundles cut in the middle of a header, of a body and before their end
+    act: when we read and load the bundles
+    assert: reading them fails and loading them gives no files
+    """
+    bundle_path = tmp_path / "files.tar"
+    write_bundle(bundle_path, {"index.txt": "index" * 100})
+    data = bundle_path.read_bytes()
+
+    for size in (700, 1100, 2048):
+        bundle_path.write_bytes(data[:size])
+
+        with pytest.raises(ContentLoadError):
+            read_bundle(str(bundle_path))
+        assert load_bundle(str(bundle_path)) == {}
+
+
+def test_load_bundle_variants(tmp_path):
+    """
+    arrange: a bundle with a plain file and a file with two variants in PAX headers
+    act: when we load the bundle
+    assert: the variants are grouped in order with their settings
+    """
+    bundle_path = tmp_path / "files.tar"
+    with tarfile.open(bundle_path, "w", format=tarfile.PAX_FORMAT) as tar:
+        for name, data, headers in [
+            ("index.txt", b"plain", {}),
+            ("index-24.04.txt", b"A", {"MOTD.variant": "0", "MOTD.weight": "3"}),
+            ("index-24.04.txt", b"B", {"MOTD.variant": "1", "other": "ignored"}),
+        ]:
+            member = tarfile.TarInfo(name)
+            member.size = len(data)
+            member.pax_headers = headers
+            tar.addfile(member, io.BytesIO(data))
+
+    files = load_bundle(str(bundle_path))
+
+    assert files["index.txt"] == b"plain"
+    variants = files["index-24.04.txt"]
+    assert isinstance(variants, list)
+    assert [bytes(variant.pop("content")) for variant in variants] == [b"A", b"B"]
+    assert variants == [{"weight": "3"}, {}]
+
+
+def test_load_bundle_schedule(tmp_path):
+    """
+    arrange: a bundle with a scheduled file and a scheduled file with two variants
+    act: when we load the bundle
+    assert: the files are defined by mappings with their schedule and content
+    """
+    bundle_path = tmp_path / "files.tar"
+    with tarfile.open(bundle_path, "w", format=tarfile.PAX_FORMAT) as tar:
+        for name, data, headers in [
+            ("index.txt", b"plain", {"MOTD.start": "2025-04-01"}),
+            ("index-24.04.txt", b"A", {"MOTD.variant": "0", "MOTD.end": "2025-06-01"}),
+            ("index-24.04.txt", b"B", {"MOTD.variant": "1", "MOTD.end": "2025-06-01"}),
+        ]:
+            member = tarfile.TarInfo(name)
+            member.size = len(data)
+            member.pax_headers = headers
+            tar.addfile(member, io.BytesIO(data))
+
+    files = load_bundle(str(bundle_path))
+
+    assert files["index.txt"] == {"start": "2025-04-01", "content": b"plain"}
+    definition = files["index-24.04.txt"]
+    assert isinstance(definition, dict)
+    assert definition["end"] == "2025-06-01"
+    assert [bytes(variant["content"]) for variant in definition["content"]] == [b"A", b"B"]
+
+
+def test_get_bundle_members():
+    """
+    arrange: a plain file, a rotating file and a scheduled file, as loaded from YAML
+    act: when we get the members they are bundled as
+    assert: the variants and settings are held by the metadata of the members
+    """
+    start = datetime.datetime(2025, 4, 1, tzinfo=datetime.timezone.utc)
+
+    plain = get_bundle_members("Welcome to Ubuntü")
+    rotating = get_bundle_members(["A", {"name": "b", "weight": 2, "content": "B"}])
+    scheduled = get_bundle_members({"start": start, "content": ["A"]})
+
+    assert plain == [({}, "Welcome to Ubuntü".encode("utf-8"))]
+    assert rotating == [
+        ({"variant": "0"}, b"A"),
+        ({"name": "b", "weight": "2", "variant": "1"}, b"B"),
+    ]
+    assert scheduled == [({"start": "2025-04-01T00:00:00+00:00", "variant": "0"}, b"A")]
@@ -0,0 +1,105 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/caching.py."""
+
+import pytest
+
+from motd_server.caching import (
+    apply_cache_rules,
+    build_cache_control_header,
+    get_cache_rules_from_yaml,
+)
+from motd_server.content import build_entries
+
+
+def test_get_cache_rules_from_yaml():
+    """
+    arrange: a YAML string with rules for MOTDs and JSON files
+    act: when we load the rules
+    assert: we get the Cache-Control header of each glob in order
+    """
+    yaml_content = """
+"index*.txt":
+  max-age: 3600
+  stale-while-revalidate: 600
+  stale-if-error: 86400
+"*.json":
+  max-age: 300
+"""
+    assert get_cache_rules_from_yaml(yaml_content) == [
+        ("index*.txt", "public, max-age=3600, stale-while-revalidate=600, stale-if-error=86400"),
+        ("*.json", "public, max-age=300"),
+    ]
+
+
+def test_get_cache_rules_from_dict():
+    """
+    arrange: rules that were already parsed from JSON
+    act: when we load the rules
+    assert: we get the Cache-Control header of each glob
+    """
+    assert get_cache_rules_from_yaml({"*": {"max-age": 60}}) == [("*", "public, max-age=60")]
+
+
+@pytest.mark.parametrize("rules", ["", "::: invalid yaml :-::", "not a dict"])
+def test_get_cache_rules_from_invalid_yaml(rules):
+    """
+    arrange: empty, invalid or non-dict YAML content
+    act: when we load the rules
+    assert: we get no rules
+    """
+    assert not get_cache_rules_from_yaml(rules)
+
+
+def test_get_cache_rules_ignores_invalid_rules():
+    """
+    arrange: a YAML string with a valid and an invalid rule
+    act: when we load the rules
+    assert: only the valid rule is kept
+    """
+    yaml_content = """
+"*.json": {max-age: -1}
+"*": {max-age: 60}
+"""
+    assert get_cache_rules_from_yaml(yaml_content) == [("*", "public, max-age=60")]
+
+
+@pytest.mark.parametrize(
+    "directives",
+    [None, {}, {"no-store": 1}, {"max-age": "60"}, {"max-age": True}, {"max-age": -1}],
+)
+def test_build_cache_control_header_invalid(directives):
+    """
+    arrange: invalid Cache-Control directives
+    act: when we build the header
+    assert: we get an empty string
+    """
+    assert build_cache_control_header(directives) == ""
+
+
+def test_apply_cache_rules():
+    """
+    arrange: entries for MOTDs and a JSON file, and rules for MOTDs only
+    act: when we apply the rules
+    assert: the first matching rule is attached to each entry
+    """
+    entries = build_entries({"index.txt": "index", "index-24.04.txt": "24.04", "a.json": "{}"})
+    rules = [("index-*.txt", "public, max-age=60"), ("index*.txt", "public, max-age=3600")]
+
+    cached_entries = apply_cache_rules(entries, rules)
+
+    assert cached_entries["index-24.04.txt"].cache_control == "public, max-age=60"
+    assert cached_entries["index.txt"].cache_control == "public, max-age=3600"
+    assert cached_entries["a.json"].cache_control == ""
+
+
+def test_apply_no_cache_rules():
+    """
+    arrange: a set of entries and no rules
+    act: when we apply the rules
+    assert: the entries are left untouched
+    """
+    entries = build_entries({"index.txt": "index"})
+
+    assert apply_cache_rules(entries, []) is entries
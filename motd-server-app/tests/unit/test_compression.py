@@ -0,0 +1,67 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/compression.py."""
+
+import gzip
+
+import brotli
+import zstandard
+
+from motd_server import compression
+from motd_server.compression import compress_entries
+from motd_server.content import BodyStore, build_entries
+
+
+def test_compress_entries():
+    """
+    arrange: an entry with a large, repetitive body
+    act: when we compress the entries
+    assert: every encoding has a variant that decompresses to the original body
+    """
+    content = "This is a great MOTD\n" * 100
+    entries = compress_entries(build_entries({"index.txt": content}))
+
+    variants = entries["index.txt"].variants
+    assert gzip.decompress(variants["gzip"]).decode() == content
+    assert brotli.decompress(variants["br"]).decode() == content
+    assert zstandard.ZstdDecompressor().decompress(variants["zstd"]).decode() == content
+
+
+def test_compress_entries_drops_larger_variants():
+    """
+    arrange: an entry with a tiny body
+    act: when we compress the entries
+    assert: no variant is kept since none is smaller than the original body
+    """
+    entries = compress_entries(build_entries({"_health": "OK"}))
+
+    assert entries["_health"].variants == {}
+
+
+def test_compress_entries_dedup(monkeypatch):
+    """
+    arrange: large files with identical bodies and a body store
+    act: when we compress their entries
+    assert: the body is compressed once and the files share its variants
+    """
+    bodies = BodyStore()
+    body = "This is a great MOTD. " * 50
+    entries = build_entries({"index-aws.txt": body, "index-gce.txt": body}, bodies=bodies)
+    calls = []
+    compress_entry = compression.compress_entry
+
+    def count_compress_entry(entry):
+        """Compress an entry and record the call."""
+        calls.append(entry)
+        return compress_entry(entry)
+
+    monkeypatch.setattr(compression, "compress_entry", count_compress_entry)
+
+    compressed = compress_entries(entries, bodies)
+
+    assert len(calls) == 1
+    assert compressed["index-aws.txt"].variants is compressed["index-gce.txt"].variants
+    assert bodies.saved_size == len(body) + sum(
+        len(data) for data in compressed["index-aws.txt"].variants.values()
+    )
@@ -0,0 +1,74 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/content.py."""
+
+import datetime
+import hashlib
+
+from motd_server.content import BodyStore, build_entries
+
+
+def test_build_entries():
+    """
+    arrange: a set of text and JSON files
+    act: when we build the entries
+    assert: every file is encoded with its ETag, load time and MIME type
+    """
+    loaded_at = datetime.datetime(2025, 1, 1, 12, 0, 0, 123456, tzinfo=datetime.timezone.utc)
+
+    entries = build_entries(
+        {"index.txt": "Welcome to Ubuntü", "aptnews.json": "{}"}, last_modified=loaded_at
+    )
+
+    assert entries["index.txt"].body == "Welcome to Ubuntü".encode("utf-8")
+    assert entries["index.txt"].etag == hashlib.sha256(entries["index.txt"].body).hexdigest()
+    assert entries["index.txt"].last_modified == loaded_at.replace(microsecond=0)
+    assert entries["index.txt"].mimetype == "text/plain"
+    assert entries["aptnews.json"].mimetype == "application/json"
+
+
+def test_build_entries_defaults_to_now():
+    """
+    arrange: a file with non-string content
+    act: when we build the entries without a load time
+    assert: the content is encoded as text and last modified is the current time
+    """
+    before = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+
+    entries = build_entries({"index-24.04.txt": 42})
+
+    assert entries["index-24.04.txt"].body == b"42"
+    assert entries["index-24.04.txt"].last_modified >= before
+
+
+def test_build_entries_dedup():
+    """
+    arrange: files with identical bodies and a body store
+    act: when we build the entries
+    assert: the identical files share a single body whose digest is their ETag
+    """
+    bodies = BodyStore()
+    body = "Welcome to Ubuntu 24.04"
+
+    entries = build_entries(
+        {"index-24.04-aws.txt": body, "index-24.04-gce.txt": body, "index.txt": "Welcome"},
+        bodies=bodies,
+    )
+
+    aws, gce = entries["index-24.04-aws.txt"], entries["index-24.04-gce.txt"]
+    assert aws.body is gce.body
+    assert aws.etag == gce.etag == hashlib.sha256(body.encode("utf-8")).hexdigest()
+    assert set(bodies.bodies) == {aws.etag, entries["index.txt"].etag}
+    assert bodies.dedup_ratio == 1.5
+    assert bodies.saved_size == len(body)
+    assert bodies.size == len(body) + len("Welcome")
+
+
+def test_body_store_empty():
+    """
+    arrange: an empty body store
+    act: when we get its dedup ratio
+    assert: nothing is shared
+    """
+    assert BodyStore().dedup_ratio == 1.0
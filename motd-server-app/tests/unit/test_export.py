@@ -0,0 +1,281 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/export.py."""
+
+import os
+
+import pytest
+
+from motd_server import export
+from motd_server.export import (
+    BODIES_DIRECTORY,
+    LOCATIONS_FILENAME,
+    MAPS_FILENAME,
+    UNKNOWN,
+    ExportError,
+    build_index_routes,
+    export_content,
+    get_static_entries,
+    main,
+)
+from motd_server.motd import HEALTH_PATH, build_content
+
+FILES = {
+    "index.txt": "Welcome to Ubuntu",
+    "index-24.04.txt": "Welcome to Ubuntu 24.04",
+    "index-24.04-aws.txt": "Welcome to Ubuntu 24.04 on AWS",
+    "aptnews.json": "{}",
+    HEALTH_PATH: "OK",
+}
+
+
+def test_export_content(tmp_path):
+    """
+    arrange: given the content of MOTD files and a JSON file
+    act: when we export it
+    assert: the bodies are written once per digest, dated from the load time, and the maps
+        route every combination of the tokens to the static files
+    """
+    content = build_content({**FILES, "index-aws.txt": "Welcome to Ubuntu"}, "")
+
+    count = export_content(content, str(tmp_path))
+
+    assert count == 5
+    entry = content.entries["index.txt"]
+    bodies = sorted(os.listdir(tmp_path / BODIES_DIRECTORY))
+    assert len(bodies) == 4
+    body_path = tmp_path / BODIES_DIRECTORY / f"{entry.etag}.motd1"
+    assert body_path.read_bytes() == b"Welcome to Ubuntu"
+    assert os.stat(body_path).st_mtime == entry.last_modified.timestamp()
+    maps = (tmp_path / MAPS_FILENAME).read_text(encoding="utf-8")
+    assert '"24.04||aws" "index-24.04-aws.txt";' in maps
+    assert '"||aws" "index-aws.txt";' in maps
+    assert f'"index.txt" "{entry.etag}";' in maps
+    assert '"/aptnews.json" "aptnews.json";' in maps
+    assert HEALTH_PATH not in maps
+    locations = (tmp_path / LOCATIONS_FILENAME).read_text(encoding="utf-8")
+    assert "application/json motd0;" in locations
+    assert "charset_types text/plain;" in locations
+    assert f"X-Content-Version {content.version};" in locations
+
+
+def test_export_content_removes_stale_bodies(tmp_path):
+    """
+    arrange: given an export of some files
+    act: when we export other files to the same directory
+    assert: only the bodies of the other files are left
+    """
+    export_content(build_content(FILES, ""), str(tmp_path))
+    content = build_content({"index.txt": "Welcome"}, "")
+
+    export_content(content, str(tmp_path))
+
+    etag = content.entries["index.txt"].etag
+    assert os.listdir(tmp_path / BODIES_DIRECTORY) == [f"{etag}.motd0"]
+
+
+def test_export_scheduled_content(tmp_path):
+    """
+    arrange: given the content of a scheduled file
+    act: when we export it
+    assert: the export is refused
+    """
+    files = {"index.txt": {"start": "2000-01-01T00:00:00Z", "content": "Welcome"}}
+
+    with pytest.raises(ExportError):
+        export_content(build_content(files, ""), str(tmp_path))
+
+
+def test_get_static_entries():
+    """
+    arrange: given rotating, template, unsafe and health files next to static files
+    act: when we get the static entries
+    assert: only the static files are exported
+    """
+    files = {
+        **FILES,
+        "index-22.04.txt": ["A", "B"],
+        "index-20.04.txt": "Ubuntu {version}",
+        "two words.txt": "Unsafe",
+    }
+
+    static_entries = get_static_entries(build_content(files, ""))
+
+    assert sorted(static_entries) == [
+        "aptnews.json",
+        "index-24.04-aws.txt",
+        "index-24.04.txt",
+        "index.txt",
+    ]
+
+
+def test_build_index_routes():
+    """
+    arrange: given the content of exact MOTD filenames
+    act: when we build the index routes
+    assert: unknown tokens are routed like missing ones, and every combination is routed
+    """
+    content = build_content(FILES, "")
+
+    versions, tokens, unknown, routes = build_index_routes(content, get_static_entries(content))
+
+    assert versions == ["24.04"]
+    assert tokens == ["aws"]
+    assert unknown == ""
+    assert len(routes) == 2 * 2 * 2
+    assert routes["24.04", "", "aws"] == "index-24.04-aws.txt"
+    assert routes["", "aws", ""] == "index.txt"
+
+
+def test_build_index_routes_patterns():
+    """
+    arrange: given the content of MOTD patterns and of a rotating index.txt
+    act: when we build the index routes
+    assert: tokens only matched by the patterns and rotating files are left to the application
+    """
+    files = {**FILES, "index.txt": ["A", "B"], "index-2?.10.txt": "Interim"}
+    content = build_content(files, "")
+
+    _, _, unknown, routes = build_index_routes(content, get_static_entries(content))
+
+    assert unknown == UNKNOWN
+    assert ("", "", "") not in routes
+    assert routes["24.04", "", ""] == "index-24.04.txt"
+
+
+def test_build_index_routes_case():
+    """
+    arrange: given the content of MOTD files with tokens differing only by case
+    act: when we build the index routes
+    assert: the export is refused, since nginx compares map keys ignoring case
+    """
+    content = build_content({**FILES, "index-AWS.txt": "Welcome to AWS"}, "")
+
+    with pytest.raises(ExportError):
+        build_index_routes(content, get_static_entries(content))
+
+
+def test_build_index_routes_too_many(monkeypatch):
+    """
+    arrange: given a limit of routes lower than the combinations of the tokens
+    act: when we build the index routes
+    assert: the export is refused
+    """
+    monkeypatch.setattr(export, "MAX_PRECOMPUTED_ROUTES", 4)
+    content = build_content(FILES, "")
+
+    with pytest.raises(ExportError):
+        build_index_routes(content, get_static_entries(content))
+
+
+def test_main(tmp_path, capsys):
+    """
+    arrange: given a YAML file of files
+    act: when we run the export
+    assert: the configuration and bodies are written
+    """
+    files_path = tmp_path / "files.yaml"
+    files_path.write_text("index.txt: Welcome\n", encoding="utf-8")
+    output = tmp_path / "export"
+
+    status = main(["--files", str(files_path), "--output", str(output)])
+
+    assert status == 0
+    assert "Exported 1 files" in capsys.readouterr().out
+    assert "proxy_pass http://127.0.0.1:8000;" in (output / LOCATIONS_FILENAME).read_text(
+        encoding="utf-8"
+    )
+
+
+def test_main_cache_control(tmp_path):
+    """
+    arrange: given a YAML file of files and a YAML file of Cache-Control rules
+    act: when we run the export
+    assert: the rules are applied to the files they match
+    """
+    files_path = tmp_path / "files.yaml"
+    files_path.write_text("index.txt: Welcome\naptnews.json: '{}'\n", encoding="utf-8")
+    cache_control_path = tmp_path / "cache-control.yaml"
+    cache_control_path.write_text('"*.json": {max-age: 60}\n', encoding="utf-8")
+    output = tmp_path / "export"
+
+    status = main(
+        [
+            "--files",
+            str(files_path),
+            "--cache-control",
+            str(cache_control_path),
+            "--output",
+            str(output),
+        ]
+    )
+
+    assert status == 0
+    maps = (output / MAPS_FILENAME).read_text(encoding="utf-8")
+    assert 'map $motd_file $motd_cache_control {\n    default "";\n' in maps
+    assert '    "aptnews.json" "public, max-age=60";\n}' in maps
+
+
+def test_main_cache_control_missing(tmp_path, capsys):
+    """
+    arrange: given a YAML file of files and a missing Cache-Control rules file
+    act: when we run the export
+    assert: it fails with an error message, without writing anything
+    """
+    files_path = tmp_path / "files.yaml"
+    files_path.write_text("index.txt: Welcome\n", encoding="utf-8")
+    output = tmp_path / "export"
+
+    status = main(
+        [
+            "--files",
+            str(files_path),
+            "--cache-control",
+            str(tmp_path / "missing.yaml"),
+            "--output",
+            str(output),
+        ]
+    )
+
+    assert status == 1
+    assert "Could not read the Cache-Control rules" in capsys.readouterr().err
+    assert not output.exists()
+
+
+@pytest.mark.parametrize("source", ["--files", "--bundle"])
+def test_main_missing_files(tmp_path, capsys, source):
+    """
+    arrange: given an existing export, and a mistyped path to the files
+    act: when we run the export again
+    assert: it fails with an error message, leaving the existing export as it is
+    """
+    files_path = tmp_path / "files.yaml"
+    files_path.write_text("index.txt: Welcome\n", encoding="utf-8")
+    output = tmp_path / "export"
+    assert main(["--files", str(files_path), "--output", str(output)]) == 0
+    exported = {path: path.read_bytes() for path in output.rglob("*") if path.is_file()}
+    capsys.readouterr()
+
+    status = main([source, str(tmp_path / "file.yaml"), "--output", str(output)])
+
+    assert status == 1
+    assert "Could not load the files" in capsys.readouterr().err
+    assert {path: path.read_bytes() for path in output.rglob("*") if path.is_file()} == exported
+
+
+def test_main_error(tmp_path, capsys):
+    """
+    arrange: given a YAML file of scheduled files
+    act: when we run the export
+    assert: it fails with an error message
+    """
+    files_path = tmp_path / "files.yaml"
+    files_path.write_text(
+        "index.txt: {start: 2000-01-01T00:00:00Z, content: Welcome}\n", encoding="utf-8"
+    )
+
+    status = main(["--files", str(files_path), "--output", str(tmp_path / "export")])
+
+    assert status == 1
+    assert "scheduled files" in capsys.readouterr().err
@@ -0,0 +1,120 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/manifest.py."""
+
+import json
+import tarfile
+
+from motd_server.bundle import load_bundle
+from motd_server.manifest import (
+    DELTA_PREFIX,
+    MANIFEST_HISTORY,
+    build_manifest,
+    get_delta,
+    record_manifest,
+    stream_delta,
+)
+
+FILES = {
+    "index.txt": "Welcome to Ubuntu",
+    "index-24.04.txt": ["A", {"name": "b", "weight": 2, "content": "B"}],
+    "aptnews.json": {"start": "2025-04-01T00:00:00+00:00", "content": "{}"},
+}
+
+
+def test_build_manifest():
+    """
+    arrange: a plain, a rotating and a scheduled file
+    act: when we build their manifest, and the manifest of the files with one changed
+    assert: every file is listed with its digest and size, and only the changed digest and
+        the version change
+    """
+    manifest = build_manifest(FILES)
+    changed = build_manifest({**FILES, "index.txt": "Welcome"})
+
+    assert json.loads(manifest.to_json()) == {
+        "version": manifest.version,
+        "files": {
+            filename: {"digest": manifest.digests[filename], "size": size}
+            for filename, size in (("aptnews.json", 2), ("index-24.04.txt", 2), ("index.txt", 17))
+        },
+    }
+    assert build_manifest(dict(reversed(FILES.items()))) == manifest
+    assert changed.version != manifest.version
+    assert changed.digests["index.txt"] != manifest.digests["index.txt"]
+    assert changed.digests["aptnews.json"] == manifest.digests["aptnews.json"]
+
+
+def test_record_manifest():
+    """
+    arrange: more manifests than the history keeps
+    act: when we record them, then the oldest kept again
+    assert: only the last ones are kept, the one recorded again being the last
+    """
+    manifests = [
+        build_manifest({"index.txt": str(index)}) for index in range(MANIFEST_HISTORY + 2)
+    ]
+    history: dict = {}
+
+    for manifest in manifests:
+        history = record_manifest(history, manifest)
+    history = record_manifest(history, manifests[2])
+
+    assert len(history) == MANIFEST_HISTORY
+    assert manifests[1].version not in history
+    assert list(history)[-1] == manifests[2].version
+
+
+def test_get_delta():
+    """
+    arrange: the manifests of files before and after some are changed, added and removed
+    act: when we get the delta between them, and from an unknown manifest
+    assert: the changed and added files are listed, then the removed ones, or all the files
+    """
+    base = build_manifest(FILES)
+    manifest = build_manifest(
+        {"index.txt": "Welcome", "index-24.04.txt": FILES["index-24.04.txt"], "new.txt": ""}
+    )
+
+    assert get_delta(manifest, base) == (["index.txt", "new.txt"], ["aptnews.json"])
+    assert get_delta(manifest, None) == (["index-24.04.txt", "index.txt", "new.txt"], [])
+
+
+def test_stream_delta(tmp_path):
+    """
+    arrange: the manifests of files before and after one is changed and one removed
+    act: when we stream the delta between them and load it as a bundle
+    assert: the bundle holds the changed file, and its global headers the versions and
+        the removed file
+    """
+    base = build_manifest(FILES)
+    files = {"index.txt": "Welcome", "index-24.04.txt": FILES["index-24.04.txt"]}
+    manifest = build_manifest(files)
+    bundle_path = tmp_path / "delta.tar"
+
+    bundle_path.write_bytes(b"".join(stream_delta(manifest, base)))
+
+    assert load_bundle(str(bundle_path)) == {"index.txt": b"Welcome"}
+    with tarfile.open(bundle_path) as tar:
+        assert tar.pax_headers == {
+            f"{DELTA_PREFIX}version": manifest.version,
+            f"{DELTA_PREFIX}base": base.version,
+            f"{DELTA_PREFIX}removed": '["aptnews.json"]',
+        }
+
+
+def test_stream_full_delta(tmp_path):
+    """
+    arrange: the manifest of files, and a mirror without a known manifest
+    act: when we stream the delta and load it as a bundle
+    assert: the bundle holds all the files, whose manifest is the same once loaded
+    """
+    manifest = build_manifest(FILES)
+    bundle_path = tmp_path / "delta.tar"
+
+    bundle_path.write_bytes(b"".join(stream_delta(manifest, None)))
+
+    assert build_manifest(load_bundle(str(bundle_path))) == manifest
+    with tarfile.open(bundle_path) as tar:
+        assert tar.pax_headers[f"{DELTA_PREFIX}base"] == ""
@@ -0,0 +1,102 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/metrics.py."""
+
+import prometheus_client
+
+from motd_server.metrics import generate_metrics, read_memory_usage
+from motd_server.motd import get_files_from_yaml, process_config
+
+
+def test_generate_metrics():
+    """
+    arrange: a processed config
+    act: when we generate the metrics
+    assert: the content metrics are rendered in the Prometheus text format
+    """
+    process_config({"FILES": "index.txt: index"})
+
+    data, content_type = generate_metrics()
+
+    assert content_type == prometheus_client.CONTENT_TYPE_LATEST
+    assert b"motd_content_files 2.0" in data
+
+
+def test_content_dedup_metrics():
+    """
+    arrange: a config with two files with the same body
+    act: when we process the config
+    assert: the dedup ratio and the bytes saved are reported
+    """
+    process_config({"FILES": "index-aws.txt: same\nindex-gce.txt: same"})
+
+    registry = prometheus_client.REGISTRY
+    # The _health file has its own body
+    assert registry.get_sample_value("motd_content_dedup_ratio") == 1.5
+    assert registry.get_sample_value("motd_content_dedup_saved_bytes") == 4
+
+
+def test_generate_metrics_multiprocess(monkeypatch, tmp_path):
+    """
+    arrange: a multiprocess metrics directory with no worker metrics yet
+    act: when we generate the metrics
+    assert: the metrics are aggregated from the directory
+    """
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+    data, _ = generate_metrics()
+
+    assert data == b""
+
+
+def test_content_load_failures():
+    """
+    arrange: an invalid YAML content
+    act: when we try to get the files from it
+    assert: the load failure is counted
+    """
+    before = prometheus_client.REGISTRY.get_sample_value("motd_content_load_failures_total")
+
+    get_files_from_yaml("not a dict")
+
+    after = prometheus_client.REGISTRY.get_sample_value("motd_content_load_failures_total")
+    assert after == (before or 0) + 1
+
+
+def test_read_memory_usage(tmp_path):
+    """
+    arrange: a smaps_rollup file
+    act: when we read the memory usage from it
+    assert: the fields are summed into each kind of memory, in bytes
+    """
+    smaps = tmp_path / "smaps_rollup"
+    smaps.write_text(
+        "557d94b2b000-7fffe016b000 ---p 00000000 00:00 0  [rollup]\n"
+        "Rss:                1308 kB\n"
+        "Pss:                 454 kB\n"
+        "Shared_Clean:       1164 kB\n"
+        "Shared_Dirty:          0 kB\n"
+        "Private_Clean:        40 kB\n"
+        "Private_Dirty:       104 kB\n"
+        "Anonymous:           104 kB\n",
+        encoding="ascii",
+    )
+
+    usage = read_memory_usage(str(smaps))
+
+    assert usage == {
+        "rss": 1308 * 1024,
+        "pss": 454 * 1024,
+        "shared": 1164 * 1024,
+        "private": 144 * 1024,
+    }
+
+
+def test_read_memory_usage_missing(tmp_path):
+    """
+    arrange: no smaps_rollup file, as on kernels that don't provide it
+    act: when we read the memory usage
+    assert: no memory is reported
+    """
+    assert not read_memory_usage(str(tmp_path / "smaps_rollup"))
@@ -3,16 +3,31 @@
 
 """Unit tests for motd-server-app/app.py."""
 
+import datetime
+import math
+from unittest import mock
+
 import pytest
+import yaml
 
+from motd_server import compression, motd
+from motd_server.content import ContentLoadError
 from motd_server.motd import (
     DEFAULT_FILES,
+    MotdRouter,
+    build_content,
+    collect_motd_tokens,
     extract_user_agent_info,
     get_files_from_yaml,
+    get_files_source,
     process_config,
     select_motd,
+    select_motd_filename,
 )
 
+APRIL = datetime.datetime(2025, 4, 1, tzinfo=datetime.timezone.utc).timestamp()
+MAY = datetime.datetime(2025, 5, 1, tzinfo=datetime.timezone.utc).timestamp()
+
 
 def test_get_files_from_yaml():
     """Test loading files from a valid YAML string."""
@@ -36,6 +51,26 @@ index-22.04.txt:
     assert result == expected
 
 
+def test_get_files_from_yaml_uses_libyaml():
+    """
+    arrange: a PyYAML installation built with libyaml
+    act: when we check the loader used for the files
+    assert: the libyaml-backed loader is used
+    """
+    assert motd.SafeLoader is getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def test_get_files_from_yaml_pure_python_loader(monkeypatch):
+    """
+    arrange: the pure-Python loader, as used when PyYAML was built without libyaml
+    act: when we load files from a valid YAML string
+    assert: we get the same files
+    """
+    monkeypatch.setattr(motd, "SafeLoader", yaml.SafeLoader)
+
+    assert get_files_from_yaml("index.txt: index") == {**DEFAULT_FILES, "index.txt": "index"}
+
+
 def test_get_files_from_non_dict_yaml():
     """
     arrange: an invalid YAML content (not a dict)
@@ -60,6 +95,18 @@ def test_get_files_from_invalid_yaml():
     assert result == DEFAULT_FILES
 
 
+def test_get_files_from_yaml_not_string_keys():
+    """
+    arrange: a YAML content whose keys are a number and a float
+    act: when we get the files from it and build their content
+    assert: the files are named after the keys
+    """
+    files = get_files_from_yaml("1: one\n24.04: noble")
+
+    assert files == {**DEFAULT_FILES, "1": "one", "24.04": "noble"}
+    assert build_content(files, "").entries["1"].body == b"one"
+
+
 def test_get_files_from_enpty_yaml():
     """
     arrange: an empty YAML content
@@ -79,6 +126,12 @@ def test_get_files_from_enpty_yaml():
         ("curl/7.68.0 cloud_id/gce", ("", "", "gce")),
         ("", ("", "", "")),
         ("random string without patterns", ("", "", "")),
+        (
+            "wget/1.21.4-1ubuntu4.1 Ubuntu/24.04.1/LTS GNU/Linux/6.8.0-1021-aws/aarch64 "
+            "cloud_id/aws",
+            ("24.04", "aarch64", "aws"),
+        ),
+        ("cloud_id/amd64 cloud_id/aws Ubuntu/22.04 Ubuntu/24.04", ("22.04", "amd64", "amd64")),
     ],
 )
 def test_extract_user_agent_info(user_agent, expected):
@@ -90,6 +143,22 @@ def test_extract_user_agent_info(user_agent, expected):
     assert extract_user_agent_info(user_agent) == expected
 
 
+def test_extract_user_agent_info_cache():
+    """
+    arrange: an empty user agent cache
+    act: when we parse the same user agent twice
+    assert: the second parse is served from the cache
+    """
+    extract_user_agent_info.cache_clear()
+
+    extract_user_agent_info("curl/7.68.0 Ubuntu/24.04/amd64 cloud_id/aws")
+    extract_user_agent_info("curl/7.68.0 Ubuntu/24.04/amd64 cloud_id/aws")
+
+    cache_info = extract_user_agent_info.cache_info()
+    assert (cache_info.hits, cache_info.misses) == (1, 1)
+    assert cache_info.maxsize == motd.USER_AGENT_CACHE_SIZE
+
+
 @pytest.fixture(name="motds")
 def motds_fixture():
     """Fixture providing a sample MOTD files dictionary."""
@@ -135,6 +204,16 @@ def test_select_motd_empty_files_dict():
     assert select_motd({}, "24.04", "amd64", "aws") == ""
 
 
+def test_select_motd_filename(motds):
+    """
+    arrange: a valid set of motd files
+    act: when we retrieve the motd filename for a version, arch, and cloud combination
+    assert: we get the name of the most specific match
+    """
+    assert select_motd_filename(motds, "24.04", "arm64", "aws") == "index-24.04-aws.txt"
+    assert select_motd_filename(motds, "20.04", "s390x", "oracle") == ""
+
+
 def test_select_motd_empty_parameters(motds):
     """
     arrange: a valid set of motd files
@@ -162,9 +241,311 @@ def test_process_config_with_files():
     act: when we process the config
     assert: files are available in PROCESSED_FILES
     """
-    config = {"FILES": "index.txt: index"}
+    config: dict = {"FILES": "index.txt: index"}
     process_config(config)
 
     expected = DEFAULT_FILES.copy()
     expected.update({"index.txt": "index"})
     assert config["PROCESSED_FILES"] == expected
+    assert config["MOTD_CONTENT"].files == expected
+    assert config["MOTD_CONTENT"].size == len("index") + len(DEFAULT_FILES[motd.HEALTH_PATH])
+    assert config["MOTD_CONTENT"].load_seconds > 0
+    assert config["MOTD_CONTENT"].entries["index.txt"].body == b"index"
+    assert config["MOTD_CONTENT"].router.resolve("24.04", "amd64", "aws") == "index"
+
+
+def test_process_config_with_files_path(tmp_path):
+    """
+    arrange: a config with a FILES_PATH file, which takes precedence over FILES
+    act: when we process the config
+    assert: files from the FILES_PATH file are available in PROCESSED_FILES
+    """
+    files_path = tmp_path / "files.yaml"
+    files_path.write_text("index.txt: from path", encoding="utf-8")
+    config: dict = {"FILES": "index.txt: index", "FILES_PATH": str(files_path)}
+    process_config(config)
+
+    assert config["PROCESSED_FILES"]["index.txt"] == "from path"
+
+
+def test_process_config_with_files_bundle(tmp_path, write_bundle):
+    """
+    arrange: a config with a FILES_BUNDLE bundle, which takes precedence over FILES_PATH
+    act: when we process the config
+    assert: files from the bundle are served from views of the bundle
+    """
+    bundle_path = tmp_path / "files.tar"
+    write_bundle(bundle_path, {"index.txt": "from bundle"})
+    config: dict = {"FILES_BUNDLE": str(bundle_path), "FILES_PATH": str(tmp_path / "files.yaml")}
+    process_config(config)
+
+    assert set(config["PROCESSED_FILES"]) == {"index.txt", *DEFAULT_FILES}
+    assert isinstance(config["MOTD_CONTENT"].entries["index.txt"].body, memoryview)
+    assert bytes(config["MOTD_CONTENT"].router.resolve("24.04", "", "")) == b"from bundle"
+    assert get_files_source(config) == str(bundle_path)
+
+
+def test_process_config_with_content_store(tmp_path, monkeypatch):
+    """
+    arrange: a config with a CONTENT_STORE directory and a rotating file
+    act: when we process the config twice, as two workers do
+    assert: both contents are served from views of the same store file, and only the first
+        worker compresses the files
+    """
+    config: dict = {
+        "FILES": f"index.txt: {'index ' * 100}\nindex-24.04.txt: [A, B]",
+        "CONTENT_STORE": str(tmp_path),
+    }
+    compress_entry = mock.MagicMock(side_effect=compression.compress_entry)
+    monkeypatch.setattr(compression, "compress_entry", compress_entry)
+    process_config(config)
+    compressed = compress_entry.call_count
+    other_config = dict(config)
+    process_config(other_config)
+
+    content = config["MOTD_CONTENT"]
+    assert compressed > 0
+    assert compress_entry.call_count == compressed
+    assert other_config["MOTD_CONTENT"].entries["index.txt"].variants
+    assert len(list(tmp_path.iterdir())) == 1
+    assert isinstance(content.entries["index.txt"].body, memoryview)
+    assert isinstance(content.rotations["index-24.04.txt"].entries[1].body, memoryview)
+    assert bytes(content.rotations["index-24.04.txt"].entries[1].body) == b"B"
+    assert content.version == other_config["MOTD_CONTENT"].version
+
+
+def test_process_config_with_missing_files_path(tmp_path):
+    """
+    arrange: a config with a FILES_PATH file that does not exist
+    act: when we process the config
+    assert: we get only the default files in PROCESSED_FILES
+    """
+    config: dict = {"FILES_PATH": str(tmp_path / "missing.yaml")}
+    process_config(config)
+
+    assert config["PROCESSED_FILES"] == DEFAULT_FILES
+
+
+def test_process_config_strict(tmp_path):
+    """
+    arrange: a config already processed, whose FILES_PATH file can no longer be parsed
+    act: when we process the config strictly
+    assert: an error is raised and the current content is left as it is
+    """
+    files_path = tmp_path / "files.yaml"
+    files_path.write_text("index.txt: index", encoding="utf-8")
+    config: dict = {"FILES_PATH": str(files_path)}
+    process_config(config)
+    content = config["MOTD_CONTENT"]
+    files_path.write_text("index.txt: [unterminated", encoding="utf-8")
+
+    with pytest.raises(ContentLoadError):
+        process_config(config, strict=True)
+    assert config["MOTD_CONTENT"] is content
+
+
+def test_build_content_version():
+    """
+    arrange: two sets of files with the same content and one with a different content
+    act: when we build their content snapshots
+    assert: the version only depends on the content
+    """
+    version = build_content({"index.txt": "index"}, "").version
+
+    assert build_content({"index.txt": "index"}, "").version == version
+    assert build_content({"index.txt": "other"}, "").version != version
+
+
+def test_build_content_rotations():
+    """
+    arrange: files rotating between variants, one of them with invalid variants only
+    act: when we build their content snapshot
+    assert: the variants are served, and the file that can't be served is not routed to
+    """
+    content = build_content(
+        {
+            "index.txt": [{"name": "a", "content": "A"}],
+            "index-24.04.txt": [{"weight": 0, "content": "invalid"}],
+        },
+        "",
+    )
+
+    assert content.get_entry("index.txt") == (content.rotations["index.txt"].entries[0], "a")
+    assert content.get_entry("index-24.04.txt") == (None, "")
+    assert content.router.resolve_filename("24.04", "", "") == "index.txt"
+    assert content.size == 1
+
+
+def test_build_content_version_rotations():
+    """
+    arrange: files rotating between variants
+    act: when we build their content snapshots with one more variant
+    assert: the version changes
+    """
+    version = build_content({"index.txt": ["A", "B"]}, "").version
+
+    assert build_content({"index.txt": ["A", "B", "C"]}, "").version != version
+
+
+def test_build_content_schedule():
+    """
+    arrange: an EOL warning scheduled for a month and an announcement ending with it
+    act: when we build their content snapshots before, during and after the window
+    assert: each snapshot only serves the active files and expires at the next boundary
+    """
+    files = {
+        "index.txt": {"content": "Announcement", "end": "2025-05-01"},
+        "index-20.04.txt": {"content": ["EOL"], "start": "2025-04-01", "end": "2025-05-01"},
+    }
+
+    before = build_content(files, "", now=APRIL - 1)
+    during = before.at(APRIL)
+    after = build_content(files, "", now=MAY)
+
+    assert before.at(APRIL - 1) is before
+    assert before.expires == APRIL
+    assert before.router.resolve_filename("20.04", "", "") == "index.txt"
+    assert before.get_entry("index-20.04.txt") == (None, "")
+    assert during.expires == MAY
+    assert during.router.resolve_filename("20.04", "", "") == "index-20.04.txt"
+    assert during.get_entry("index-20.04.txt")[1] == "0"
+    assert during.at(APRIL + 1) is during
+    assert len({before.version, during.version, after.version}) == 3
+    assert after.expires == math.inf
+    assert not after.entries.keys() & files.keys()
+    assert after.at(MAY + 1) is after.timeline.at(MAY)  # type: ignore[union-attr]
+
+
+@pytest.mark.parametrize(
+    "version,arch,cloud,expected",
+    [
+        ("24.04", "amd64", "aws", "index-24.04-aws.txt"),
+        ("24.04", "arm64", "aws", "index-2?.04-arm64.txt"),
+        ("22.04", "arm64", "", "index-2?.04-arm64.txt"),
+        ("26.04", "riscv64", "gce", "index-2?.04-[!a]*.txt"),
+        ("24.10", "arm64", "", "index-20.04..24.10.txt"),
+        ("25.10", "arm64", "", "index-{amd64,arm64}.txt"),
+        ("25.10", "s390x", "", "index.txt"),
+    ],
+)
+def test_select_motd_patterns(version, arch, cloud, expected):
+    """
+    arrange: exact MOTD filenames and MOTD patterns
+    act: when we select the MOTD for various combinations
+    assert: patterns stand in for the candidates after their exact filename, in order
+    """
+    files = {
+        "index.txt": "index",
+        "index-24.04-aws.txt": "version cloud",
+        "index-2?.04-arm64.txt": "LTS on arm",
+        "index-2?.04-[!a]*.txt": "LTS on other architectures",
+        "index-20.04..24.10.txt": "supported",
+        "index-{amd64,arm64}.txt": "amd64 or arm64",
+    }
+
+    assert select_motd_filename(files, version, arch, cloud) == expected
+    assert MotdRouter(files).resolve_filename(version, arch, cloud) == expected
+
+
+def test_motd_router_pattern_classes():
+    """
+    arrange: a router with MOTD patterns
+    act: when we resolve many values matched by the same patterns
+    assert: they share a single route, and give the same results as select_motd
+    """
+    files = {"index.txt": "index", "index-2?.04.txt": "LTS", "index-{arm64,riscv64}.txt": "arm"}
+    router = MotdRouter(files)
+    size = len(router)
+
+    for version in ("20.04", "22.04", "24.04", "26.04", "24.10"):
+        for arch in ("arm64", "riscv64", "s390x"):
+            assert router.resolve(version, arch, "") == select_motd(files, version, arch, "")
+    assert len(router) == size + 3
+
+
+def test_build_content_templates():
+    """
+    arrange: MOTD and other files with placeholders, one of them rotating
+    act: when we build their content snapshot
+    assert: only the MOTD bodies and variants are compiled as templates
+    """
+    content = build_content(
+        {
+            "index.txt": "{version}",
+            "index-2?.04.txt": ["{arch}", "plain"],
+            "aptnews.json": '{"version": "{version}"}',
+        },
+        "",
+    )
+
+    assert content.entries["index.txt"].template
+    assert [bool(entry.template) for entry in content.rotations["index-2?.04.txt"].entries] == [
+        True,
+        False,
+    ]
+    assert not content.entries["aptnews.json"].template
+
+
+def test_collect_motd_tokens(motds):
+    """
+    arrange: a set of MOTD files and a non-MOTD file
+    act: when we collect the tokens used in the MOTD filenames
+    assert: versions are kept apart from the architecture and cloud tokens
+    """
+    files = {**motds, "aptnews.json": "{}", "index.txt": "index"}
+
+    assert collect_motd_tokens(files) == (frozenset({"24.04"}), frozenset({"amd64", "aws"}))
+
+
+@pytest.mark.parametrize(
+    "version,arch,cloud",
+    [
+        ("24.04", "amd64", "aws"),
+        ("24.04", "amd64", "gce"),
+        ("24.04", "arm64", "aws"),
+        ("22.04", "amd64", "gce"),
+        ("20.04", "s390x", "oracle"),
+        ("", "aws", "amd64"),
+        ("", "", ""),
+    ],
+)
+def test_motd_router_matches_select_motd(motds, version, arch, cloud):
+    """
+    arrange: a router built from a set of MOTD files
+    act: when we resolve a version, arch, and cloud combination
+    assert: we get the same content as select_motd
+    """
+    router = MotdRouter({**motds, "index.txt": "index"})
+
+    assert router.resolve(version, arch, cloud) == select_motd(
+        {**motds, "index.txt": "index"}, version, arch, cloud
+    )
+
+
+def test_motd_router_unknown_values_are_not_stored(motds):
+    """
+    arrange: a router built from a set of MOTD files
+    act: when we resolve values that no MOTD filename mentions
+    assert: the routing table does not grow
+    """
+    router = MotdRouter(motds)
+    size = len(router)
+
+    assert router.resolve("20.04", "s390x", "oracle") == ""
+    assert router.resolve("24.04", "riscv64", "aws") == "version cloud"
+    assert len(router) == size
+
+
+def test_motd_router_resolves_on_demand(monkeypatch, motds):
+    """
+    arrange: a router with too many combinations to be precomputed
+    act: when we resolve a combination twice
+    assert: the route is memoized after the first lookup
+    """
+    monkeypatch.setattr(motd, "MAX_PRECOMPUTED_ROUTES", 0)
+    router = MotdRouter(motds)
+    assert len(router) == 0
+
+    assert router.resolve("24.04", "amd64", "gce") == "version arch"
+    assert router.resolve_filename("24.04", "amd64", "gce") == "index-24.04-amd64.txt"
+    assert len(router) == 1
@@ -0,0 +1,95 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/patterns.py."""
+
+import pytest
+
+from motd_server.metrics import CONTENT_LOAD_FAILURES
+from motd_server.patterns import compile_motd_patterns, compile_token, is_motd_pattern
+
+
+@pytest.mark.parametrize(
+    "filename,expected",
+    [
+        ("index-2?.04-arm64.txt", True),
+        ("index-{amd64,arm64}.txt", True),
+        ("index-20.04..24.04.txt", True),
+        ("index-[a-z]*.txt", True),
+        ("index-24.04-arm64.txt", False),
+        ("index.txt", False),
+        ("aptnews-*.json", False),
+    ],
+)
+def test_is_motd_pattern(filename, expected):
+    """
+    arrange: MOTD patterns, exact MOTD filenames and other files
+    act: when we check whether they are MOTD patterns
+    assert: only MOTD filenames with patterns in their tokens are
+    """
+    assert is_motd_pattern(filename) == expected
+
+
+@pytest.mark.parametrize(
+    "token,matching,not_matching",
+    [
+        ("2?.04", ["20.04", "24.04"], ["24.10", "18.04", ""]),
+        ("*", ["amd64", ""], []),
+        ("[a-z]*", ["aws", "arm64"], ["24.04"]),
+        ("{amd64,arm64}", ["amd64", "arm64"], ["s390x", "amd64,arm64"]),
+        ("{22.04..24.04,18.04}", ["22.04", "23.10", "24.04", "18.04"], ["20.04", "24.10"]),
+        ("20.04..22.04", ["20.04", "21.10", "22.04"], ["19.10", "22.10", "amd64", "2"]),
+    ],
+)
+def test_compile_token(token, matching, not_matching):
+    """
+    arrange: globs, sets of alternatives and ranges of versions
+    act: when we compile them and match values
+    assert: only the values described by the token match
+    """
+    matcher = compile_token(token)
+
+    assert all(matcher(value) for value in matching)
+    assert not any(matcher(value) for value in not_matching)
+
+
+@pytest.mark.parametrize("token", ["20.04..latest", "{amd64", "", "a{b}"])
+def test_compile_invalid_token(token):
+    """
+    arrange: invalid tokens
+    act: when we compile them
+    assert: a ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        compile_token(token)
+
+
+def test_compile_motd_patterns():
+    """
+    arrange: exact filenames, valid patterns and invalid patterns
+    act: when we compile the MOTD patterns
+    assert: valid patterns are grouped by token count in the order they are defined
+    """
+    failures = CONTENT_LOAD_FAILURES._value.get()  # pylint: disable=protected-access
+
+    patterns = compile_motd_patterns(
+        (
+            "index.txt",
+            "index-24.04.txt",
+            "index-2?.04-[a-z]*.txt",
+            "index-*.txt",
+            "index-{22.04,24.04}-arm64.txt",
+            "index-20.04..latest.txt",
+            "index-*-*-*-*.txt",
+        )
+    )
+
+    assert {
+        count: [pattern.filename for pattern in table] for count, table in patterns.items()
+    } == {
+        1: ["index-*.txt"],
+        2: ["index-2?.04-[a-z]*.txt", "index-{22.04,24.04}-arm64.txt"],
+    }
+    assert patterns[2][0].matches(("24.04", "arm64"))
+    assert not patterns[2][0].matches(("24.10", "arm64"))
+    assert CONTENT_LOAD_FAILURES._value.get() == failures + 2  # pylint: disable=protected-access
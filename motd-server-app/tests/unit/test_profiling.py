@@ -0,0 +1,155 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/profiling.py."""
+
+import inspect
+import json
+import sys
+import time
+
+import prometheus_client
+import pytest
+
+from motd_server import profiling
+from motd_server.profiling import (
+    ROOT_STACK,
+    Profiler,
+    Trace,
+    get_profile_sample_rate,
+    record_trace,
+    render_profile,
+)
+
+STACK_PREFIX = f"{ROOT_STACK};{__name__}"
+
+
+def stage() -> str:
+    """Stand for a stage of the application calling a library.
+
+    Returns:
+        JSON string.
+    """
+    time.sleep(0.002)
+    return json.dumps({"key": "value"})
+
+
+def handler() -> str:
+    """Stand for the application answering a request.
+
+    Returns:
+        Result of the stage.
+    """
+    return stage()
+
+
+def wsgi_app(_environ, start_response):
+    """Stand for a WSGI application."""
+    start_response("200 OK", [])
+    return [handler().encode()]
+
+
+def test_trace():
+    """
+    arrange: a trace of the functions of this file
+    act: when a function of this file is called, calls a library function, and returns
+    assert: the time of the library function is counted to the function of this file
+    """
+    trace = Trace((__file__,))
+    application = inspect.currentframe()
+    assert application and application.f_back
+    library = application.f_back
+
+    trace.profile(application, "call", None)
+    trace.profile(library, "call", None)
+    time.sleep(0.002)
+    trace.profile(library, "return", None)
+    trace.profile(application, "return", None)
+    self_times = trace.finish()
+
+    assert set(self_times) == {ROOT_STACK, f"{STACK_PREFIX}:test_trace"}
+    assert self_times[f"{STACK_PREFIX}:test_trace"] >= 0.002
+    assert self_times[ROOT_STACK] < 0.002
+
+
+def test_profiler():
+    """
+    arrange: a profiler tracing every request, with a profile function already set
+    act: when a request is served
+    assert: the request is traced and counted, and the previous profile function is restored
+    """
+    samples = prometheus_client.REGISTRY.get_sample_value("motd_profile_samples_total")
+    previous = Trace(()).profile
+    profiler = Profiler(wsgi_app, 1.0, [__file__])
+    sys.setprofile(previous)
+    try:
+        body = profiler({}, lambda *_: None)
+        restored = sys.getprofile()
+    finally:
+        sys.setprofile(None)
+
+    assert body == [b'{"key": "value"}']
+    assert restored is previous
+    assert prometheus_client.REGISTRY.get_sample_value("motd_profile_samples_total") == (
+        (samples or 0) + 1
+    )
+    stacks = dict(line.rsplit(" ", 1) for line in render_profile().splitlines())
+    stage_stack = f"{STACK_PREFIX}:wsgi_app;{__name__}:handler;{__name__}:stage"
+    assert int(stacks[stage_stack]) >= 2000
+
+
+def test_profiler_not_sampled(monkeypatch):
+    """
+    arrange: a profiler tracing no request
+    act: when a request is served
+    assert: it is served without being traced
+    """
+    monkeypatch.setattr(sys, "setprofile", None)
+
+    body = Profiler(wsgi_app, 0.0, [__file__])({}, lambda *_: None)
+
+    assert body == [b'{"key": "value"}']
+
+
+def test_render_profile():
+    """
+    arrange: traces with a stack taking time and a stack taking less than a microsecond
+    act: when we render the profile
+    assert: the time of the stacks is summed in microseconds, the empty stack is left out
+    """
+    record_trace({"request;render:a": 0.001, "request;render:b": 1e-8})
+    record_trace({"request;render:a": 0.0005})
+
+    lines = render_profile().splitlines()
+
+    assert "request;render:a 1500" in lines
+    assert not any(line.startswith("request;render:b ") for line in lines)
+
+
+@pytest.mark.parametrize(
+    "config, expected",
+    [
+        pytest.param({}, 0.0, id="unset"),
+        pytest.param({"PROFILE_SAMPLE_RATE": "0.01"}, 0.01, id="string"),
+        pytest.param({"PROFILE_SAMPLE_RATE": 2}, 1.0, id="above 1"),
+        pytest.param({"PROFILE_SAMPLE_RATE": -1}, 0.0, id="negative"),
+    ],
+)
+def test_get_profile_sample_rate(config, expected):
+    """
+    arrange: a profile sample rate configuration
+    act: when we get the sample rate
+    assert: it is between 0 and 1
+    """
+    assert get_profile_sample_rate(config) == expected
+
+
+def test_get_profile_sample_rate_gevent(monkeypatch):
+    """
+    arrange: a profile sample rate configuration, in a process monkey-patched by gevent
+    act: when we get the sample rate
+    assert: the profiler is disabled
+    """
+    monkeypatch.setattr(profiling.monkey, "is_module_patched", lambda _module: True)
+
+    assert get_profile_sample_rate({"PROFILE_SAMPLE_RATE": "0.01"}) == 0.0
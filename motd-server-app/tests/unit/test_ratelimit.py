@@ -0,0 +1,142 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/ratelimit.py."""
+
+import pytest
+
+from motd_server import ratelimit
+from motd_server.ratelimit import (
+    RateLimit,
+    TokenBucketLimiter,
+    create_rate_limiter,
+    get_client_key,
+)
+
+USER_AGENT = "wget/1.21.4-1ubuntu4.1 Ubuntu/24.04.1/LTS GNU/Linux/6.8.0/amd64 cloud_id/aws"
+
+
+@pytest.fixture(name="clock")
+def clock_fixture(monkeypatch):
+    """Fixture providing a list whose first item is the time seen by the rate limit."""
+    clock = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: clock[0])
+    return clock
+
+
+def app(_, start_response):
+    """Serve every request with a 200 OK."""
+    start_response("200 OK", [])
+    return [b"served"]
+
+
+def call(wsgi_app, path="/", method="GET", **headers):
+    """Call a WSGI application.
+
+    Returns:
+        Tuple of (status, headers, body).
+    """
+    environ = {"REQUEST_METHOD": method, "PATH_INFO": path, "REMOTE_ADDR": "10.0.0.1"}
+    environ.update({f"HTTP_{name.upper()}": value for name, value in headers.items()})
+    response = {}
+
+    def start_response(status, response_headers):
+        response["status"] = status
+        response["headers"] = dict(response_headers)
+
+    body = b"".join(wsgi_app(environ, start_response))
+    return response["status"], response["headers"], body
+
+
+def test_acquire(clock):
+    """
+    arrange: a limiter of 2 requests per second with a burst of 3
+    act: when a client sends requests faster than that
+    assert: it gets the burst, then one request per refilled token, others wait
+    """
+    limiter = TokenBucketLimiter(2, 3)
+
+    assert [limiter.acquire("client") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("client") == pytest.approx(0.5)
+    assert limiter.acquire("other") == 0
+    clock[0] += 0.25
+    assert limiter.acquire("client") == pytest.approx(0.25)
+    clock[0] += 0.25
+    assert limiter.acquire("client") == 0
+    assert limiter.acquire("client") == pytest.approx(0.5)
+    clock[0] += 100
+    assert [limiter.acquire("client") for _ in range(4)][-1] > 0
+
+
+def test_forget_least_recent_client(clock):  # pylint: disable=unused-argument
+    """
+    arrange: a limiter of 1 request per client, tracking at most 2 clients
+    act: when more clients come
+    assert: the least recently seen client is forgotten, and can make a request again
+    """
+    limiter = TokenBucketLimiter(0.01, 1, max_clients=2)
+    limiter.acquire("a")
+    limiter.acquire("b")
+    assert limiter.acquire("a") > 0
+
+    assert limiter.acquire("c") == 0
+    assert limiter.acquire("b") == 0
+    assert len(limiter) == 2
+    assert limiter.acquire("c") > 0
+    assert limiter.acquire("a") == 0
+
+
+def test_get_client_key():
+    """
+    arrange: requests from a client, directly and through proxies
+    act: when we identify their client
+    assert: the address is the one the closest proxy saw, with the class of the user agent
+    """
+    environ = {"REMOTE_ADDR": "10.0.0.1", "HTTP_USER_AGENT": USER_AGENT}
+
+    assert get_client_key(environ) == ("10.0.0.1", ("24.04", "amd64", "aws"))
+    environ["HTTP_X_FORWARDED_FOR"] = "1.2.3.4, 192.0.2.1"
+    assert get_client_key(environ)[0] == "192.0.2.1"
+    assert get_client_key({}) == ("", ("", "", ""))
+
+
+def test_rate_limit(clock):  # pylint: disable=unused-argument
+    """
+    arrange: a rate limit of one request per 10 seconds
+    act: when a client sends more requests
+    assert: the first is served, the others are told when to retry, exempt paths are served
+    """
+    rate_limit = RateLimit(app, TokenBucketLimiter(0.1, 1), ["/metrics"])
+
+    assert call(rate_limit, user_agent=USER_AGENT)[2] == b"served"
+    status, headers, body = call(rate_limit, user_agent=USER_AGENT)
+    assert status == "429 TOO MANY REQUESTS"
+    assert headers["Retry-After"] == "10"
+    assert headers["Cache-Control"] == "private, max-age=10"
+    assert headers["Content-Length"] == str(len(body))
+    assert call(rate_limit, method="HEAD", user_agent=USER_AGENT)[2] == b""
+    status, headers, body = call(rate_limit, user_agent=USER_AGENT, if_none_match='"etag"')
+    assert (status, body) == ("304 NOT MODIFIED", b"")
+    assert headers["Retry-After"] == "10"
+    assert call(rate_limit, "/metrics")[2] == b"served"
+    assert call(rate_limit, "/metrics/extra", user_agent=USER_AGENT)[0] == "429 TOO MANY REQUESTS"
+    assert call(rate_limit, user_agent="curl/8.5.0")[2] == b"served"
+
+
+@pytest.mark.parametrize(
+    "config,rate",
+    [({}, None), ({"RATE_LIMIT": 0}, None), ({"RATE_LIMIT": 5}, 5), ({"RATE_LIMIT": "0.5"}, 0.5)],
+)
+def test_create_rate_limiter(config, rate):
+    """
+    arrange: rate limit configurations
+    act: when we create the rate limiter
+    assert: requests are only limited with a positive rate
+    """
+    limiter = create_rate_limiter(config)
+
+    if rate is None:
+        assert limiter is None
+    else:
+        assert limiter is not None
+        assert limiter._rate == rate  # pylint: disable=protected-access
@@ -0,0 +1,203 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/reload.py."""
+
+import dataclasses
+import datetime
+import os
+import time
+
+import prometheus_client
+import pytest
+
+from motd_server.motd import extract_user_agent_info, process_config
+from motd_server.reload import CACHE_REPORT_INTERVAL, ContentReloader
+
+
+@pytest.fixture(name="config")
+def config_fixture(tmp_path):
+    """Fixture providing a config loaded from a FILES_PATH file that is checked on every call."""
+    files_path = tmp_path / "files.yaml"
+    files_path.write_text("index.txt: before", encoding="utf-8")
+    config = {"FILES_PATH": str(files_path), "FILES_RELOAD_INTERVAL": 0}
+    process_config(config)
+    return config
+
+
+def test_reload(config):
+    """
+    arrange: a reloader watching a FILES_PATH file
+    act: when the file changes
+    assert: the content is replaced with a new version
+    """
+    reloader = ContentReloader(config)
+    previous = config["MOTD_CONTENT"]
+    assert not reloader.maybe_reload()
+
+    with open(config["FILES_PATH"], "w", encoding="utf-8") as files_file:
+        files_file.write("index.txt: after the change")
+
+    assert reloader.maybe_reload()
+    assert config["MOTD_CONTENT"].files["index.txt"] == "after the change"
+    assert config["MOTD_CONTENT"].version != previous.version
+    # The previous snapshot is left untouched for in-flight requests
+    assert previous.files["index.txt"] == "before"
+
+
+def test_reload_missing_file(config):
+    """
+    arrange: a reloader watching a FILES_PATH file
+    act: when the file is removed
+    assert: the current content is kept
+    """
+    reloader = ContentReloader(config)
+    previous = config["MOTD_CONTENT"]
+    os.remove(config["FILES_PATH"])
+
+    assert not reloader.maybe_reload()
+    assert config["MOTD_CONTENT"] is previous
+
+
+@pytest.mark.parametrize(
+    "files",
+    [
+        pytest.param("index.txt: [unterminated", id="invalid YAML"),
+        pytest.param("- not a mapping", id="not a mapping"),
+    ],
+)
+def test_reload_invalid_file(config, files):
+    """
+    arrange: a reloader watching a FILES_PATH file
+    act: when the file is replaced with one that can't be loaded, then fixed
+    assert: the current content is kept until the file is fixed
+    """
+    reloader = ContentReloader(config)
+    previous = config["MOTD_CONTENT"]
+    with open(config["FILES_PATH"], "w", encoding="utf-8") as files_file:
+        files_file.write(files)
+
+    assert not reloader.maybe_reload()
+    assert config["MOTD_CONTENT"] is previous
+    assert config["MOTD_CONTENT"].router.resolve_route("24.04", "amd64", "aws")[0] == "index.txt"
+
+    with open(config["FILES_PATH"], "w", encoding="utf-8") as files_file:
+        files_file.write("index.txt: fixed")
+
+    assert reloader.maybe_reload()
+    assert config["MOTD_CONTENT"].files["index.txt"] == "fixed"
+
+
+def test_reload_truncated_bundle(tmp_path, write_bundle):
+    """
+    arrange: a reloader watching a FILES_BUNDLE bundle
+    act: when the bundle is replaced with a truncated one
+    assert: the current content is kept
+    """
+    bundle_path = tmp_path / "files.tar"
+    write_bundle(bundle_path, {"index.txt": "before"})
+    config = {"FILES_BUNDLE": str(bundle_path), "FILES_RELOAD_INTERVAL": 0}
+    process_config(config)
+    reloader = ContentReloader(config)
+    previous = config["MOTD_CONTENT"]
+
+    write_bundle(bundle_path, {"index.txt": "after the change" * 100})
+    bundle_path.write_bytes(bundle_path.read_bytes()[:700])
+
+    assert not reloader.maybe_reload()
+    assert config["MOTD_CONTENT"] is previous
+
+
+def test_reload_interval(config):
+    """
+    arrange: a reloader with a long interval that already checked the file
+    act: when the file changes
+    assert: the content is not reloaded before the interval elapsed
+    """
+    config["FILES_RELOAD_INTERVAL"] = 3600
+    reloader = ContentReloader(config)
+    reloader.maybe_reload()
+
+    with open(config["FILES_PATH"], "w", encoding="utf-8") as files_file:
+        files_file.write("index.txt: after the change")
+
+    assert not reloader.maybe_reload()
+
+
+def test_reload_in_progress(config):
+    """
+    arrange: a reloader whose lock is held by another thread
+    act: when the file changes
+    assert: the current thread does not wait and keeps the current content
+    """
+    reloader = ContentReloader(config)
+    with open(config["FILES_PATH"], "w", encoding="utf-8") as files_file:
+        files_file.write("index.txt: after the change")
+
+    with reloader._lock:  # pylint: disable=protected-access
+        assert not reloader.maybe_reload()
+
+
+def test_reload_without_files_path():
+    """
+    arrange: a config without FILES_PATH
+    act: when we check for changes
+    assert: nothing is reloaded
+    """
+    config: dict = {"FILES": "index.txt: index"}
+    process_config(config)
+
+    assert not ContentReloader(config).maybe_reload()
+
+
+def test_advance_schedule(monkeypatch):
+    """
+    arrange: a file scheduled to start in an hour
+    act: when the time reaches its start
+    assert: the content of the new segment replaces the current one, once
+    """
+    start = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)
+    config: dict = {"FILES": f"index.txt: {{content: Starting, start: '{start.isoformat()}'}}"}
+    process_config(config)
+    reloader = ContentReloader(config)
+    assert not reloader.advance_schedule()
+    assert not config["MOTD_CONTENT"].entries.get("index.txt")
+    # Without a timeline there is nothing to switch to
+    config["MOTD_CONTENT"] = dataclasses.replace(config["MOTD_CONTENT"], timeline=None, expires=0)
+    assert not reloader.advance_schedule()
+    process_config(config)
+
+    monkeypatch.setattr(time, "time", start.timestamp)
+
+    assert not reloader.maybe_reload()
+    assert config["MOTD_CONTENT"].files["index.txt"] == "Starting"
+    assert not reloader.advance_schedule()
+
+
+def test_report_caches(monkeypatch):
+    """
+    arrange: a reloader, and a user agent parsed twice
+    act: when requests are served, a while apart
+    assert: the statistics of the user agent cache are reported at most once per interval
+    """
+    config: dict = {"FILES": "index.txt: index"}
+    process_config(config)
+    reloader = ContentReloader(config)
+    monkeypatch.setattr(time, "monotonic", lambda: 1000.0)
+    extract_user_agent_info.cache_clear()
+    extract_user_agent_info("curl/8.5.0 Ubuntu/24.04/amd64 cloud_id/aws")
+
+    reloader.maybe_reload()
+    extract_user_agent_info("curl/8.5.0 Ubuntu/24.04/amd64 cloud_id/aws")
+    reloader.maybe_reload()
+
+    def sample(statistic):
+        """Get a statistic of the cache from the metrics."""
+        return prometheus_client.REGISTRY.get_sample_value(
+            "motd_user_agent_cache", {"statistic": statistic}
+        )
+
+    assert (sample("hits"), sample("misses"), sample("size")) == (0, 1, 1)
+    monkeypatch.setattr(time, "monotonic", lambda: 1000.0 + CACHE_REPORT_INTERVAL)
+    reloader.maybe_reload()
+    assert (sample("hits"), sample("misses"), sample("size")) == (1, 1, 1)
@@ -0,0 +1,121 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/rotation.py."""
+
+import collections
+import datetime
+import hashlib
+import types
+
+import pytest
+
+from motd_server.rotation import build_alias_table, build_rotations, get_uniform, parse_variants
+
+NOW = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "weights",
+    [[1], [1, 1], [3, 1], [1, 2, 3, 4], [0.1, 10, 0.5], [5, 5, 5, 1, 1]],
+)
+def test_build_alias_table(weights):
+    """
+    arrange: a list of weights
+    act: when we build its alias table
+    assert: every outcome gets exactly its share of the slots
+    """
+    probabilities, aliases = build_alias_table(weights)
+
+    shares = [0.0] * len(weights)
+    for index, (probability, alias) in enumerate(zip(probabilities, aliases)):
+        shares[index] += probability / len(weights)
+        shares[alias] += (1 - probability) / len(weights)
+    for share, weight in zip(shares, weights):
+        assert share == pytest.approx(weight / sum(weights))
+
+
+def test_get_uniform():
+    """
+    arrange: identifiers of clients
+    act: when we derive numbers from them
+    assert: the numbers are in [0, 1) and the same for the same identifier
+    """
+    assert 0 <= get_uniform("10.0.0.1") < 1
+    assert get_uniform("10.0.0.1") == get_uniform("10.0.0.1")
+    assert get_uniform("10.0.0.1") != get_uniform("10.0.0.2")
+    assert 0 <= get_uniform(None) < 1
+
+
+def test_get_uniform_highest_digest(monkeypatch):
+    """
+    arrange: an identifier hashed to the highest digest
+    act: when we derive a number from it
+    assert: the number is below 1, so that it picks the last slot of an alias table
+    """
+    monkeypatch.setattr(
+        hashlib,
+        "blake2b",
+        lambda *_args, **_kwargs: types.SimpleNamespace(digest=lambda: b"\xff" * 8),
+    )
+
+    assert get_uniform("10.0.0.1") == 1 - 2**-53
+
+
+def test_parse_variants():
+    """
+    arrange: variants as plain content and as mappings, some of them invalid
+    act: when we parse them
+    assert: the valid variants are kept with their names and weights
+    """
+    variants = parse_variants(
+        "index.txt",
+        [
+            "plain",
+            {"name": "a", "weight": "3", "content": "A"},
+            {"weight": 2, "content": "B"},
+            {"name": "no content"},
+            {"weight": 0, "content": "C"},
+            {"weight": "heavy", "content": "D"},
+        ],
+    )
+
+    assert variants == [("0", 1.0, "plain"), ("a", 3.0, "A"), ("2", 2.0, "B")]
+
+
+def test_build_rotations():
+    """
+    arrange: files with plain content, with variants and with invalid variants only
+    act: when we build their rotations
+    assert: only the files with valid variants rotate, picked according to their weights
+    """
+    rotations = build_rotations(
+        {
+            "index.txt": "plain",
+            "index-24.04.txt": [{"name": "a", "weight": 3, "content": "A"}, "B"],
+            "index-22.04.txt": [{"weight": -1, "content": "invalid"}],
+        },
+        [("*.txt", "public, max-age=60")],
+        NOW,
+    )
+
+    assert set(rotations) == {"index-24.04.txt"}
+    rotation = rotations["index-24.04.txt"]
+    assert rotation.names == ("a", "1")
+    assert [bytes(entry.body) for entry in rotation.entries] == [b"A", b"B"]
+    assert all(entry.cache_control == "public, max-age=60" for entry in rotation.entries)
+    counts = collections.Counter(rotation.pick(str(index))[0] for index in range(4000))
+    assert counts["a"] == pytest.approx(3000, rel=0.1)
+
+
+def test_rotation_pinned():
+    """
+    arrange: a file rotating between many variants
+    act: when we pick variants for the same identifier
+    assert: the identifier always gets the same variant
+    """
+    rotation = build_rotations({"index.txt": [str(index) for index in range(10)]}, [], NOW)[
+        "index.txt"
+    ]
+
+    assert len({rotation.pick("machine-id")[0] for _ in range(100)}) == 1
@@ -0,0 +1,101 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/schedule.py."""
+
+import datetime
+import math
+
+import pytest
+
+from motd_server.metrics import CONTENT_LOAD_FAILURES
+from motd_server.schedule import Timeline, parse_schedule, parse_timestamp
+
+APRIL = datetime.datetime(2025, 4, 1, tzinfo=datetime.timezone.utc).timestamp()
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "2025-04-01T00:00:00Z",
+        "2025-04-01 02:00:00+02:00",
+        "2025-04-01T00:00:00",
+        "2025-04-01",
+        datetime.date(2025, 4, 1),
+        datetime.datetime(2025, 4, 1),
+        datetime.datetime(2025, 4, 1, tzinfo=datetime.timezone.utc),
+    ],
+)
+def test_parse_timestamp(value):
+    """
+    arrange: the same time as strings, dates and datetimes
+    act: when we parse them
+    assert: we get the same timestamp, times without a timezone being in UTC
+    """
+    assert parse_timestamp(value) == APRIL
+
+
+@pytest.mark.parametrize("value", ["April", 1743465600, None])
+def test_parse_invalid_timestamp(value):
+    """
+    arrange: values that are not timestamps
+    act: when we parse them
+    assert: a ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        parse_timestamp(value)
+
+
+def test_parse_schedule():
+    """
+    arrange: plain, rotating, scheduled and invalid file definitions
+    act: when we parse the schedule
+    assert: files are unwrapped, scheduled files get their window and invalid ones are skipped
+    """
+    failures = CONTENT_LOAD_FAILURES._value.get()  # pylint: disable=protected-access
+
+    contents, windows = parse_schedule(
+        {
+            "index.txt": "plain",
+            "index-24.04.txt": ["A", "B"],
+            "index-22.04.txt": {"content": "start", "start": "2025-04-01"},
+            "index-20.04.txt": {"content": ["A"], "end": "2025-04-01"},
+            "aptnews.json": {"content": "always"},
+            "missing.txt": {"start": "2025-04-01"},
+            "invalid.txt": {"content": "invalid", "end": "soon"},
+        }
+    )
+
+    assert contents == {
+        "index.txt": "plain",
+        "index-24.04.txt": ["A", "B"],
+        "index-22.04.txt": "start",
+        "index-20.04.txt": ["A"],
+        "aptnews.json": "always",
+    }
+    assert windows == {"index-22.04.txt": (APRIL, math.inf), "index-20.04.txt": (-math.inf, APRIL)}
+    assert CONTENT_LOAD_FAILURES._value.get() == failures + 2  # pylint: disable=protected-access
+
+
+def test_timeline():
+    """
+    arrange: a timeline of overlapping windows
+    act: when we get the segments at various times
+    assert: each segment has the files active during it, and is built once
+    """
+    built = []
+
+    def build(active, start, expires):
+        """Record the segments built."""
+        built.append(active)
+        return sorted(active), start, expires
+
+    timeline = Timeline({"a": (10.0, 30.0), "b": (20.0, math.inf), "c": (-math.inf, 20.0)}, build)
+
+    assert timeline.boundaries == [10.0, 20.0, 30.0]
+    assert timeline.at(0) == (["c"], -math.inf, 10.0)
+    assert timeline.at(10) == (["a", "c"], 10.0, 20.0)
+    assert timeline.at(25) == (["a", "b"], 20.0, 30.0)
+    assert timeline.at(29.9) == (["a", "b"], 20.0, 30.0)
+    assert timeline.at(30) == (["b"], 30.0, math.inf)
+    assert len(built) == 4
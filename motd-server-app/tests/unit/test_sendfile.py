@@ -0,0 +1,103 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/sendfile.py."""
+
+import datetime
+import os
+import socket
+
+import pytest
+
+from motd_server.content import IDENTITY, Entry, FileSpan
+from motd_server.sendfile import SENDFILE_MIN_SIZE, SpanFile, get_span, send_span
+
+
+@pytest.fixture(name="span")
+def span_fixture(tmp_path):
+    """Fixture providing a span of a file between other bytes."""
+    path = tmp_path / "content.store"
+    path.write_bytes(b"header" + b"0123456789" + b"trailer")
+    return FileSpan(str(path), 6, 10)
+
+
+def test_span_file(span):
+    """
+    arrange: a span of a file between other bytes
+    act: when we open and read it
+    assert: its descriptor is positioned at the span and only the span is read
+    """
+    with SpanFile(span.path, span.offset, span.size) as span_file:
+        assert span_file.readable()
+        assert span_file.seekable()
+        assert os.lseek(span_file.fileno(), 0, os.SEEK_CUR) == span.offset
+        assert span_file.read(4) == b"0123"
+        assert span_file.read() == b"456789"
+        assert span_file.read() == b""
+
+
+def test_span_file_sendfile(span):
+    """
+    arrange: a span of a file and a connected socket
+    act: when we send the span with sendfile, as gunicorn does
+    assert: only the span is sent
+    """
+    sender, receiver = socket.socketpair()
+    with sender, receiver, SpanFile(span.path, span.offset, span.size) as span_file:
+        offset = os.lseek(span_file.fileno(), 0, os.SEEK_CUR)
+        sender.sendfile(span_file, offset=offset, count=span.size)
+
+        assert span_file.tell() == span.offset + span.size
+        assert receiver.recv(100) == b"0123456789"
+
+
+def test_send_span(span):
+    """
+    arrange: a span of a file and a WSGI server with a file wrapper
+    act: when we send a range of the span
+    assert: the server wraps a file of the range
+    """
+    wrapped = []
+
+    def file_wrapper(file, _block_size=8192):
+        """Stand for the file wrapper of the WSGI server."""
+        wrapped.append(file)
+        return [file.read()]
+
+    body = send_span({"wsgi.file_wrapper": file_wrapper}, span, 2, 5)
+
+    assert body == [b"23456"]
+    wrapped[0].close()
+
+
+def test_send_span_missing(span):
+    """
+    arrange: a span of a file removed since
+    act: when we send the span
+    assert: nothing is sent, the body has to be sent from memory
+    """
+    os.unlink(span.path)
+
+    assert send_span({}, span) is None
+
+
+def test_get_span():
+    """
+    arrange: an entry whose body is in the store but whose variant is small
+    act: when we get the spans of the body and of the variant
+    assert: only the large body is sent from the store
+    """
+    entry = Entry(
+        body=b"",
+        etag="",
+        last_modified=datetime.datetime.now(datetime.timezone.utc),
+        mimetype="text/plain",
+        spans={
+            IDENTITY: FileSpan("content.store", 0, SENDFILE_MIN_SIZE),
+            "gzip": FileSpan("content.store", 0, SENDFILE_MIN_SIZE - 1),
+        },
+    )
+
+    assert get_span(entry, None) == entry.spans[IDENTITY]
+    assert get_span(entry, "gzip") is None
+    assert get_span(entry, "br") is None
@@ -0,0 +1,211 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/store.py."""
+
+import os
+from unittest import mock
+
+import prometheus_client
+import pytest
+
+from motd_server.compression import compress_entries
+from motd_server.content import IDENTITY, build_entries
+from motd_server.store import (
+    STORE_RETENTION,
+    STORE_SUFFIX,
+    get_store_key,
+    read_store,
+    remove_stores,
+    share_entries,
+    write_store,
+)
+
+FILES = {"index.txt": "Welcome to Ubuntu", "large.txt": "This is a great MOTD. " * 50}
+
+
+@pytest.fixture(name="entries")
+def entries_fixture():
+    """Fixture providing entries, one of them with compressed variants."""
+    return compress_entries(build_entries(FILES))
+
+
+@pytest.fixture(name="compress")
+def compress_fixture():
+    """Fixture providing a compression function counting its calls."""
+    return mock.MagicMock(side_effect=compress_entries)
+
+
+def test_read_store(tmp_path, entries):
+    """
+    arrange: a store written from entries with compressed variants
+    act: when we read it
+    assert: the entries are the same, their bodies and variants being views of the store
+        whose spans of the store file are recorded
+    """
+    path = str(tmp_path / "content.store")
+    write_store(path, entries)
+
+    shared = read_store(path, entries)
+
+    assert shared == entries
+    assert isinstance(shared["large.txt"].body, memoryview)
+    assert set(shared["large.txt"].variants) == set(entries["large.txt"].variants)
+    assert set(shared["large.txt"].spans) == {IDENTITY, *entries["large.txt"].variants}
+    with open(path, "rb") as store_file:
+        store = store_file.read()
+    for encoding, span in shared["large.txt"].spans.items():
+        data = shared["large.txt"].variants.get(encoding, shared["large.txt"].body)
+        assert span.path == path
+        assert store[span.offset : span.offset + span.size] == data
+    for encoding, data in shared["large.txt"].variants.items():
+        assert isinstance(data, memoryview)
+        assert data == entries["large.txt"].variants[encoding]
+
+
+def test_write_store_dedup(tmp_path, entries):
+    """
+    arrange: entries of two files with the same body
+    act: when we write and read their store
+    assert: the body and its variants are written once, and both entries read them
+    """
+    path = tmp_path / "content.store"
+    write_store(str(path), {"large.txt": entries["large.txt"]})
+    size = path.stat().st_size
+    duplicated = {"large.txt": entries["large.txt"], "copy.txt": entries["large.txt"]}
+
+    write_store(str(path), duplicated)
+    shared = read_store(str(path), duplicated)
+
+    # Only the index grows
+    assert path.stat().st_size - size < 200
+    assert shared["copy.txt"].body == entries["large.txt"].body
+    assert shared["copy.txt"].variants == entries["large.txt"].variants
+
+
+def test_read_store_missing_entry(tmp_path, entries):
+    """
+    arrange: a store written from some entries
+    act: when we read it for other entries
+    assert: a ValueError is raised
+    """
+    path = str(tmp_path / "content.store")
+    write_store(path, {"index.txt": entries["index.txt"]})
+
+    with pytest.raises(ValueError):
+        read_store(path, entries)
+
+
+def test_get_store_key(entries):
+    """
+    arrange: a set of entries
+    act: when we get the store key of the same and of other entries
+    assert: the key only depends on the names and bodies, not on the variants
+    """
+    key = get_store_key(entries)
+
+    assert get_store_key(build_entries(FILES)) == key
+    assert get_store_key({"index.txt": entries["index.txt"]}) != key
+
+
+def test_share_entries(tmp_path, entries, compress):
+    """
+    arrange: a store directory with an old store of other entries
+    act: when we share uncompressed entries twice, as two workers do
+    assert: a single store is written, the entries are only compressed by the first worker
+        and the second finds the variants in the store, and the old store is removed
+    """
+    directory = tmp_path / "store"
+    directory.mkdir()
+    old_store = directory / f"old{STORE_SUFFIX}"
+    old_store.write_bytes(b"")
+    os.utime(old_store, (0, 0))
+
+    first = share_entries(str(directory), build_entries(FILES), compress)
+    stores = set(directory.iterdir())
+    second = share_entries(str(directory), build_entries(FILES), compress)
+
+    assert first == second == entries
+    assert compress.call_count == 1
+    assert isinstance(second["index.txt"].body, memoryview)
+    assert stores == set(directory.iterdir())
+    assert len(stores) == 1
+    assert not old_store.exists()
+
+
+def test_share_entries_keeps_recent_stores(tmp_path, entries, compress):
+    """
+    arrange: a store directory with a store of other entries written recently
+    act: when we share entries
+    assert: the recent store is kept for the workers still loading it
+    """
+    recent_store = tmp_path / f"recent{STORE_SUFFIX}"
+    recent_store.write_bytes(b"")
+    os.utime(recent_store, (os.path.getmtime(recent_store) - STORE_RETENTION / 2,) * 2)
+
+    share_entries(str(tmp_path), entries, compress)
+
+    assert recent_store.exists()
+
+
+@pytest.mark.parametrize("removed", ["stat", "unlink"])
+def test_remove_stores_removed_by_another_worker(tmp_path, monkeypatch, removed):
+    """
+    arrange: old stores, one of them removed by another worker once listed
+    act: when we remove the old stores
+    assert: the store already removed is skipped, the others are removed, other files kept
+    """
+    stores = [tmp_path / f"{name}{STORE_SUFFIX}" for name in ("a", "b")]
+    for store in stores:
+        store.write_bytes(b"")
+        os.utime(store, (0, 0))
+    other = tmp_path / "other"
+    other.write_bytes(b"")
+    os.utime(other, (0, 0))
+    original = getattr(os, removed)
+
+    def remove_first(path, *args, **kwargs):
+        """Remove the store before the worker gets to it."""
+        if path == str(stores[0]) and stores[0].exists():
+            stores[0].unlink()
+        return original(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, removed, remove_first)
+
+    remove_stores(str(tmp_path), 1)
+
+    assert not any(store.exists() for store in stores)
+    assert other.exists()
+
+
+@pytest.mark.parametrize("failure", ["directory", "write"])
+def test_share_entries_error(tmp_path, monkeypatch, entries, compress, failure):
+    """
+    arrange: a store directory that is a file, or a store that can't be written
+    act: when we share uncompressed entries
+    assert: the entries are compressed once and returned in memory, and the failure is
+        counted
+    """
+    directory = tmp_path / "store"
+    if failure == "directory":
+        directory.write_text("not a directory", encoding="utf-8")
+    else:
+        monkeypatch.setattr("motd_server.store.write_store", raise_os_error)
+    before = prometheus_client.REGISTRY.get_sample_value("motd_content_load_failures_total")
+
+    shared = share_entries(str(directory), build_entries(FILES), compress)
+
+    after = prometheus_client.REGISTRY.get_sample_value("motd_content_load_failures_total")
+    assert shared == entries
+    assert not isinstance(shared["index.txt"].body, memoryview)
+    assert compress.call_count == 1
+    assert after == (before or 0) + 1
+
+
+def raise_os_error(*_args):
+    """Fail to write a store.
+
+    Raises:
+        OSError: always.
+    """
+    raise OSError("No space left on device")
@@ -0,0 +1,85 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/template.py."""
+
+from motd_server import template as template_module
+from motd_server.compression import FAST_ENCODINGS
+from motd_server.content import build_entries
+from motd_server.template import compile_template
+
+
+def test_compile_template():
+    """
+    arrange: entries with placeholders, without placeholders and not in UTF-8
+    act: when we compile their templates
+    assert: only bodies with placeholders get a template, split around the placeholders
+    """
+    entries = build_entries(
+        {
+            "index.txt": "Ubuntu {version} on {arch}, {unknown}",
+            "plain.txt": "Ubuntu {}",
+            "binary.txt": b"\xff{version}",
+        }
+    )
+
+    template = compile_template(entries["index.txt"]).template
+
+    assert template is not None
+    assert template.parts == ("Ubuntu ", "version", " on ", "arch", ", {unknown}")
+    assert template.entry is entries["index.txt"]
+    assert compile_template(entries["plain.txt"]) is entries["plain.txt"]
+    assert compile_template(entries["binary.txt"]) is entries["binary.txt"]
+
+
+def test_render_template(monkeypatch):
+    """
+    arrange: a compiled template
+    act: when we render it for several clients
+    assert: every client gets its own body, rendered and compressed once
+    """
+    entry = compile_template(
+        build_entries({"index.txt": "{version}-{arch}-{cloud} " * 50})["index.txt"]
+    )
+    template = entry.template
+    assert template is not None
+    compressed = []
+    compress_entry = template_module.compress_entry
+
+    def record_compression(rendered, encodings):
+        """Record the bodies compressed, and the compression levels."""
+        compressed.append((rendered.body, encodings))
+        return compress_entry(rendered, encodings)
+
+    monkeypatch.setattr(template_module, "compress_entry", record_compression)
+
+    first = template.render("24.04", "amd64", "aws")
+    second = template.render("22.04", "arm64", "")
+
+    assert first.body == b"24.04-amd64-aws " * 50
+    assert second.body == b"22.04-arm64- " * 50
+    assert first.etag != second.etag != entry.etag
+    assert first.variants and first.template is None
+    assert first.mimetype == entry.mimetype
+    assert template.render("24.04", "amd64", "aws") is first
+    assert compressed == [(first.body, FAST_ENCODINGS), (second.body, FAST_ENCODINGS)]
+
+
+def test_render_template_cache():
+    """
+    arrange: a template filled with the version only
+    act: when we render it for clients of the same version, then compile it again
+    assert: the clients share a render, which the template compiled again doesn't keep
+    """
+    entry = build_entries({"index.txt": "Ubuntu {version}"})["index.txt"]
+    template = compile_template(entry).template
+    assert template is not None
+
+    first = template.render("24.04", "amd64", "aws")
+    reloaded = compile_template(entry).template
+    assert reloaded is not None
+
+    assert template.render("24.04", "s390x", "azure") is first
+    assert template.render("22.04", "amd64", "aws") is not first
+    assert reloaded.render("24.04", "amd64", "aws") is not first
+    assert reloaded.render("24.04", "amd64", "aws").body == first.body == b"Ubuntu 24.04"
@@ -0,0 +1,299 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for motd-server-app/motd_server/wsgi.py."""
+
+import datetime
+import gzip
+import io
+import json
+import math
+import time
+
+import pytest
+from werkzeug.http import http_date
+
+from motd_server.access_log import AccessLog
+from motd_server.motd import process_config
+from motd_server.reload import ContentReloader
+from motd_server.sendfile import SENDFILE_MIN_SIZE
+from motd_server.wsgi import FastPath
+
+FILES = """
+index.txt: default
+index-24.04.txt: noble
+aptnews.json: '{}'
+large.txt: '{large}'
+""".replace("{large}", "This is a great MOTD. " * 50)
+USER_AGENT = "wget/1.21.4-1ubuntu4.1 Ubuntu/24.04.1/LTS GNU/Linux/6.8.0/x86_64 cloud_id/aws"
+
+
+def fallback_app(_environ, start_response):
+    """WSGI application standing for Flask."""
+    start_response("418 I'M A TEAPOT", [])
+    return [b"fallback"]
+
+
+@pytest.fixture(name="fast_path")
+def fast_path_fixture():
+    """Fixture providing a fast path over a fallback application."""
+    config = {"FILES": FILES, "CACHE_CONTROL": '"*.json": {max-age: 60}'}
+    process_config(config)
+    return FastPath(fallback_app, config, ContentReloader(config), ["/metrics"])
+
+
+def call(fast_path, path="/", method="GET", **headers):
+    """Call the fast path.
+
+    Returns:
+        Tuple of (status, headers, body).
+    """
+    environ = {"REQUEST_METHOD": method, "PATH_INFO": path}
+    environ.update({f"HTTP_{name.upper()}": value for name, value in headers.items()})
+    response = {}
+
+    def start_response(status, response_headers):
+        response["status"] = status
+        response["headers"] = dict(response_headers)
+
+    iterable = fast_path(environ, start_response)
+    body = b"".join(iterable)
+    # WSGI servers close the iterable once sent
+    if hasattr(iterable, "close"):
+        iterable.close()
+    return response["status"], response["headers"], body
+
+
+def test_index(fast_path):
+    """
+    arrange: a fast path over a content with MOTDs
+    act: when the root is requested with a user agent
+    assert: the MOTD of the user agent is served with the same headers as Flask
+    """
+    status, headers, body = call(fast_path, user_agent=USER_AGENT)
+
+    assert status == "200 OK"
+    assert body == b"noble"
+    assert headers["Content-Type"] == "text/plain; charset=utf-8"
+    assert headers["Content-Length"] == "5"
+    assert headers["Vary"] == "User-Agent"
+    assert "Cache-Control" not in headers
+    assert headers["ETag"].startswith('"')
+    assert headers["Last-Modified"]
+    assert headers["X-Content-Version"]
+
+
+def test_file(fast_path):
+    """
+    arrange: a fast path over a content with a JSON file
+    act: when the file is requested
+    assert: the file is served without depending on the user agent
+    """
+    status, headers, body = call(fast_path, "/aptnews.json")
+
+    assert status == "200 OK"
+    assert body == b"{}"
+    assert headers["Content-Type"] == "application/json"
+    assert headers["Cache-Control"] == "public, max-age=60"
+    assert "Vary" not in headers
+
+
+def test_compressed(fast_path):
+    """
+    arrange: a fast path over a content with a large file
+    act: when the file is requested accepting gzip
+    assert: the gzip variant is served with its own ETag
+    """
+    _, identity_headers, _ = call(fast_path, "/large.txt")
+    status, headers, body = call(fast_path, "/large.txt", accept_encoding="gzip")
+
+    assert status == "200 OK"
+    assert headers["Content-Encoding"] == "gzip"
+    assert headers["Vary"] == "Accept-Encoding"
+    assert headers["ETag"] != identity_headers["ETag"]
+    assert gzip.decompress(body).decode() == "This is a great MOTD. " * 50
+
+
+def test_not_modified(fast_path):
+    """
+    arrange: a fast path over a content with MOTDs
+    act: when the root is requested again with the ETag of the first response
+    assert: an empty 304 is served, without the headers describing the body
+    """
+    _, headers, _ = call(fast_path)
+    status, headers, body = call(fast_path, if_none_match=headers["ETag"])
+
+    assert status == "304 NOT MODIFIED"
+    assert body == b""
+    assert "Content-Length" not in headers
+    assert "Content-Type" not in headers
+    assert headers["ETag"]
+
+
+def test_modified(fast_path):
+    """
+    arrange: a fast path over a content with MOTDs
+    act: when the root is requested with an outdated ETag
+    assert: the full response is served
+    """
+    status, _, body = call(fast_path, if_none_match='"outdated"')
+
+    assert status == "200 OK"
+    assert body == b"default"
+
+
+def test_modified_since_schedule(monkeypatch):
+    """
+    arrange: a fast path over a content with a MOTD template scheduled to start in an hour
+    act: when the root is requested after the start with the Last-Modified of a response before
+    assert: the scheduled MOTD is served, modified when it started
+    """
+    start = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)
+    config = {"FILES": f"""
+index.txt: default
+index-24.04.txt: {{content: 'Ubuntu {{version}}', start: '{start.isoformat()}'}}
+"""}
+    process_config(config)
+    fast_path = FastPath(fallback_app, config, ContentReloader(config))
+    _, headers, _ = call(fast_path, user_agent=USER_AGENT)
+
+    monkeypatch.setattr(time, "time", start.timestamp)
+    status, headers, body = call(
+        fast_path, user_agent=USER_AGENT, if_modified_since=headers["Last-Modified"]
+    )
+
+    assert status == "200 OK"
+    assert body == b"Ubuntu 24.04"
+    assert headers["Last-Modified"] == http_date(math.ceil(start.timestamp()))
+
+
+def test_head(fast_path):
+    """
+    arrange: a fast path over a content with MOTDs
+    act: when the root is requested with HEAD
+    assert: the headers are served without the body
+    """
+    status, headers, body = call(fast_path, method="HEAD")
+
+    assert status == "200 OK"
+    assert headers["Content-Length"] == "7"
+    assert body == b""
+
+
+@pytest.mark.parametrize(
+    "path, method, headers",
+    [
+        pytest.param("/index.txt", "POST", {}, id="method"),
+        pytest.param("/index.txt", "GET", {"range": "bytes=0-1"}, id="range"),
+        pytest.param("/index.txt", "GET", {"if_match": '"etag"'}, id="if-match"),
+        pytest.param("/\xff.txt", "GET", {}, id="invalid path"),
+        pytest.param("//index.txt", "GET", {}, id="double slash"),
+        pytest.param("/metrics", "GET", {}, id="reserved"),
+        pytest.param("/does_not_exist", "GET", {}, id="not found"),
+    ],
+)
+def test_fallback(fast_path, path, method, headers):
+    """
+    arrange: a fast path over a fallback application
+    act: when a request the fast path doesn't handle is sent
+    assert: the fallback application serves it
+    """
+    status, _, body = call(fast_path, path, method, **headers)
+
+    assert status == "418 I'M A TEAPOT"
+    assert body == b"fallback"
+
+
+def test_variant():
+    """
+    arrange: a fast path over a content with a rotating file, pinned by a request header
+    act: when the file is requested with and without the header
+    assert: the variant is reported, the same for the same header value
+    """
+    config = {"FILES": "index.txt: [A, B, C]", "VARIANT_PIN_HEADER": "X-Machine-Id"}
+    process_config(config)
+    fast_path = FastPath(fallback_app, config, ContentReloader(config))
+
+    status, headers, body = call(fast_path, "/index.txt", x_machine_id="machine")
+
+    assert status == "200 OK"
+    assert headers["Vary"] == "X-Machine-Id"
+    assert body.decode() == ["A", "B", "C"][int(headers["X-MOTD-Variant"])]
+    for _ in range(10):
+        assert call(fast_path, "/index.txt", x_machine_id="machine")[2] == body
+    _, headers, _ = call(fast_path)
+    assert headers["Vary"] == "X-Machine-Id, User-Agent"
+    assert "X-MOTD-Variant" in headers
+
+
+def test_template():
+    """
+    arrange: a fast path over a content with a template index.txt
+    act: when the MOTD and the file are requested
+    assert: the MOTD is filled with the client information, the file is not
+    """
+    config = {"FILES": "index.txt: Ubuntu {version} on {cloud}"}
+    process_config(config)
+    fast_path = FastPath(fallback_app, config, ContentReloader(config))
+
+    assert call(fast_path, user_agent=USER_AGENT)[2] == b"Ubuntu 24.04 on aws"
+    assert (
+        call(fast_path, "/index.txt", user_agent=USER_AGENT)[2] == b"Ubuntu {version} on {cloud}"
+    )
+
+
+def test_access_log():
+    """
+    arrange: a fast path logging every request
+    act: when the MOTD is requested
+    assert: the request is logged with the file served
+    """
+    config = {"FILES": FILES}
+    process_config(config)
+    stream = io.StringIO()
+    access_log = AccessLog(1, stream=stream)
+    fast_path = FastPath(fallback_app, config, ContentReloader(config), access_log=access_log)
+
+    call(fast_path, user_agent=USER_AGENT)
+    access_log.stop()
+
+    record = json.loads(stream.getvalue())
+    assert (record["route"], record["key"], record["status"]) == ("index", "index-24.04.txt", 200)
+
+
+def test_fallback_no_index():
+    """
+    arrange: a fast path over a content without index.txt
+    act: when the root is requested
+    assert: the fallback application serves it
+    """
+    config = {"FILES": "aptnews.json: '{}'"}
+    process_config(config)
+    fast_path = FastPath(fallback_app, config, ContentReloader(config))
+
+    status, _, _ = call(fast_path)
+
+    assert status == "418 I'M A TEAPOT"
+
+
+def test_sendfile(tmp_path):
+    """
+    arrange: a fast path over a content store holding a large file
+    act: when the file is requested, then again once the store is removed
+    assert: the file is sent from the store, supporting ranges, then from memory
+    """
+    large = "x" * SENDFILE_MIN_SIZE
+    config = {"FILES": f"large.txt: {large}", "CONTENT_STORE": str(tmp_path)}
+    process_config(config)
+    fast_path = FastPath(fallback_app, config, ContentReloader(config))
+
+    status, headers, body = call(fast_path, "/large.txt")
+    (store,) = tmp_path.iterdir()
+    store.unlink()
+    _, _, memory_body = call(fast_path, "/large.txt")
+
+    assert status == "200 OK"
+    assert headers["Accept-Ranges"] == "bytes"
+    assert headers["Content-Length"] == str(len(large))
+    assert body == memory_body == large.encode()
+    assert "Accept-Ranges" not in call(fast_path, "/large.txt", accept_encoding="gzip")[1]
@@ -4,17 +4,453 @@
 
 """Flask Charm entrypoint."""
 
+import datetime
+import fnmatch
+import io
 import logging
+import pathlib
+import re
+import tarfile
 
 import ops
 import paas_charm.flask
+import yaml
+from paas_charm._gunicorn.webserver import GunicornWebserver
+from paas_charm._gunicorn.wsgi_app import WsgiApp
+from paas_charm.app import App
+from paas_charm.exceptions import CharmConfigInvalidError
 
 logger = logging.getLogger(__name__)
 
+# The files are memory-mapped by the workload from this bundle and reloaded when it changes
+FILES_BUNDLE_PATH = pathlib.Path("/flask/motd/files.tar")
+# PAX headers of the bundle members holding the settings of the files and of their variants
+BUNDLE_METADATA_PREFIX = "MOTD."
+# Each gunicorn worker writes its metrics there so that any of them can serve all of them
+METRICS_DIR = pathlib.Path("/tmp/motd-metrics")  # nosec B108
+# The gunicorn workers share a single memory-mapped copy of the content from there
+CONTENT_STORE_DIR = pathlib.Path("/tmp/motd-content")  # nosec B108
+# Paths served by the workload itself, which files can't take
+RESERVED_FILENAMES = ("metrics", "_health", "_manifest", "_delta", "_profile")
+# MOTDs are short, anything larger is most likely a mistake in the configuration
+MAX_FILE_SIZE = 1024 * 1024
+MAX_FILES_SIZE = 64 * 1024 * 1024
+# Same grammar as the workload: up to 3 tokens separated by hyphens, except inside the
+# brackets of a glob, each token being exact, a glob, a set of alternatives or a range
+MAX_MOTD_TOKENS = 3
+MOTD_TOKEN_SEPARATOR = re.compile(r"-(?![^\[]*\])")
+VERSION_PATTERN = re.compile(r"^\d{2}\.\d{2}$")
+DEFINITION_KEYS = frozenset(("content", "start", "end"))
+VARIANT_KEYS = frozenset(("content", "name", "weight"))
+# Appended to the gunicorn configuration: metrics left by a previous run of the server are
+# cleared when it starts, and the live gauges of a worker are removed when it exits
+GUNICORN_HOOKS = f"""
+
+def on_starting(server):
+    import os
+    import shutil
+    shutil.rmtree({str(METRICS_DIR)!r}, ignore_errors=True)
+    os.makedirs({str(METRICS_DIR)!r}, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid, {str(METRICS_DIR)!r})
+"""
+
+
+def parse_files(files_string: str) -> dict:
+    """Parse and validate the files option.
+
+    Every file is checked the way the workload reads it, so that a mistake blocks the
+    charm instead of rolling out a content that serves 404s. Timestamps are normalized to
+    ISO 8601 in UTC and weights to numbers, so the workload reads them as they are.
+
+    Args:
+        files_string: YAML string defining files.
+
+    Returns:
+        Dictionary mapping of filenames to their validated content or definition.
+
+    Raises:
+        CharmConfigInvalidError: If the files option is not valid.
+    """
+    errors = []
+    parsed = {}
+    total_size = 0
+    for filename, definition in load_files_yaml(files_string).items():
+        try:
+            check_filename(filename)
+            parsed[filename], size = parse_definition(definition)
+            total_size += size
+        except ValueError as e:
+            errors.append(f"{filename}: {e}")
+    if total_size > MAX_FILES_SIZE:
+        errors.append(f"{total_size} bytes in total, more than {MAX_FILES_SIZE}")
+    if errors:
+        for error in errors:
+            logger.error("Invalid files option, %s", error)
+        more = f" (and {len(errors) - 1} more)" if len(errors) > 1 else ""
+        raise CharmConfigInvalidError(f"Invalid files: {errors[0]}{more}")
+    return parsed
+
+
+def load_files_yaml(files_string: str) -> dict:
+    """Load the mapping of the files option.
+
+    Args:
+        files_string: YAML string defining files.
+
+    Returns:
+        Dictionary mapping of filenames to their definition, empty if none is defined.
+
+    Raises:
+        CharmConfigInvalidError: If the files option is not a YAML mapping.
+    """
+    try:
+        files = yaml.safe_load(files_string) if files_string else {}
+    except yaml.YAMLError as e:
+        mark = getattr(e, "problem_mark", None)
+        where = f" at line {mark.line + 1}" if mark else ""
+        raise CharmConfigInvalidError(f"Invalid files: not valid YAML{where}") from e
+    if files is None:
+        return {}
+    if not isinstance(files, dict):
+        raise CharmConfigInvalidError("Invalid files: not a mapping of filenames to contents")
+    return files
+
+
+def check_filename(filename: object) -> None:
+    """Check a filename, and the tokens of MOTD filenames.
+
+    Args:
+        filename: Key of the files option.
+
+    Raises:
+        ValueError: If the filename can't be served.
+    """
+    if not isinstance(filename, str) or not filename:
+        raise ValueError("filenames must be non-empty strings")
+    if filename in RESERVED_FILENAMES:
+        raise ValueError("reserved by the server")
+    if not (filename.startswith("index-") and filename.endswith(".txt")):
+        return
+    tokens = MOTD_TOKEN_SEPARATOR.split(filename[6:-4])
+    if len(tokens) > MAX_MOTD_TOKENS:
+        raise ValueError(f"MOTD filenames have at most {MAX_MOTD_TOKENS} tokens")
+    for token in tokens:
+        check_motd_token(token)
+
+
+def check_motd_token(token: str) -> None:
+    """Check a token of a MOTD filename.
+
+    Args:
+        token: Exact value, glob, set of alternatives in braces or inclusive range of versions.
+
+    Raises:
+        ValueError: If the token is not valid.
+    """
+    if token.startswith("{") and token.endswith("}"):
+        for alternative in token[1:-1].split(","):
+            check_motd_token(alternative)
+        return
+    if ".." in token:
+        low, _, high = token.partition("..")
+        if not (VERSION_PATTERN.match(low) and VERSION_PATTERN.match(high)):
+            raise ValueError(f"{token} is not a range of versions")
+        return
+    if not token or "{" in token or "}" in token:
+        raise ValueError(f"{token!r} is not a valid MOTD token")
+    try:
+        re.compile(fnmatch.translate(token))
+    except re.error as e:
+        raise ValueError(f"{token} is not a valid glob") from e
+
+
+def parse_definition(definition: object) -> tuple[object, int]:
+    """Parse the definition of a file.
+
+    Args:
+        definition: Content, list of variants, or mapping with the content and schedule.
+
+    Returns:
+        Tuple of (normalized definition, size of its contents in bytes).
+
+    Raises:
+        ValueError: If the definition is not valid.
+    """
+    if not isinstance(definition, dict):
+        return parse_contents(definition)
+    unknown = set(definition) - DEFINITION_KEYS
+    if unknown:
+        raise ValueError(f"unknown settings {format_keys(unknown)}")
+    if "content" not in definition:
+        raise ValueError("no content")
+    content, size = parse_contents(definition["content"])
+    window = {
+        key: parse_timestamp(definition[key]) for key in ("start", "end") if key in definition
+    }
+    if "start" in window and "end" in window and window["start"] >= window["end"]:
+        raise ValueError("start is not before end")
+    parsed = {"content": content}
+    parsed.update((key, timestamp.isoformat()) for key, timestamp in window.items())
+    return parsed, size
+
+
+def parse_contents(contents: object) -> tuple[object, int]:
+    """Parse the content of a file, or its list of variants.
+
+    Args:
+        contents: Content, or list of variants as contents or mappings.
+
+    Returns:
+        Tuple of (normalized contents, size of the contents in bytes).
+
+    Raises:
+        ValueError: If the contents are not valid.
+    """
+    if not isinstance(contents, list):
+        return contents, get_content_size(contents)
+    if not contents:
+        raise ValueError("no variants")
+    variants = []
+    size = 0
+    for index, variant in enumerate(contents):
+        if not isinstance(variant, dict):
+            variant = {"content": variant}
+        unknown = set(variant) - VARIANT_KEYS
+        if unknown:
+            raise ValueError(f"variant {index} has unknown settings {format_keys(unknown)}")
+        if "content" not in variant:
+            raise ValueError(f"variant {index} has no content")
+        try:
+            weight = float(variant.get("weight", 1))
+        except (TypeError, ValueError):
+            weight = 0
+        if not weight > 0:
+            raise ValueError(f"variant {index} needs a positive weight")
+        size += get_content_size(variant["content"])
+        variants.append({**variant, "weight": weight} if "weight" in variant else variant)
+    return variants, size
+
+
+def format_keys(keys: set) -> str:
+    """Format the keys of a mapping for an error message.
+
+    Args:
+        keys: Keys of a mapping.
+
+    Returns:
+        Comma-separated sorted keys.
+    """
+    return ", ".join(sorted(map(str, keys)))
+
+
+def get_content_size(content: object) -> int:
+    """Get the size of a content.
+
+    Args:
+        content: Content of a file or of a variant.
+
+    Returns:
+        Size of the content encoded to UTF-8, in bytes.
+
+    Raises:
+        ValueError: If the content is not a scalar or is too large.
+    """
+    if content is None or isinstance(content, (dict, list)):
+        raise ValueError("contents must be text")
+    size = len(str(content).encode("utf-8"))
+    if size > MAX_FILE_SIZE:
+        raise ValueError(f"{size} bytes, more than {MAX_FILE_SIZE}")
+    return size
+
+
+def parse_timestamp(value: object) -> datetime.datetime:
+    """Parse a timestamp the way the workload does.
+
+    Args:
+        value: Timestamp, as parsed by YAML or as an ISO 8601 string, in UTC unless specified.
+
+    Returns:
+        Timestamp in UTC.
+
+    Raises:
+        ValueError: If the value is not a timestamp.
+    """
+    if isinstance(value, str):
+        # Python 3.10 doesn't support the Z suffix
+        value = datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        value = datetime.datetime(value.year, value.month, value.day)
+    if not isinstance(value, datetime.datetime):
+        raise ValueError(f"{value!r} is not a timestamp")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc)
+
+
+def build_files_bundle(files: dict) -> bytes:
+    """Pack validated files into an uncompressed tar archive.
+
+    Every variant of a rotating file is packed as a member of the same name, with its
+    settings and index in PAX headers. The settings of a file defined as a mapping, such as
+    its schedule, are in the PAX headers of all its members.
+
+    Args:
+        files: Dictionary mapping of filenames to their definition, as parsed by parse_files.
+
+    Returns:
+        Content of the bundle.
+    """
+    bundle = io.BytesIO()
+    with tarfile.open(fileobj=bundle, mode="w", format=tarfile.PAX_FORMAT) as tar:
+        for filename, content in files.items():
+            settings: dict = {}
+            if isinstance(content, dict):
+                settings = {key: value for key, value in content.items() if key != "content"}
+                content = content.get("content", "")
+            if not isinstance(content, list):
+                add_bundle_member(tar, str(filename), content, settings)
+                continue
+            for index, variant in enumerate(content):
+                if not isinstance(variant, dict):
+                    variant = {"content": variant}
+                metadata = {key: value for key, value in variant.items() if key != "content"}
+                metadata.update(settings, variant=index)
+                add_bundle_member(tar, str(filename), variant.get("content", ""), metadata)
+    return bundle.getvalue()
+
+
+def add_bundle_member(
+    tar: tarfile.TarFile, filename: str, content: object, metadata: dict
+) -> None:
+    """Add a file to a bundle.
+
+    Args:
+        tar: Bundle being written.
+        filename: Name of the file.
+        content: Content of the file.
+        metadata: Settings of the file, stored in PAX headers.
+    """
+    data = str(content).encode("utf-8")
+    member = tarfile.TarInfo(filename)
+    member.size = len(data)
+    member.mode = 0o444
+    member.pax_headers = {
+        f"{BUNDLE_METADATA_PREFIX}{key}": str(value) for key, value in metadata.items()
+    }
+    tar.addfile(member, io.BytesIO(data))
+
+
+def push_files_bundle(container: ops.Container, bundle: bytes) -> bool:
+    """Push the files bundle to the workload, unless it already has the same one.
+
+    Every push makes the workers reload the files and resets their Last-Modified, and the
+    charm restarts the workload on many events where the files didn't change.
+
+    Args:
+        container: Container of the workload.
+        bundle: Bundle of the files.
+
+    Returns:
+        Whether the bundle was pushed.
+    """
+    try:
+        with container.pull(FILES_BUNDLE_PATH, encoding=None) as current:
+            if current.read() == bundle:
+                return False
+    except ops.pebble.PathError:
+        pass
+    container.push(FILES_BUNDLE_PATH, bundle, make_dirs=True)
+    return True
+
+
+class MotdGunicornWebserver(GunicornWebserver):  # pylint: disable=too-few-public-methods
+    """Gunicorn web server managing the metrics directory shared by the workers.
+
+    This overrides GunicornWebserver._config of paas-charm 1.12, pinned in requirements.txt.
+    """
+
+    @property
+    def _config(self) -> str:
+        """Generate the content of the Gunicorn configuration file, with the MOTD hooks.
+
+        Returns:
+            The content of the Gunicorn configuration file.
+        """
+        return super()._config + GUNICORN_HOOKS
+
+
+class MotdWsgiApp(WsgiApp):
+    """WSGI application passing the MOTD files through a bundle rather than the environment.
+
+    This overrides WsgiApp.gen_environment of paas-charm 1.12, which is pinned in
+    requirements.txt as it isn't a public interface.
+    """
+
+    def gen_environment(self) -> dict[str, str]:
+        """Generate the environment of the workload.
+
+        Keeping the files out of the environment means changing them doesn't restart the
+        workload, which reloads them from the bundle instead.
+
+        Returns:
+            A dictionary representing the application environment variables.
+        """
+        env = super().gen_environment()
+        env.pop("FLASK_FILES", None)
+        env["FLASK_FILES_BUNDLE"] = str(FILES_BUNDLE_PATH)
+        env["PROMETHEUS_MULTIPROC_DIR"] = str(METRICS_DIR)
+        env["FLASK_CONTENT_STORE"] = str(CONTENT_STORE_DIR)
+        return env
+
 
 class UbuntuMotdServerCharm(paas_charm.flask.Charm):
     """Flask Charm service."""
 
+    def _create_app(self) -> App:
+        """Build the App instance for the MOTD server.
+
+        This mirrors _create_app of paas_charm._gunicorn.charm in paas-charm 1.12, pinned in
+        requirements.txt, replacing the web server and the WsgiApp with the MOTD ones.
+
+        Returns:
+            A new App instance.
+        """
+        webserver = MotdGunicornWebserver(
+            webserver_config=self.create_webserver_config(),
+            workload_config=self._workload_config,
+            container=self.unit.get_container(self._workload_config.container_name),
+        )
+
+        return MotdWsgiApp(
+            container=self._container,
+            charm_state=self._create_charm_state(),
+            workload_config=self._workload_config,
+            webserver=webserver,
+            database_migration=self._database_migration,
+        )
+
+    def restart(self, rerun_migrations: bool = False) -> None:
+        """Update the files in the workload, then restart it if its configuration changed.
+
+        Invalid files block the charm without touching the workload.
+
+        Args:
+            rerun_migrations: whether it is necessary to run the migrations again.
+        """
+        try:
+            files = parse_files(str(self.config.get("files", "")))
+        except CharmConfigInvalidError as exc:
+            # The workload keeps serving the last valid files
+            self.update_app_and_unit_status(ops.BlockedStatus(exc.msg))
+            return
+        if self._container.can_connect():
+            push_files_bundle(self._container, build_files_bundle(files))
+        super().restart(rerun_migrations=rerun_migrations)
+
 
 if __name__ == "__main__":
     ops.main(UbuntuMotdServerCharm)
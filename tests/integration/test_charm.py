@@ -8,6 +8,7 @@
 import logging
 from pathlib import Path
 
+import jubilant
 import requests
 import yaml
 
@@ -52,3 +53,23 @@ def test_specific_motds(motd_url: str, expected_motd_contents: dict[str, str]):
         res = requests.get(motd_url, timeout=5, headers={"User-Agent": user_agent})
         assert res.status_code == 200, f"Bad status for UA: {user_agent}"
         assert res.text == expected_content, f"Bad content for UA: {user_agent}"
+
+
+def test_invalid_files(juju: jubilant.Juju, motd_app: str, motd_url: str):
+    """
+    arrange: Deploy the motd-server-app charm.
+    act: Set a files configuration with an invalid MOTD filename, then restore it.
+    assert: The charm is blocked with the reason while the last valid files are still served,
+        and becomes active again once the configuration is fixed.
+    """
+    files = juju.config(motd_app)["files"]
+
+    juju.config(motd_app, {"files": "index-20.04..noble.txt: invalid range"})
+    status = juju.wait(lambda status: jubilant.all_blocked(status, motd_app))
+
+    message = status.apps[motd_app].app_status.message
+    assert "index-20.04..noble.txt" in message
+    assert requests.get(motd_url + "/_health", timeout=5).status_code == 200
+
+    juju.config(motd_app, {"files": files})
+    juju.wait(lambda status: jubilant.all_active(status, motd_app))
@@ -0,0 +1,239 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for the validation and bundling of the files option."""
+
+import io
+import tarfile
+import types
+import unittest.mock
+
+import ops
+import pytest
+from paas_charm._gunicorn.webserver import GunicornWebserver
+from paas_charm._gunicorn.wsgi_app import WsgiApp
+from paas_charm.exceptions import CharmConfigInvalidError
+
+import charm
+from charm import (
+    CONTENT_STORE_DIR,
+    FILES_BUNDLE_PATH,
+    METRICS_DIR,
+    MotdGunicornWebserver,
+    MotdWsgiApp,
+    build_files_bundle,
+    parse_files,
+    push_files_bundle,
+)
+
+
+def test_parse_files():
+    """
+    arrange: files with a plain content, weighted variants and a schedule
+    act: when we parse the files option
+    assert: the files are normalized the way the workload reads them
+    """
+    files = parse_files("""
+index.txt: Welcome
+index-2?.04-{amd64,arm64}.txt: [A, {content: B, weight: 2, name: b}]
+index-20.04..22.04.txt:
+  content: Upgrade
+  start: 2025-04-01
+  end: 2025-05-01T12:00:00+02:00
+""")
+
+    assert files == {
+        "index.txt": "Welcome",
+        "index-2?.04-{amd64,arm64}.txt": [
+            {"content": "A"},
+            {"content": "B", "weight": 2.0, "name": "b"},
+        ],
+        "index-20.04..22.04.txt": {
+            "content": "Upgrade",
+            "start": "2025-04-01T00:00:00+00:00",
+            "end": "2025-05-01T10:00:00+00:00",
+        },
+    }
+
+
+@pytest.mark.parametrize("files_string", ["", "# no files"])
+def test_parse_no_files(files_string):
+    """
+    arrange: an empty files option
+    act: when we parse it
+    assert: there are no files
+    """
+    assert not parse_files(files_string)
+
+
+@pytest.mark.parametrize(
+    "files_string, error",
+    [
+        pytest.param("index.txt: [a", "not valid YAML at line 1", id="invalid YAML"),
+        pytest.param("- index.txt", "not a mapping", id="not a mapping"),
+        pytest.param("_health: OK", "_health: reserved", id="reserved filename"),
+        pytest.param("1: one", "filenames must be non-empty strings", id="not a string"),
+        pytest.param("index-a-b-c-d.txt: x", "at most 3 tokens", id="too many tokens"),
+        pytest.param(
+            "index-20.04..noble.txt: x", "20.04..noble is not a range", id="invalid range"
+        ),
+        pytest.param("index-{a,}.txt: x", "'' is not a valid MOTD token", id="empty token"),
+        pytest.param("index.txt: []", "no variants", id="no variants"),
+        pytest.param("index.txt: [{name: a}]", "variant 0 has no content", id="no content"),
+        pytest.param(
+            "index.txt: [{content: a, weight: 0}]",
+            "variant 0 needs a positive weight",
+            id="weight",
+        ),
+        pytest.param(
+            "index.txt: [{content: a, colour: red}]",
+            "variant 0 has unknown settings colour",
+            id="unknown variant setting",
+        ),
+        pytest.param("index.txt: {start: 2025-01-01}", "no content", id="no file content"),
+        pytest.param(
+            "index.txt: {content: a, until: 2025-01-01}", "unknown settings until", id="setting"
+        ),
+        pytest.param(
+            "index.txt: {content: a, start: tomorrow}", "Invalid isoformat", id="timestamp"
+        ),
+        pytest.param(
+            "index.txt: {content: a, start: 2025-02-01, end: 2025-01-01}",
+            "start is not before end",
+            id="empty window",
+        ),
+        pytest.param("index.txt: {content: [a, [b]]}", "contents must be text", id="list"),
+        pytest.param("index.txt: ~", "contents must be text", id="null"),
+    ],
+)
+def test_parse_invalid_files(files_string, error):
+    """
+    arrange: a files option with a mistake
+    act: when we parse it
+    assert: the charm configuration is invalid, with the reason
+    """
+    with pytest.raises(CharmConfigInvalidError) as exc_info:
+        parse_files(files_string)
+
+    assert exc_info.value.msg.startswith("Invalid files: ")
+    assert error in exc_info.value.msg
+
+
+def test_parse_files_reports_all_errors(caplog):
+    """
+    arrange: a files option with several mistakes
+    act: when we parse it
+    assert: the first one is reported with the number of others, and all of them are logged
+    """
+    with pytest.raises(CharmConfigInvalidError) as exc_info:
+        parse_files("metrics: x\nindex.txt: []\nindex-a..b.txt: x")
+
+    assert exc_info.value.msg == "Invalid files: metrics: reserved by the server (and 2 more)"
+    assert len([record for record in caplog.records if record.levelname == "ERROR"]) == 3
+
+
+def test_parse_files_too_large(monkeypatch):
+    """
+    arrange: a file larger than allowed, and files too large in total
+    act: when we parse the files option
+    assert: the size is reported
+    """
+    monkeypatch.setattr(charm, "MAX_FILE_SIZE", 4)
+    monkeypatch.setattr(charm, "MAX_FILES_SIZE", 6)
+
+    with pytest.raises(CharmConfigInvalidError, match="index.txt: 5 bytes, more than 4"):
+        parse_files("index.txt: 12345")
+    with pytest.raises(CharmConfigInvalidError, match="8 bytes in total, more than 6"):
+        parse_files("index.txt: '1234'\naptnews.json: '1234'")
+
+
+def test_build_files_bundle():
+    """
+    arrange: validated files with a plain content, variants and a schedule
+    act: when we build the bundle
+    assert: every variant is a member with its settings and index in PAX headers
+    """
+    files = parse_files("""
+index.txt: Welcome
+index-24.04.txt: [A, {content: B, weight: 2}]
+aptnews.json: {content: '{}', end: 2025-05-01}
+""")
+
+    bundle = build_files_bundle(files)
+
+    with tarfile.open(fileobj=io.BytesIO(bundle)) as tar:
+        members = [
+            (member.name, tar.extractfile(member).read(), member.pax_headers)  # type: ignore
+            for member in tar
+        ]
+    assert members == [
+        ("index.txt", b"Welcome", {}),
+        ("index-24.04.txt", b"A", {"MOTD.variant": "0"}),
+        ("index-24.04.txt", b"B", {"MOTD.weight": "2.0", "MOTD.variant": "1"}),
+        ("aptnews.json", b"{}", {"MOTD.end": "2025-05-01T00:00:00+00:00"}),
+    ]
+
+
+def test_gen_environment(monkeypatch):
+    """
+    arrange: a workload environment holding the files option
+    act: when the charm generates the environment of the workload
+    assert: the files are passed through the bundle, along with the shared directories
+    """
+    monkeypatch.setattr(
+        WsgiApp, "gen_environment", lambda _self: {"FLASK_FILES": "index.txt: x", "A": "1"}
+    )
+    app = MotdWsgiApp.__new__(MotdWsgiApp)
+
+    assert app.gen_environment() == {
+        "A": "1",
+        "FLASK_FILES_BUNDLE": str(FILES_BUNDLE_PATH),
+        "PROMETHEUS_MULTIPROC_DIR": str(METRICS_DIR),
+        "FLASK_CONTENT_STORE": str(CONTENT_STORE_DIR),
+    }
+
+
+def test_gunicorn_hooks(monkeypatch, tmp_path):
+    """
+    arrange: a metrics directory left by a previous run, and the Gunicorn configuration
+    act: when the server starts, then a worker exits
+    assert: the directory is emptied, then the live gauges of the worker are removed
+    """
+    metrics_dir = tmp_path / "metrics"
+    metrics_dir.mkdir()
+    (metrics_dir / "counter_1.db").touch()
+    monkeypatch.setattr(GunicornWebserver, "_config", property(lambda _self: "bind = []"))
+    webserver = MotdGunicornWebserver.__new__(MotdGunicornWebserver)
+    config = webserver._config.replace(  # pylint: disable=protected-access
+        repr(str(METRICS_DIR)), repr(str(metrics_dir))
+    )
+    hooks: dict = {}
+    exec(config, hooks)  # nosec B102 # pylint: disable=exec-used
+
+    hooks["on_starting"](None)
+    assert not list(metrics_dir.iterdir())
+
+    (metrics_dir / "gauge_livesum_2.db").touch()
+    (metrics_dir / "counter_2.db").touch()
+    hooks["child_exit"](None, types.SimpleNamespace(pid=2))
+    assert [path.name for path in metrics_dir.iterdir()] == ["counter_2.db"]
+
+
+def test_push_files_bundle():
+    """
+    arrange: a workload container without files bundle
+    act: when the charm pushes a bundle, the same bundle again, then another bundle
+    assert: only the bundles different from the one in the container are pushed
+    """
+    container = unittest.mock.MagicMock(spec=ops.Container)
+    container.pull.side_effect = ops.pebble.PathError("not-found", "no such file")
+
+    assert push_files_bundle(container, b"first")
+    container.push.assert_called_once_with(FILES_BUNDLE_PATH, b"first", make_dirs=True)
+
+    container.reset_mock()
+    container.pull.side_effect = lambda *_args, **_kwargs: io.BytesIO(b"first")
+    assert not push_files_bundle(container, b"first")
+    container.push.assert_not_called()
+    assert push_files_bundle(container, b"second")
+    container.push.assert_called_once_with(FILES_BUNDLE_PATH, b"second", make_dirs=True)